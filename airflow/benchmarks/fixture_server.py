@@ -0,0 +1,259 @@
+"""
+Local HTTP stub that replays recorded FotMob responses for offline benchmarks
+"""
+import copy
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURE_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
+
+
+class FixtureStore:
+    """Recorded leagues / matchDetails payloads, pre-encoded to bytes.
+
+    Every `{match_id}.json` in the fixture dir is a recorded matchDetails
+    response. Recorded leagues responses are picked up from
+    `leagues_{league_id}_{season}.json` (season with "/" replaced by "_");
+    when none is recorded, one is synthesized from the match payloads.
+    `n_matches` clones the recorded matches under new ids so a season-sized
+    run can be replayed from a single fixture.
+    """
+
+    def __init__(self, fixture_dir=DEFAULT_FIXTURE_DIR, n_matches=None):
+        self.fixture_dir = fixture_dir
+        self.leagues = {}
+        self.matches = {}
+        self.fixtures = []
+
+        recorded = []
+        for path in sorted(glob.glob(os.path.join(fixture_dir, "*.json"))):
+            name = os.path.basename(path)
+            with open(path, "rb") as f:
+                body = f.read()
+            if name.startswith("leagues_"):
+                self.leagues[name[len("leagues_"):-len(".json")]] = body
+            else:
+                recorded.append(json.loads(body))
+
+        if not recorded:
+            raise FileNotFoundError(f"No matchDetails fixtures found in {fixture_dir}")
+
+        n_matches = n_matches or len(recorded)
+        for i in range(n_matches):
+            data = recorded[i % len(recorded)]
+            if i >= len(recorded):
+                data = copy.deepcopy(data)
+                data["general"]["matchId"] = str(int(recorded[0]["general"]["matchId"]) + i)
+            self.add_match(data)
+
+    def add_match(self, data):
+        general = data.get("general", {})
+        match_id = str(general.get("matchId"))
+        self.matches[match_id] = json.dumps(data).encode()
+        self.fixtures.append({
+            "id": match_id,
+            "home": {"id": str(general.get("homeTeam", {}).get("id")), "name": general.get("homeTeam", {}).get("name")},
+            "away": {"id": str(general.get("awayTeam", {}).get("id")), "name": general.get("awayTeam", {}).get("name")},
+            "status": {
+                "utcTime": general.get("matchTimeUTCDate"),
+                "started": general.get("started", True),
+                "finished": general.get("finished", True),
+            },
+        })
+
+    def league_response(self, league_id, season):
+        key = f"{league_id}_{season.replace('/', '_')}"
+        if key in self.leagues:
+            return self.leagues[key]
+        return json.dumps({
+            "details": {"id": league_id, "selectedSeason": season},
+            "fixtures": {"allMatches": self.fixtures},
+        }).encode()
+
+    def match_response(self, match_id):
+        return self.matches.get(str(match_id))
+
+
+def live_frame(data, minute):
+    """A recorded finished match as it would have looked at `minute` (None = full time)"""
+    frame = copy.deepcopy(data)
+    finished = minute is None
+    general = frame.setdefault("general", {})
+    general["started"], general["finished"] = True, finished
+    frame["ongoing"] = not finished
+    if finished:
+        return frame
+
+    content = frame.setdefault("content", {})
+    events = content.get("matchFacts", {}).get("events", {})
+    events["events"] = [e for e in events.get("events", []) if (e.get("time") or 0) <= minute]
+    shotmap = content.get("shotmap", {})
+    shotmap["shots"] = [s for s in shotmap.get("shots", []) or [] if (s.get("min") or 0) <= minute]
+    # the recorded stats are full-time totals; first-half totals appear from half-time on
+    periods = content.get("stats", {}).get("Periods", {})
+    content.get("stats", {})["Periods"] = {k: v for k, v in periods.items() if k == "FirstHalf" and minute >= 45}
+
+    scored = [e for e in events["events"] if e.get("type") == "Goal"]
+    home, away = (scored[-1].get("homeScore"), scored[-1].get("awayScore")) if scored else (0, 0)
+    status = frame.setdefault("header", {}).setdefault("status", {})
+    status.update({
+        "started": True,
+        "finished": False,
+        "scoreStr": f"{home} - {away}",
+        "reason": {"short": "HT"} if minute == 45 else {},
+        "liveTime": {"short": f"{minute}'"},
+    })
+    return frame
+
+
+class LiveReplayStore(FixtureStore):
+    """Replays recorded matches as in progress: every matchDetails request for a
+    match serves its next frame (minutes 0, `step`, ... 90, then full time), and
+    the fixtures list reports it finished once the last frame has been served."""
+
+    def __init__(self, fixture_dir=DEFAULT_FIXTURE_DIR, n_matches=None, step=5):
+        super().__init__(fixture_dir, n_matches)
+        self.lock = threading.Lock()
+        minutes = list(range(0, 91, step))
+        if 45 not in minutes:
+            minutes = sorted(minutes + [45])
+        self.frames = {}
+        for match_id, body in self.matches.items():
+            data = json.loads(body)
+            self.frames[match_id] = [json.dumps(live_frame(data, m)).encode() for m in minutes + [None]]
+        self.served = {match_id: 0 for match_id in self.frames}
+        for fixture in self.fixtures:
+            fixture["status"].update({"started": True, "finished": False})
+
+    def match_response(self, match_id):
+        match_id = str(match_id)
+        with self.lock:
+            frames = self.frames.get(match_id)
+            if frames is None:
+                return None
+            i = min(self.served[match_id], len(frames) - 1)
+            self.served[match_id] = i + 1
+            if i == len(frames) - 1:
+                for fixture in self.fixtures:
+                    if fixture["id"] == match_id:
+                        fixture["status"]["finished"] = True
+            return frames[i]
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    # set on the per-server subclass built in FixtureServer
+    store = None
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.send_error(503, "Injected upstream error")
+            return
+
+        if url.path == "/api/leagues":
+            body = self.store.league_response(params.get("id"), params.get("season", ""))
+        elif url.path == "/api/matchDetails":
+            body = self.store.match_response(params.get("matchId"))
+        else:
+            body = None
+
+        if body is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # the default handler writes every request to stderr
+        pass
+
+
+class FixtureServer:
+    """Threaded replay server on 127.0.0.1, usable as a context manager.
+
+    `latency` (+ uniform `jitter`) is added to every response in seconds and
+    `error_rate` is the fraction of requests answered with a 503.
+    """
+
+    def __init__(self, store, latency=0.0, jitter=0.0, error_rate=0.0, port=0):
+        handler = type("Handler", (FixtureRequestHandler,), {
+            "store": store,
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+        })
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Fixture server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve recorded FotMob fixtures locally")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--matches", type=int, default=None)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--live", action="store_true", help="replay matches as in progress, minute by minute")
+    args = parser.parse_args()
+
+    store_cls = LiveReplayStore if args.live else FixtureStore
+    server = FixtureServer(
+        store_cls(args.fixtures, n_matches=args.matches),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        port=args.port,
+    )
+    server.start()
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,223 @@
+"""
+Offline benchmark suite for the extraction path and the match parsers
+
+Usage (from the airflow/ directory):
+    python -m benchmarks.run_benchmarks --matches 38 --latency 0.05 --error-rate 0.02
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<previous>.json
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.fixture_server import DEFAULT_FIXTURE_DIR, FixtureServer, FixtureStore
+from extract import data_model_client as dmc
+from extract import json_backend
+from extract.match_structs import decode_match_details
+from extract.storage import LocalStorage, raw_json_key
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# name -> callable taking the decoded match payload
+PARSERS = {
+    "parse_teams": dmc.parse_teams,
+    "parse_leagues": dmc.parse_leagues,
+    "parse_players": dmc.parse_players,
+    "parse_player_intervals": dmc.parse_player_intervals,
+    "parse_events": dmc.parse_events,
+    "parse_matches": dmc.parse_matches,
+    "parse_stats": lambda data: dmc.parse_stats(data, "All", data.get("general", {}).get("matchId")),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def peak_memory(fn):
+    """Run fn once under tracemalloc and return the peak traced bytes"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def local_upload(root):
+    """Sink with the same signature and key layout as upload_to_s3, writing under root"""
+    storage = LocalStorage(root)
+
+    def upload(data, team_name, match_id, season):
+        body = data if isinstance(data, (bytes, bytearray)) else json_backend.dumps(data)
+        storage.put_bytes(raw_json_key(team_name, season, match_id), body)
+        return True
+    return upload
+
+
+def bench_extraction(store, latency, jitter, error_rate, request_delay):
+    from extract.extract_fotmob_data import run_extraction
+    from extract.fotmob_client import FotMobClient
+
+    sample = json.loads(next(iter(store.matches.values())))
+    general = sample["general"]
+    config = {
+        "team_id": general["awayTeam"]["id"],
+        "team_name": "benchmark",
+        "league_id": general["leagueId"],
+        "seasons": ["2024/2025"],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FixtureServer(store, latency=latency, jitter=jitter, error_rate=error_rate) as server:
+        config_path = os.path.join(tmp, "benchmark.json")
+        with open(config_path, "w") as f:
+            json.dump(config, f)
+        land_dir = os.path.join(tmp, "landed")
+
+        def run():
+            client = FotMobClient(base_url=server.base_url, request_delay=request_delay)
+            try:
+                return run_extraction(config_path, "2024/2025", client=client, upload=local_upload(land_dir),
+                                      storage=LocalStorage(land_dir), refresh=True)
+            finally:
+                client.close()
+
+        start = time.perf_counter()
+        uploaded = run()
+        elapsed = time.perf_counter() - start
+        landed_bytes = sum(os.path.getsize(p) for p in glob.glob(f"{land_dir}/**/*.json", recursive=True))
+        peak = peak_memory(run)
+
+    return {
+        "matches": len(store.matches),
+        "uploaded": uploaded,
+        "seconds": round(elapsed, 4),
+        "matches_per_sec": round(uploaded / elapsed, 2) if elapsed else None,
+        "landed_bytes": landed_bytes,
+        "peak_traced_bytes": peak,
+    }
+
+
+def bench_parsers(store, repeat):
+    payloads = [json.loads(body) for body in store.matches.values()]
+    results = {}
+    for name, parser in PARSERS.items():
+        rows = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for data in payloads:
+                rows += len(parser(data))
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "rows": rows,
+            "seconds": round(elapsed, 4),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+            "matches_per_sec": round(repeat * len(payloads) / elapsed, 1) if elapsed else None,
+            "peak_traced_bytes": peak_memory(lambda: [parser(data) for data in payloads]),
+        }
+    return results
+
+
+def bench_decode(store, repeat):
+    """Full payload decode vs the typed subset decode used ahead of the parsers"""
+    bodies = list(store.matches.values())
+    results = {}
+    for name, decode in (("full", json_backend.loads), ("subset", decode_match_details)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for body in bodies:
+                decode(body)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "seconds": round(elapsed, 4),
+            "matches_per_sec": round(repeat * len(bodies) / elapsed, 1) if elapsed else None,
+            "peak_traced_bytes": peak_memory(lambda: decode(bodies[0])),
+        }
+    return results
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def delta(label, new, old):
+        if new is None or not old:
+            return
+        logger.info(f"{label}: {old} -> {new} ({(new - old) / old:+.1%})")
+
+    logger.info(f"Comparing against {baseline_path} (commit {baseline.get('commit')})")
+    delta("extraction matches/sec",
+          current["extraction"]["matches_per_sec"], baseline["extraction"].get("matches_per_sec"))
+    delta("extraction peak bytes",
+          current["extraction"]["peak_traced_bytes"], baseline["extraction"].get("peak_traced_bytes"))
+    for name, stats in current.get("decode", {}).items():
+        old = baseline.get("decode", {}).get(name, {})
+        delta(f"decode {name} matches/sec", stats["matches_per_sec"], old.get("matches_per_sec"))
+        delta(f"decode {name} peak bytes", stats["peak_traced_bytes"], old.get("peak_traced_bytes"))
+    for name, stats in current["parsers"].items():
+        old = baseline.get("parsers", {}).get(name, {})
+        delta(f"{name} rows/sec", stats["rows_per_sec"], old.get("rows_per_sec"))
+        delta(f"{name} peak bytes", stats["peak_traced_bytes"], old.get("peak_traced_bytes"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline FotMob ETL benchmarks")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--matches", type=int, default=38, help="matches to replay (recorded fixtures are cloned)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stub response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform extra latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are 503s")
+    parser.add_argument("--request-delay", type=float, default=0.0, help="client rate-limit sleep per request")
+    parser.add_argument("--repeat", type=int, default=5, help="parser passes over the fixture set")
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<ts>_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="previous results file to diff against")
+    args = parser.parse_args()
+
+    store = FixtureStore(args.fixtures, n_matches=args.matches)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "json_backend": json_backend.backend,
+        "params": vars(args),
+        "extraction": bench_extraction(store, args.latency, args.jitter, args.error_rate, args.request_delay),
+        "decode": bench_decode(store, args.repeat),
+        "parsers": bench_parsers(store, args.repeat),
+        # ru_maxrss is KiB on Linux
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{results['commit']}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return results
+
+
+if __name__ == "__main__":
+    main()
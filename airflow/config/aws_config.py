@@ -3,6 +3,12 @@ S3_BUCKET = "real-madrid-fotmob-data"
 
 S3_PATHS = {
     "raw_json": "raw/json",
+    "raw_index": "raw/index",
+    "history": "processed/history",
+    "raw_live": "raw/live",
+    "raw_fixtures": "raw/fixtures",
+    # one small object per team/season, rewritten whenever the extractor lands matches
+    "raw_markers": "raw/markers",
     "raw_matches": "raw/matches",
     "raw_players": "raw/players",
     "processed_matches": "processed/matches",
@@ -13,3 +19,49 @@ S3_PATHS = {
 REAL_MADRID_TEAM_ID = 8633
 LA_LIGA_ID = 87
 SEASONS = ["2024/2025", "2023/2024", "2022/2023", "2021/2022"]
+CHAMPIONS_LEAGUE_ID = 42
+COPA_DEL_REY_ID = 138
+
+# Whole competitions extracted through the work queue (extract/work_queue.py), landed under
+# raw/json/{name}/{season}/. The first season is the current one; priority orders competitions
+# within a tier (lower first).
+COMPETITIONS = {
+    "laliga": {"league_id": LA_LIGA_ID, "seasons": SEASONS, "priority": 0},
+    "champions_league": {"league_id": CHAMPIONS_LEAGUE_ID, "seasons": SEASONS, "priority": 0},
+    "copa_del_rey": {"league_id": COPA_DEL_REY_ID, "seasons": SEASONS, "priority": 1},
+}
+
+# Land matchDetails response bodies as received (no decode / re-encode round trip)
+RAW_PASSTHROUGH = True
+
+# Local state kept on the mounted data volume (see .dev_container/docker-compose.yaml)
+CHECKPOINT_DIR = "/opt/airflow/data/checkpoints"
+# Read-through disk cache of raw/json objects (extract/storage.py CachedStorage)
+RAW_CACHE_DIR = "/opt/airflow/data/cache"
+RAW_CACHE_MAX_BYTES = 20 * 2**30
+# SQLite work queue shared by every extraction worker on the host, with the shared FotMob rate budget
+WORK_QUEUE_PATH = "/opt/airflow/data/queue/extract.sqlite"
+# Output of opt-in profiling runs (extract/profiling.py, FOTMOB_PROFILE or the DAG "profile" param)
+PROFILE_DIR = "/opt/airflow/data/profiles"
+
+# Sections of matchDetails each output product reads (dotted paths, kept whole).
+# The extractor lands only the union of LANDED_PRODUCTS (None lands the full response).
+SECTION_ALLOWLISTS = {
+    # data_model_client parsers and the dbt staging models
+    "parsers": [
+        "general",
+        "header",
+        "content.matchFacts.infoBox",
+        "content.matchFacts.events",
+        "content.lineup",
+        "content.stats",
+        "seo.eventJSONLD",
+    ],
+    "shots": ["general", "content.shotmap"],
+    # read by the history stage into dim_historical_matches (extract/history.py), not landed
+    "history": ["general", "content.h2h", "content.matchFacts.teamForm"],
+    "player_stats": ["general", "content.playerStats"],
+    # in-match polling (extract/live.py); diffed against the previous poll, never landed whole
+    "live": ["general", "header.status", "content.matchFacts.events", "content.shotmap.shots", "content.stats"],
+}
+LANDED_PRODUCTS = ["parsers", "shots"]
@@ -0,0 +1,54 @@
+from airflow import DAG
+from airflow.providers.standard.operators.python import PythonOperator
+from datetime import datetime, timedelta
+import os
+
+default_args = {
+    "owner": "airflow",
+    "retries": 1,
+    "retry_delay": timedelta(minutes=5),
+}
+
+# worker tasks per run; they share the FotMob rate budget, so more workers add concurrency, not requests/s
+WORKERS = 4
+# each worker stops claiming before the next run starts
+WORK_MINUTES = 50
+
+
+def enqueue_competitions(params=None):
+    from extract.profiling import profiled
+    from extract.work_queue import WorkQueue, enqueue_competitions
+    with profiled("queue_enqueue", (params or {}).get("profile") or None):
+        return enqueue_competitions(WorkQueue())
+
+
+def run_queue_worker(worker, params=None):
+    from extract.profiling import profiled
+    from extract.work_queue import WorkQueue, run_worker
+    with profiled(f"queue_worker_{worker}", (params or {}).get("profile") or None):
+        return run_worker(WorkQueue(), worker=f"{os.uname().nodename}-airflow-{worker}", max_seconds=WORK_MINUTES * 60)
+
+with DAG(
+    dag_id="fotmob-etl-competition_queue",
+    default_args=default_args,
+    # fresh matches are queued ahead of the backlog, so an hourly run lands them within the hour
+    schedule="0 * * * *",
+    start_date=datetime(2024, 1, 1),
+    catchup=False,
+    max_active_runs=1,
+    tags=["fotmob", "extraction", "queue"],
+    # "" = profiling off; timing / sample / cprofile (extract/profiling.py)
+    params={"profile": ""},
+) as dag:
+
+    enqueue = PythonOperator(
+        task_id="enqueue_competitions",
+        python_callable=enqueue_competitions,
+    )
+
+    for worker in range(WORKERS):
+        enqueue >> PythonOperator(
+            task_id=f"queue_worker_{worker}",
+            python_callable=run_queue_worker,
+            op_args=[worker],
+        )
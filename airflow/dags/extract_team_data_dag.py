@@ -13,9 +13,13 @@ default_args = {
 CONFIG_DIR = "/opt/airflow/config/teams"
 
 
-def run_team_extraction(config_path, season):
+def run_team_extraction(config_path, season, params=None):
     from extract.extract_fotmob_data import run_extraction
-    return run_extraction(config_path, season)
+    from extract.profiling import profiled
+    # trigger with {"profile": "sample"} (or set FOTMOB_PROFILE) to profile the task run
+    run_name = f"{os.path.basename(config_path)[:-len('.json')]}_{season.replace('/', '_')}"
+    with profiled(run_name, (params or {}).get("profile") or None):
+        return run_extraction(config_path, season)
 
 with DAG(
     dag_id="fotmob-etl-extract_teams",
@@ -24,6 +28,8 @@ with DAG(
     start_date=datetime(2024, 1, 1),
     catchup=False,
     tags=["fotmob", "extraction"],
+    # "" = profiling off; timing / sample / cprofile (extract/profiling.py)
+    params={"profile": ""},
 ) as dag:
     
     # Find all team config files
@@ -0,0 +1,45 @@
+from airflow import DAG
+from airflow.providers.standard.operators.python import PythonOperator
+from datetime import datetime, timedelta
+import os
+import glob
+
+default_args = {
+    "owner": "airflow",
+    "retries": 1,
+    "retry_delay": timedelta(minutes=5),
+}
+
+CONFIG_DIR = "/opt/airflow/config/teams"
+
+
+def run_team_schedule(config_path, params=None):
+    from extract.profiling import profiled
+    from extract.scheduler import run_scheduled
+    with profiled(f"schedule_{os.path.basename(config_path)[:-len('.json')]}", (params or {}).get("profile") or None):
+        return run_scheduled(config_path)
+
+with DAG(
+    dag_id="fotmob-etl-fixture_scheduler",
+    default_args=default_args,
+    # cheap when nothing is due: the fixtures calendar is cached, no API calls until a final whistle
+    schedule="*/15 * * * *",
+    start_date=datetime(2024, 1, 1),
+    catchup=False,
+    max_active_runs=1,
+    tags=["fotmob", "extraction", "scheduler"],
+    # "" = profiling off; timing / sample / cprofile (extract/profiling.py)
+    params={"profile": ""},
+) as dag:
+    
+    # One task per team config, current season (first in the config)
+    config_files = glob.glob(f"{CONFIG_DIR}/*.json")
+    
+    for config_path in config_files:
+        team_name = os.path.basename(config_path).replace(".json", "")
+        
+        PythonOperator(
+            task_id=f"schedule_{team_name}",
+            python_callable=run_team_schedule,
+            op_args=[config_path],
+        )
@@ -0,0 +1,192 @@
+"""
+Resumable backfill over every configured team and season
+
+Usage (from the airflow/ directory):
+    python -m extract.backfill --config config/teams/real_madrid.json --workers 4
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from extract.extract_fotmob_data import (
+    extract_team_matches,
+    land_matches,
+    load_team_config,
+    s3_client,
+    upload_to_s3,
+)
+from extract.fotmob_client import FotMobClient
+from extract.history import HistoryStore
+from extract.match_index import MatchIndex
+from extract.profiling import profiled
+from extract.storage import S3Storage, raw_json_key
+from config.aws_config import CHECKPOINT_DIR, SEASONS #type:ignore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "..", "config", "teams")
+
+
+class Checkpoint:
+    """Append-only per team/season log of landed match ids.
+
+    Each landed match is written and fsynced before the next one starts, so
+    a killed task resumes at the first match it had not finished.
+    """
+
+    def __init__(self, checkpoint_dir, team_name, season):
+        self.path = os.path.join(checkpoint_dir, team_name, f"{season.replace('/', '_')}.jsonl")
+        self.lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        self.done.add(str(json.loads(line)["match_id"]))
+                    except (ValueError, KeyError):
+                        # a torn last line from a killed run, the match is simply refetched
+                        continue
+
+    def __contains__(self, match_id):
+        return str(match_id) in self.done
+
+    def mark(self, match_id):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({
+                    "match_id": str(match_id),
+                    "landed_at": datetime.now(timezone.utc).isoformat(),
+                }) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.done.add(str(match_id))
+
+
+class Progress:
+    """Thread-safe throughput / ETA reporting across all seasons of a backfill"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+
+    def add_total(self, n):
+        with self.lock:
+            self.total += n
+
+    def advance(self, label, ok=True):
+        with self.lock:
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+            finished = self.done + self.failed
+            elapsed = time.monotonic() - self.start
+            rate = finished / elapsed if elapsed else 0.0
+            remaining = self.total - finished
+            eta = remaining / rate if rate else float("inf")
+        logger.info(
+            f"[{label}] {finished}/{self.total} matches ({self.failed} failed), "
+            f"{rate:.2f} matches/s, ETA {eta:.0f}s"
+        )
+
+
+def backfill_season(client, config, season, checkpoint_dir, progress, upload=upload_to_s3, storage=None):
+    team_name = config["team_name"]
+    label = f"{team_name} {season}"
+    checkpoint = Checkpoint(checkpoint_dir, team_name, season)
+    storage = storage or S3Storage(client=s3_client)
+    index = MatchIndex(storage, team_name, season)
+    history = HistoryStore(storage, team_name, season)
+
+    # a killed run leaves checkpointed matches that never reached the index
+    for match_id in sorted(checkpoint.done):
+        if match_id not in index:
+            key = raw_json_key(team_name, season, match_id)
+            body, _ = storage.get_versioned(key)
+            if body is None:
+                # checkpointed but never landed in this bucket: fetch it again
+                logger.warning(f"[{label}] Match {match_id} is checkpointed but {key} is missing, refetching")
+                checkpoint.done.discard(match_id)
+                continue
+            index.add(match_id, key, body)
+
+    match_ids = extract_team_matches(client, config, season)
+    pending = [m for m in match_ids if m not in checkpoint and m not in index]
+    logger.info(f"[{label}] {len(match_ids) - len(pending)} already landed, {len(pending)} to go")
+    progress.add_total(len(pending))
+
+    landed = 0
+    try:
+        for match_id, ok in land_matches(client, pending, team_name, season, upload, index, history=history):
+            if ok:
+                checkpoint.mark(match_id)
+                landed += 1
+            progress.advance(label, ok)
+    finally:
+        index.save()
+        history.save()
+    return landed
+
+
+def run_backfill(config_paths, seasons=None, workers=None, checkpoint_dir=CHECKPOINT_DIR, client=None,
+                 upload=upload_to_s3, storage=None):
+    """Walk every (team config, season) pair, seasons in parallel under one shared rate budget
+    and one shared adaptive controller"""
+    jobs = []
+    for config_path in config_paths:
+        config = load_team_config(config_path)
+        for season in seasons or config.get("seasons") or SEASONS:
+            jobs.append((config, season))
+
+    # one client for every worker, so its RateLimiter and AdaptiveController are shared
+    owns_client = client is None
+    client = client or FotMobClient()
+    progress = Progress()
+    landed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers or len(jobs) or 1) as pool:
+            futures = {
+                pool.submit(backfill_season, client, config, season, checkpoint_dir, progress, upload, storage): (
+                    config, season)
+                for config, season in jobs
+            }
+            for future in as_completed(futures):
+                config, season = futures[future]
+                try:
+                    landed += future.result()
+                except Exception as e:
+                    logger.error(f"Backfill failed for {config['team_name']} {season}: {e}")
+    finally:
+        if owns_client:
+            client.close()
+
+    logger.info(f"Backfill complete: {landed} matches landed, {progress.failed} failed")
+    return landed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable FotMob backfill")
+    parser.add_argument("--config", action="append", help="team config file (repeatable, default: all in config/teams)")
+    parser.add_argument("--season", action="append", help="season like 2023/2024 (repeatable, default: config seasons)")
+    parser.add_argument("--workers", type=int, default=None, help="seasons fetched in parallel")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    args = parser.parse_args()
+
+    config_paths = args.config or sorted(glob.glob(os.path.join(CONFIG_DIR, "*.json")))
+    with profiled("backfill"):
+        return run_backfill(config_paths, args.season, args.workers, args.checkpoint_dir)
+
+
+if __name__ == "__main__":
+    main()
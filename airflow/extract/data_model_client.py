@@ -3,6 +3,9 @@ Library for parsing match JSON data for FotMob
 """
 import pandas as pd
 
+from extract.profiling import timed
+
+@timed("data_model_client.parse_teams")
 def parse_teams(data):
     """Extract dim_teams from match JSON"""
     rows = []
@@ -49,6 +52,7 @@ def parse_teams(data):
     
     return rows
 
+@timed("data_model_client.parse_leagues")
 def parse_leagues(data):
     """Extract dim_leagues from match JSON"""
     general = data.get("general", {})
@@ -58,12 +62,157 @@ def parse_leagues(data):
         "league_name": general.get("leagueName"),
     }]
 
+RED_CARDS = ("Red", "YellowRed")
+
+@timed("data_model_client.match_timeline")
+def match_timeline(data):
+    """On-pitch minutes of substitutions and red cards from matchFacts events.
+
+    Minutes are elapsed playing time including added time: 45+3 is 48 and
+    the 46th minute is 46 plus the first-half added time, so minutes from
+    different halves line up. performance.substitutionEvents only carries the
+    clock minute (a 90+3 sub reads 90), which is the fallback.
+    """
+    events = (data.get("content", {})
+                  .get("matchFacts", {})
+                  .get("events", {})
+                  .get("events", []))
+
+    # announced added time per period, keyed by the minute it was shown at (45, 90, 105, 120)
+    added = {e.get("time"): e.get("minutesAddedInput") or 0 for e in events if e.get("type") == "AddedTime"}
+    period_starts = [45, 90, 105]
+
+    def elapsed(time, overload=None):
+        time = time or 0
+        offset = sum(added.get(start, 0) for start in period_starts if time > start)
+        return time + offset + (overload or 0)
+
+    general = data.get("general", {})
+    team_ids = {True: general.get("homeTeam", {}).get("id"), False: general.get("awayTeam", {}).get("id")}
+
+    timeline = {"sub_in": {}, "sub_out": {}, "sent_off": {}, "rows": []}
+    last = 0
+    for e in events:
+        event_type = e.get("type")
+        minute = elapsed(e.get("time"), e.get("overloadTime"))
+        last = max(last, minute)
+        player_id, related_id = e.get("playerId"), None
+        if event_type == "Substitution":
+            swap = e.get("swap") or []
+            if len(swap) == 2:
+                # swap is [player coming on, player going off]
+                player_id, related_id = swap[0].get("id"), swap[1].get("id")
+                timeline["sub_in"][str(player_id)] = minute
+                timeline["sub_out"][str(related_id)] = minute
+        elif event_type == "Card" and e.get("card") in RED_CARDS:
+            timeline["sent_off"][str(player_id)] = minute
+        elif event_type == "Goal":
+            related_id = e.get("assistPlayerId")
+        elif event_type == "Half":
+            # a half ends after its announced added time
+            minute = elapsed(e.get("time"), added.get(e.get("time")))
+
+        # homeScore / awayScore is the score before the event, newScore the score after a goal
+        score = e.get("newScore") or [e.get("homeScore"), e.get("awayScore")]
+        is_home = e.get("isHome")
+        timeline["rows"].append({
+            "match_id": general.get("matchId"),
+            "event_id": e.get("eventId"),
+            "event_type": event_type,
+            "minute": e.get("time"),
+            "added_time": e.get("overloadTime") or 0,
+            "elapsed_minute": minute,
+            "is_home": is_home,
+            "team_id": team_ids.get(is_home),
+            "player_id": player_id,
+            "related_player_id": related_id,
+            "card": e.get("card"),
+            "own_goal": e.get("ownGoal"),
+            "penalty_shootout": e.get("isPenaltyShootoutEvent"),
+            "home_score": score[0],
+            "away_score": score[1],
+        })
+
+    regulation = 120 if any((e.get("time") or 0) > 90 and e.get("type") != "AddedTime" for e in events) else 90
+    timeline["end"] = max(elapsed(regulation, added.get(regulation)), last)
+    timeline["elapsed"] = elapsed
+    return timeline
+
+EVENT_TYPES = ["Goal", "Card", "Substitution", "VAR", "MissedPenalty", "AddedTime", "Half", "Other"]
+EVENT_DTYPES = {
+    "match_id": "int64", "event_id": "Int64", "event_type": pd.CategoricalDtype(EVENT_TYPES), "minute": "Int16", "added_time": "Int16",
+    "elapsed_minute": "Int16", "is_home": "boolean", "team_id": "Int64", "player_id": "Int64",
+    "related_player_id": "Int64", "card": "string", "own_goal": "boolean", "penalty_shootout": "boolean",
+    "home_score": "Int16", "away_score": "Int16",
+}
+EVENT_ID_COLUMNS = ("match_id", "event_id", "team_id", "player_id", "related_player_id")
+
+@timed("data_model_client.parse_events")
+def parse_events(data, timeline=None):
+    """Extract the matchFacts event timeline, one row per event (typed by event_frame()).
+
+    minute / added_time are the clock (90 + 3), elapsed_minute the playing
+    time from match_timeline() so events of different halves order and
+    subtract correctly. home_score / away_score are the score after the event.
+    """
+    timeline = timeline or match_timeline(data)
+    return timeline["rows"]
+
+def event_frame(events):
+    """parse_events rows (or a DataFrame of them, e.g. a whole batch) as a typed table with EVENT_DTYPES.
+
+    Typing is per batch rather than per match: building a typed DataFrame
+    costs more than every parser together at the size of one match.
+    """
+    frame = events if isinstance(events, pd.DataFrame) else pd.DataFrame(events, columns=list(EVENT_DTYPES))
+    frame = frame.copy()
+    for column in EVENT_ID_COLUMNS:
+        # swap ids are strings, eventId / playerId ints
+        frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    frame["event_type"] = frame["event_type"].where(frame["event_type"].isin(EVENT_TYPES), "Other")
+    return frame.astype(EVENT_DTYPES)
+
 def parse_players(data):
+    """Extract fact player rows from match JSON"""
+    players, _ = parse_players_and_intervals(data)
+    return players
+
+def parse_player_intervals(data):
+    """Extract (match_id, player_id, on_minute, off_minute, minutes_played) intervals from match JSON"""
+    _, intervals = parse_players_and_intervals(data)
+    return intervals
+
+@timed("data_model_client.parse_players_and_intervals")
+def parse_players_and_intervals(data, timeline=None):
+    """Player rows and on-pitch intervals built in one pass over the lineup"""
     general = data.get("general", {})
     lineup = data.get("content", {}).get("lineup", {})
 
     match_id = general.get("matchId")
     rows = []
+    intervals = []
+    timeline = timeline or match_timeline(data)
+
+    def add_interval(p, team_id, on_minute, on_reason, clock_off):
+        player_id = str(p.get("id"))
+        if player_id in timeline["sent_off"]:
+            off_minute, off_reason = timeline["sent_off"][player_id], "red_card"
+        elif player_id in timeline["sub_out"]:
+            off_minute, off_reason = timeline["sub_out"][player_id], "sub"
+        elif clock_off is not None:
+            off_minute, off_reason = timeline["elapsed"](clock_off), "sub"
+        else:
+            off_minute, off_reason = timeline["end"], "full_time"
+        intervals.append({
+            "match_id": match_id,
+            "team_id": team_id,
+            "player_id": p.get("id"),
+            "on_minute": on_minute,
+            "off_minute": off_minute,
+            "minutes_played": max(off_minute - on_minute, 0),
+            "on_reason": on_reason,
+            "off_reason": off_reason,
+        })
 
     def extract_players(team, side):
         team_id = team.get("id")
@@ -71,6 +220,13 @@ def parse_players(data):
 
         # -------- starters --------
         for p in team.get("starters", []):
+            sub_out_time = next(
+                (e.get("time") for e in p.get("performance", {})
+                 .get("substitutionEvents", [])
+                 if e.get("type") == "subOut"),
+                None
+            )
+
             rows.append({
                 "match_id": match_id,
                 "team_id": team_id,
@@ -92,25 +248,17 @@ def parse_players(data):
 
                 "rating": p.get("performance", {}).get("rating"),
                 "sub_in_time": None,
-                "sub_out_time": next(
-                    (e.get("time") for e in p.get("performance", {})
-                     .get("substitutionEvents", [])
-                     if e.get("type") == "subOut"),
-                    None
-                ),
+                "sub_out_time": sub_out_time,
 
                 "unavailability_type": None,
                 "expected_return": None,
             })
+            add_interval(p, team_id, 0, "start", sub_out_time)
 
         # -------- subs --------
         for p in team.get("subs", []):
-            sub_in_time = next(
-                (e.get("time") for e in p.get("performance", {})
-                 .get("substitutionEvents", [])
-                 if e.get("type") == "subIn"),
-                None
-            )
+            sub_events = p.get("performance", {}).get("substitutionEvents", [])
+            sub_in_time = next((e.get("time") for e in sub_events if e.get("type") == "subIn"), None)
 
             rows.append({
                 "match_id": match_id,
@@ -139,6 +287,13 @@ def parse_players(data):
                 "expected_return": None,
             })
 
+            # unused subs never get an interval
+            player_id = str(p.get("id"))
+            if player_id in timeline["sub_in"] or sub_in_time is not None:
+                on_minute = timeline["sub_in"].get(player_id, timeline["elapsed"](sub_in_time))
+                sub_out_time = next((e.get("time") for e in sub_events if e.get("type") == "subOut"), None)
+                add_interval(p, team_id, on_minute, "sub", sub_out_time)
+
         # -------- unavailable --------
         for p in team.get("unavailable", []):
             rows.append({
@@ -175,8 +330,9 @@ def parse_players(data):
     if "awayTeam" in lineup:
         extract_players(lineup["awayTeam"], "away")
 
-    return pd.DataFrame(rows)
+    return pd.DataFrame(rows), pd.DataFrame(intervals)
 
+@timed("data_model_client.parse_matches")
 def parse_matches(data):
     """Extract fact_matches from match JSON"""
     general = data.get("general", {})
@@ -203,6 +359,7 @@ def parse_matches(data):
         "away_lineup": get_starter_ids(lineup.get("awayTeam", {}))
     }]
 
+@timed("data_model_client.parse_stats")
 def parse_stats(data, period, match_id):
     """Extract fact_stats from match JSON"""
     rows = []
@@ -235,26 +392,22 @@ def parse_stats(data, period, match_id):
     return rows
 
 
-
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, explode, lit
-
-from pyspark.sql.types import (
-    StructType,
-    StructField,
-    StringType,
-    IntegerType,
-    ArrayType,
-    BooleanType,
-    MapType,
-    FloatType,
-    DoubleType,
-    LongType,
-    TimestampType,
-)
-from pyspark.sql.functions import col, explode, lit, when
-
 def fotmob_schema():
+    # pyspark is only needed for the schema, keep it out of the parser import path
+    from pyspark.sql.types import (
+        StructType,
+        StructField,
+        StringType,
+        IntegerType,
+        ArrayType,
+        BooleanType,
+        MapType,
+        FloatType,
+        DoubleType,
+        LongType,
+        TimestampType,
+    )
+
     shot_struct = StructType([
         StructField("id", LongType(), True),
         StructField("eventType", StringType(), True),
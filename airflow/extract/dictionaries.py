@@ -0,0 +1,147 @@
+"""
+Shared string dictionaries for the reprocessor's parquet outputs
+
+The parsers repeat the same few strings on every row: the side, role and
+availability of every players row, the category / key / name of every stat
+of every period of every match. Each batch turns those columns into pandas
+categoricals right after parsing (so validation, the worker IPC streams and
+the writer buffers hold codes instead of one string object per row), and
+the writer maps the batch's small local dictionaries onto one append-only
+registry per output prefix, so buffered batches concatenate without
+re-encoding. The player names and countries live in dim_players (the fact
+rows drop them), which is encoded the same way when it is saved.
+
+Every part file of every run carries the registry's dictionary as it
+stood when the part was written, so all parts share the same codes (an
+earlier part sees a prefix of the dictionary): parquet stores each string
+once per column chunk, and the columns read back as categoricals that
+concatenate, join and group without comparing strings. The registry is
+saved to {output_prefix}/_dictionaries/dictionaries.json at the end of a
+run; codes are never reassigned, new values are appended.
+Columns that hold the same kind of value share a dictionary (team_name,
+home_ and away_formation).
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from extract import json_backend
+
+logger = logging.getLogger(__name__)
+
+# output table -> {column: dictionary}
+DICTIONARY_COLUMNS = {
+    "teams": {"team_name": "team_name", "country_code": "country_code",
+              "stadium_name": "stadium_name", "stadium_city": "city"},
+    "leagues": {"league_name": "league_name"},
+    "players": {"side": "side", "role": "player_role", "unavailability_type": "unavailability_type"},
+    "dim_players": {"name": "player_name", "first_name": "first_name", "last_name": "last_name",
+                    "country_name": "country_name", "country_code": "country_code"},
+    "player_intervals": {"on_reason": "interval_reason", "off_reason": "interval_reason"},
+    "matches": {"home_formation": "formation", "away_formation": "formation"},
+    "stats": {"period": "period", "stat_category": "stat_category", "stat_key": "stat_key", "stat_name": "stat_name"},
+}
+
+
+def dictionaries_key(output_prefix):
+    return f"{output_prefix}/_dictionaries/dictionaries.json"
+
+
+def categorize(tables):
+    """Batch DataFrames with their DICTIONARY_COLUMNS as categoricals (batch-local categories)"""
+    for name, frame in tables.items():
+        columns = [c for c in DICTIONARY_COLUMNS.get(name, ()) if c in frame.columns]
+        if columns:
+            tables[name] = frame.astype({column: "category" for column in columns})
+    return tables
+
+
+class DictionaryRegistry:
+    """Append-only string -> int32 code dictionaries, persisted as one JSON object"""
+
+    def __init__(self, storage=None, key=None):
+        self.storage = storage
+        self.key = key
+        self.values = {}
+        self.codes_by_value = {}
+        self.arrays = {}
+        self.added = 0
+        if storage is not None and key and storage.exists(key):
+            for name, values in json_backend.loads(storage.get_bytes(key))["dictionaries"].items():
+                self.values[name] = list(values)
+                self.codes_by_value[name] = {value: code for code, value in enumerate(values)}
+
+    def codes(self, name, values):
+        """Codes of `values` in dictionary `name`, appending the ones it has not seen"""
+        known = self.codes_by_value.setdefault(name, {})
+        dictionary = self.values.setdefault(name, [])
+        out = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = known.get(value)
+            if code is None:
+                code = known[value] = len(dictionary)
+                dictionary.append(value)
+                self.added += 1
+            out[i] = code
+        return out
+
+    def dictionary(self, name):
+        """The whole dictionary as one Arrow array, shared by every column and chunk that uses it"""
+        values = self.values.get(name, [])
+        array = self.arrays.get(name)
+        if array is None or len(array) != len(values):
+            array = self.arrays[name] = pa.array(values, pa.string())
+        return array
+
+    def encode(self, table, rows):
+        """Rows of an output table with its dictionary columns as int32 codes into the registry.
+
+        `rows` is a batch DataFrame or an Arrow table from a worker; tables
+        without dictionary columns come back unchanged, the others as Arrow.
+        """
+        columns = DICTIONARY_COLUMNS.get(table, {})
+        names = rows.columns if isinstance(rows, pd.DataFrame) else rows.column_names
+        if not any(column in names for column in columns):
+            return rows
+        if isinstance(rows, pd.DataFrame):
+            rows = pa.Table.from_pandas(rows, preserve_index=False)
+        for column, name in columns.items():
+            if column not in rows.column_names:
+                continue
+            values = rows.column(column)
+            if not pa.types.is_dictionary(values.type):
+                values = pc.dictionary_encode(values)
+            chunks = []
+            for chunk in values.chunks:
+                # only the batch's distinct values are looked up, the rows are one take()
+                mapping = pa.array(self.codes(name, chunk.dictionary.to_pylist()), pa.int32())
+                indices = pc.take(mapping, chunk.indices)
+                chunks.append(pa.DictionaryArray.from_arrays(indices, self.dictionary(name)))
+            i = rows.schema.get_field_index(column)
+            rows = rows.set_column(i, pa.field(column, pa.dictionary(pa.int32(), pa.string())),
+                                   pa.chunked_array(chunks, pa.dictionary(pa.int32(), pa.string())))
+        return rows
+
+    def unify(self, table, rows):
+        """An Arrow table whose dictionary columns all use the registry's current dictionaries"""
+        for column, name in DICTIONARY_COLUMNS.get(table, {}).items():
+            if column not in rows.column_names or not pa.types.is_dictionary(rows.schema.field(column).type):
+                continue
+            # earlier batches saw a prefix of the dictionary, their codes stay valid
+            dictionary = self.dictionary(name)
+            chunks = [pa.DictionaryArray.from_arrays(chunk.indices, dictionary) for chunk in rows.column(column).chunks]
+            rows = rows.set_column(rows.schema.get_field_index(column), rows.schema.field(column),
+                                   pa.chunked_array(chunks, rows.schema.field(column).type))
+        return rows
+
+    def save(self):
+        if self.storage is None or not self.key or not self.added:
+            return
+        body = {"dictionaries": self.values}
+        self.storage.put_bytes(self.key, json_backend.dumps(body), "application/json")
+        sizes = ", ".join(f"{name} {len(values)}" for name, values in sorted(self.values.items()))
+        logger.info(f"Saved {self.added} new dictionary values to {self.key} ({sizes})")
+        self.added = 0
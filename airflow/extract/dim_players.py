@@ -0,0 +1,139 @@
+"""
+Type-2 slowly changing player dimension built from the parsed players rows
+
+parse_players repeats every player attribute on every match row. The
+reprocessor splits each batch into slim fact rows (integer keys plus the
+match-specific fields) and attribute observations: one row per run of equal
+attribute hashes per player, with the first and last match time it was
+seen. At the end of a run the observations are merged with the stored
+dimension into versions with valid_from / valid_to, so a changed
+nationality, name or usual position (or a birthday) opens a new version
+instead of a new copy per match. Age is not an attribute (it would version
+every player on every birthday and the payload has no birth date); it
+stays on the fact rows as the age at the match.
+"""
+import io
+import logging
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+PLAYER_ATTRIBUTES = ["name", "first_name", "last_name", "country_name", "country_code", "usual_position_id"]
+KEY_COLUMNS = ["match_id", "team_id", "player_id"]
+# denormalized team attribute, dim_teams / the teams table has it
+DROPPED_FACT_COLUMNS = PLAYER_ATTRIBUTES + ["team_name"]
+OBSERVATION_COLUMNS = ["player_id", *PLAYER_ATTRIBUTES, "attr_hash", "first_seen", "last_seen"]
+DIM_COLUMNS = ["player_key", "player_id", *PLAYER_ATTRIBUTES, "attr_hash",
+               "valid_from", "valid_to", "last_seen", "is_current"]
+
+
+def normalize_attributes(df):
+    """Attribute columns with stable dtypes, so equal values hash equally across batches"""
+    out = df[PLAYER_ATTRIBUTES].copy()
+    out["usual_position_id"] = pd.to_numeric(out["usual_position_id"], errors="coerce").astype("Int64")
+    for column in ("name", "first_name", "last_name", "country_name", "country_code"):
+        out[column] = out[column].astype("string")
+    return out
+
+
+def attribute_hash(attributes):
+    return pd.util.hash_pandas_object(attributes, index=False).astype("int64").to_numpy()
+
+
+def compact_observations(observations):
+    """Collapse consecutive sightings of the same attributes into one row per run.
+
+    Rows are ordered by player and first sighting; a run ends when the
+    attribute hash changes, so A, B, A stays three rows while A, A, B is two.
+    """
+    if observations.empty:
+        return observations
+    obs = observations.sort_values(["player_id", "first_seen"], kind="stable")
+    changed = obs["player_id"].ne(obs["player_id"].shift()) | obs["attr_hash"].ne(obs["attr_hash"].shift())
+    agg = {column: "first" for column in ["player_id", *PLAYER_ATTRIBUTES, "attr_hash"]}
+    agg.update({"first_seen": "min", "last_seen": "max"})
+    return obs.groupby(changed.cumsum().to_numpy(), sort=True).agg(agg).reset_index(drop=True)[OBSERVATION_COLUMNS]
+
+
+def split_players(players, matches):
+    """Batch players rows -> (slim fact rows, compacted attribute observations)"""
+    # rows without their keys only get here with validation off; they cannot be facts
+    players = players.dropna(subset=KEY_COLUMNS)
+    facts = players.drop(columns=[c for c in DROPPED_FACT_COLUMNS if c in players.columns])
+    facts = facts.astype({column: "int64" for column in KEY_COLUMNS})
+
+    times = matches.astype({"match_id": "int64"}).drop_duplicates("match_id").set_index("match_id")
+    seen = pd.to_datetime(times["match_time_utc"], utc=True).reindex(facts["match_id"].to_numpy()).to_numpy()
+
+    attributes = normalize_attributes(players)
+    observations = attributes.assign(
+        player_id=facts["player_id"].to_numpy(),
+        attr_hash=attribute_hash(attributes),
+        first_seen=seen,
+        last_seen=seen,
+    ).dropna(subset=["first_seen"])
+    return facts.reset_index(drop=True), compact_observations(observations)
+
+
+def build_scd2(dim, observations):
+    """Merge observations into a (possibly empty) stored dimension, returning all versions"""
+    points = [observations[OBSERVATION_COLUMNS]] if len(observations) else []
+    if dim is not None and len(dim):
+        # stored versions are re-hashed, so a change to PLAYER_ATTRIBUTES does not version every player
+        dim = dim.assign(attr_hash=attribute_hash(normalize_attributes(dim)))
+        points.append(dim.rename(columns={"valid_from": "first_seen"})[OBSERVATION_COLUMNS])
+    if not points:
+        return pd.DataFrame(columns=DIM_COLUMNS)
+    points = pd.concat(points, ignore_index=True)
+
+    # every observation is two points in time; a version is a run of equal hashes per player
+    events = pd.concat([
+        points.drop(columns=["last_seen"]).rename(columns={"first_seen": "seen"}),
+        points.drop(columns=["first_seen"]).rename(columns={"last_seen": "seen"}),
+    ], ignore_index=True).sort_values(["player_id", "seen"], kind="stable")
+    new_player = events["player_id"].ne(events["player_id"].shift())
+    changed = new_player | events["attr_hash"].ne(events["attr_hash"].shift())
+    events["version"] = changed.cumsum()
+
+    agg = {column: "first" for column in ["player_id", *PLAYER_ATTRIBUTES, "attr_hash"]}
+    versions = events.groupby("version", sort=True).agg(
+        {**agg, "seen": ["min", "max"]})
+    versions.columns = [*agg, "valid_from", "last_seen"]
+    versions = versions.reset_index(drop=True)
+
+    next_from = versions["valid_from"].shift(-1)
+    same_player = versions["player_id"].eq(versions["player_id"].shift(-1))
+    versions["valid_to"] = next_from.where(same_player)
+    versions["is_current"] = versions["valid_to"].isna()
+    versions["player_key"] = pd.util.hash_pandas_object(
+        versions[["player_id", "attr_hash", "valid_from"]], index=False).astype("int64")
+    return versions[DIM_COLUMNS]
+
+
+def load_dim(storage, key):
+    if not storage.exists(key):
+        return None
+    return pd.read_parquet(io.BytesIO(storage.get_bytes(key)))
+
+
+def save_dim(storage, key, dim, dictionaries=None):
+    """Write the dimension; with a DictionaryRegistry its name and country columns are dictionary-encoded"""
+    out = io.BytesIO()
+    if dictionaries is None:
+        dim.to_parquet(out, index=False)
+    else:
+        pq.write_table(dictionaries.unify("dim_players", dictionaries.encode("dim_players", dim)), out)
+    storage.put_bytes(key, out.getvalue())
+    logger.info(f"dim_players {key}: {dim['player_id'].nunique()} players, {len(dim)} versions")
+
+
+def players_as_of(facts, matches, dim):
+    """Fact rows with the player attributes valid at each match's kick-off"""
+    times = matches[["match_id", "match_time_utc"]].drop_duplicates("match_id").astype({"match_id": "int64"})
+    rows = facts.merge(times, on="match_id", how="left")
+    rows["match_time"] = pd.to_datetime(rows["match_time_utc"], utc=True)
+    rows = rows.dropna(subset=["match_time"]).sort_values("match_time")
+    versions = dim.sort_values("valid_from")[["player_id", "valid_from", "player_key", *PLAYER_ATTRIBUTES]]
+    return pd.merge_asof(rows, versions, left_on="match_time", right_on="valid_from", by="player_id")
@@ -1,12 +1,20 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import boto3
 
+from extract import json_backend
 from extract.fotmob_client import FotMobClient
+from extract.history import HistoryStore
+from extract.match_index import MatchIndex
+from extract.profiling import timed
+from extract.sections import LANDED_SECTIONS, filter_sections
+from extract.storage import S3Storage, raw_json_key
 from config.aws_config import ( #type:ignore
     AWS_REGION,
+    RAW_PASSTHROUGH,
     S3_BUCKET,
-    S3_PATHS,
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -14,20 +22,30 @@ logger = logging.getLogger(__name__)
 
 s3_client = boto3.client("s3", region_name=AWS_REGION)
 
+# landed matches between index / history saves
+SAVE_EVERY = 25
+
 
 def load_team_config(config_path):
     with open(config_path) as f:
         return json.load(f)
 
 
+def team_league_ids(config):
+    """Competitions a team config covers: its "league_ids", or the single "league_id" of older configs"""
+    return config.get("league_ids") or [config["league_id"]]
+
+
+@timed("extract.upload_to_s3")
 def upload_to_s3(data, team_name, match_id, season):
-    season_str = season.replace("/", "_")
-    key = f"{S3_PATHS['raw_json']}/{team_name}/{season_str}/{match_id}.json"
+    key = raw_json_key(team_name, season, match_id)
+    # raw response bytes are landed as received, decoded payloads are re-encoded
+    body = data if isinstance(data, (bytes, bytearray)) else json_backend.dumps(data)
     try:
         s3_client.put_object(
             Bucket=S3_BUCKET,
             Key=key,
-            Body=json.dumps(data),
+            Body=body,
             ContentType="application/json",
         )
         logger.info(f"Uploaded to s3://{S3_BUCKET}/{key}")
@@ -47,32 +65,111 @@ def extract_completed_matches(client, league_id, team_id, season):
     return completed
 
 
-def run_extraction(config_path, season):
+def extract_team_matches(client, config, season):
+    """Completed match ids of a team across every competition in its config"""
+    match_ids = []
+    for league_id in team_league_ids(config):
+        match_ids.extend(m for m in extract_completed_matches(client, league_id, config["team_id"], season)
+                         if m not in match_ids)
+    return match_ids
+
+
+def extract_live_matches(client, league_id, team_id, season):
+    fixtures = client.get_team_fixtures(league_id, season, team_id)
+    live = []
+    for match in fixtures:
+        status = match.get("status", {})
+        if status.get("started") and not status.get("finished") and not status.get("cancelled"):
+            live.append(match["id"])
+    logger.info(f"Found {len(live)} matches in progress out of {len(fixtures)} total")
+    return live
+
+
+def land_match(client, match_id, team_name, season, upload=upload_to_s3, index=None, sections=LANDED_SECTIONS,
+               history=None):
+    logger.info(f"Fetching match {match_id}...")
+    details = client.get_match_details(match_id, raw=RAW_PASSTHROUGH)
+    
+    if not details:
+        logger.warning(f"No details returned for match {match_id}")
+        return False
+    return land_body(details, match_id, team_name, season, upload, index, sections, history)
+
+
+@timed("extract.land_body")
+def land_body(details, match_id, team_name, season, upload=upload_to_s3, index=None, sections=LANDED_SECTIONS,
+              history=None):
+    """Land an already fetched matchDetails response (bytes or decoded)"""
+    body = details if isinstance(details, (bytes, bytearray)) else json_backend.dumps(details)
+    full_body = body
+    # only the sections some output product reads are landed (config SECTION_ALLOWLISTS)
+    body = filter_sections(body, sections)
+    if not upload(body, team_name, match_id, season):
+        return False
+    if index is not None:
+        index.add(match_id, raw_json_key(team_name, season, match_id), body)
+    if history is not None:
+        # h2h / teamForm go to the deduplicated history store instead of the landed payload;
+        # the match is already landed, a payload the history parser chokes on must not fail it
+        try:
+            history.add_body(full_body)
+        except Exception as e:
+            logger.warning(f"Match {match_id}: history not stored: {e}")
+    return True
+
+
+def land_matches(client, match_ids, team_name, season, upload=upload_to_s3, index=None, sections=LANDED_SECTIONS,
+                 history=None, save_every=SAVE_EVERY):
+    """Land matches concurrently, yielding (match_id, ok) as each finishes.
+
+    The pool is sized to the controller's ceiling; the controller's adaptive
+    limit decides how many requests are actually in flight. The index and
+    history are saved every `save_every` finished matches, so a killed run
+    loses at most that many index entries; callers still save at the end.
+    """
+    with ThreadPoolExecutor(max_workers=client.controller.max_limit) as pool:
+        futures = {
+            pool.submit(land_match, client, match_id, team_name, season, upload, index, sections, history): match_id
+            for match_id in match_ids
+        }
+        for finished, future in enumerate(as_completed(futures), 1):
+            yield futures[future], future.result()
+            if save_every and finished % save_every == 0:
+                for store in (index, history):
+                    if store is not None:
+                        store.save()
+
+
+def run_extraction(config_path, season, client=None, upload=upload_to_s3, storage=None, refresh=False,
+                   sections=LANDED_SECTIONS):
     config = load_team_config(config_path)
     
-    team_id = config["team_id"]
     team_name = config["team_name"]
-    league_id = config["league_id"]
     
-    client = FotMobClient()
+    # callers (benchmarks, backfills) may hand in their own client, sink and index storage
+    owns_client = client is None
+    client = client or FotMobClient()
+    storage = storage or S3Storage(client=s3_client)
+    index = MatchIndex(storage, team_name, season)
+    history = HistoryStore(storage, team_name, season)
     
     try:
         logger.info(f"Processing {team_name} - season {season}...")
-        match_ids = extract_completed_matches(client, league_id, team_id, season)
+        match_ids = extract_team_matches(client, config, season)
+        # incremental: matches already in the index are not fetched again unless refresh=True
+        pending = [m for m in match_ids if refresh or m not in index]
+        logger.info(f"{len(match_ids) - len(pending)} matches already landed, fetching {len(pending)}")
         
         success_count = 0
-        for match_id in match_ids:
-            logger.info(f"Fetching match {match_id}...")
-            details = client.get_match_details(match_id)
-            
-            if details:
-                if upload_to_s3(details, team_name, match_id, season):
-                    success_count += 1
-            else:
-                logger.warning(f"No details returned for match {match_id}")
+        for match_id, ok in land_matches(client, pending, team_name, season, upload, index, sections, history):
+            if ok:
+                success_count += 1
         
-        logger.info(f"Completed: {success_count}/{len(match_ids)} matches uploaded to S3")
+        logger.info(f"Completed: {success_count}/{len(pending)} matches uploaded to S3")
         return success_count
     
     finally:
-        client.close()
\ No newline at end of file
+        index.save()
+        history.save()
+        if owns_client:
+            client.close()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Adaptive flow control for FotMobClient: circuit breaker plus AIMD concurrency
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class AdaptiveController:
+    """Tracks a rolling window of request outcomes and adapts to upstream health.
+
+    - Circuit breaker: once at least `min_samples` outcomes are in the window
+      and the error rate reaches `error_threshold`, the breaker opens and
+      requests fail fast for `cooldown` seconds. After that a single probe is
+      let through (half-open); success closes the breaker, failure reopens it.
+    - Concurrency: the in-flight limit grows additively (+1 per `limit`
+      healthy responses) and is halved on an error or on a response slower
+      than `latency_target` seconds, between `min_limit` and `max_limit`.
+    """
+
+    def __init__(self, window=50, min_samples=10, error_threshold=0.5, cooldown=30,
+                 latency_target=5.0, min_limit=1, max_limit=8):
+        self.outcomes = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.latency_target = latency_target
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+
+        self.cond = threading.Condition()
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.limit = float(min_limit)
+        self.in_flight = 0
+
+    # ---- circuit breaker ----
+
+    def allow(self):
+        """False while the breaker is open; lets a single probe through once the cooldown has passed"""
+        with self.cond:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    @property
+    def is_open(self):
+        return self.state != CLOSED
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+        logger.warning(f"Circuit opened: error rate {self.error_rate:.0%} over last {len(self.outcomes)} requests")
+
+    # ---- concurrency ----
+
+    @contextmanager
+    def slot(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+
+    def record(self, ok, latency=None):
+        """Feed back one upstream outcome (ok=False for timeouts, 429s and 5xx)"""
+        with self.cond:
+            self.outcomes.append((ok, latency))
+            slow = latency is not None and latency > self.latency_target
+
+            if ok and not slow:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.min_limit, self.limit / 2)
+
+            if self.state == HALF_OPEN:
+                if ok:
+                    logger.info("Circuit closed: probe request succeeded")
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._trip()
+            elif (self.state == CLOSED and len(self.outcomes) >= self.min_samples
+                    and self.error_rate >= self.error_threshold):
+                self._trip()
+            self.cond.notify_all()
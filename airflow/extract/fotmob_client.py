@@ -1,41 +1,132 @@
+import os
 import time
 import logging
+import sqlite3
+import threading
 import requests
 from requests_ip_rotator import ApiGateway
 
+from extract import json_backend
+from extract.flow_control import AdaptiveController
+from extract.profiling import timed
+from config.aws_config import WORK_QUEUE_PATH #type:ignore
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class RateLimiter:
+    """Shared request budget: at most one request start per `interval` seconds across threads"""
+
+    def __init__(self, interval=1):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SharedRateLimiter:
+    """RateLimiter across processes: one request start per `interval` seconds on the host.
+
+    The budget is a row in a SQLite file on the data volume (the work queue's
+    by default), so the team, scheduler, live, backfill and queue extractors
+    running side by side share one request rate.
+    """
+
+    def __init__(self, path=WORK_QUEUE_PATH, interval=1, name="fotmob"):
+        self.path = path
+        self.interval = interval
+        self.name = name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=60)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_budget (name TEXT PRIMARY KEY, next_at REAL NOT NULL)")
+        finally:
+            conn.close()
+
+    def wait(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            # BEGIN IMMEDIATE serializes the read-modify-write across processes
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT next_at FROM rate_budget WHERE name = ?", (self.name,)).fetchone()
+            next_at = row[0] if row else 0.0
+            conn.execute("INSERT OR REPLACE INTO rate_budget (name, next_at) VALUES (?, ?)",
+                         (self.name, max(now, next_at) + self.interval))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        delay = next_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def host_rate_limiter(interval=1, path=WORK_QUEUE_PATH):
+    """The host-wide SharedRateLimiter, or a process-local RateLimiter where the data volume is missing"""
+    try:
+        return SharedRateLimiter(path, interval)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"No shared rate budget at {path} ({e}), limiting this process only")
+        return RateLimiter(interval)
+
+
 class FotMobClient:
     BASE_URL = "https://www.fotmob.com"
     API_URL = f"{BASE_URL}/api"
     
-    def __init__(self, regions=None):
+    def __init__(self, regions=None, base_url=None, request_delay=1, rate_limiter=None, controller=None):
         self.regions = regions or ["us-east-2"]
+        # base_url lets us point the client at a local replay server (benchmarks);
+        # the IP rotator gateway is only used against the real FotMob host
+        self.base_url = base_url or self.BASE_URL
+        self.api_url = f"{self.base_url}/api"
+        # threads sharing one client (or several clients sharing one limiter) share the rate budget;
+        # against the real host every extractor on the machine shares it
+        self.rate_limiter = rate_limiter or (
+            RateLimiter(request_delay) if base_url else host_rate_limiter(request_delay))
+        # circuit breaker + AIMD in-flight limit, fed by every upstream response
+        self.controller = controller or AdaptiveController()
         self.gateway = None
         self.session = None
         self.start_session()
     
     def start_session(self):
-        logger.info("Starting IP rotator gateway...")
-        self.gateway = ApiGateway(self.BASE_URL, regions=self.regions)
-        self.gateway.start()
         self.session = requests.Session()
-        self.session.mount(self.BASE_URL, self.gateway)
+        if self.base_url == self.BASE_URL:
+            logger.info("Starting IP rotator gateway...")
+            self.gateway = ApiGateway(self.BASE_URL, regions=self.regions)
+            self.gateway.start()
+            self.session.mount(self.BASE_URL, self.gateway)
         logger.info("Session ready.")
     
-    def request(self, endpoint, params=None, max_retries=3):
-        url = f"{self.API_URL}/{endpoint}"
+    @timed("fotmob_client.request")
+    def request(self, endpoint, params=None, max_retries=3, raw=False):
+        """GET an API endpoint; returns the decoded body, or the raw bytes when raw=True"""
+        url = f"{self.api_url}/{endpoint}"
         
         for attempt in range(max_retries):
+            if not self.controller.allow():
+                logger.warning(f"Circuit open, failing fast for {endpoint}")
+                return None
             try:
                 logger.info(f"Request: {endpoint} (attempt {attempt + 1})")
-                response = self.session.get(url, params=params, timeout=30)
+                with self.controller.slot():
+                    self.rate_limiter.wait()  # Rate limit - one request per request_delay (1s by default)
+                    response = self._get(url, params)
                 response.raise_for_status()
-                time.sleep(1)  # Rate limit - we will sleep for 1 second before retrying
-                return response.json()
-            except requests.exceptions.RequestException as e:
+                if raw:
+                    return response.content
+                return json_backend.loads(response.content)
+            except (requests.exceptions.RequestException, ValueError) as e:
                 logger.warning(f"Attempt {attempt + 1} failed: {e}")
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)  # Exponential backoff - means we will sleep 2x the amount of the previous sleep time
@@ -43,6 +134,20 @@ class FotMobClient:
                     logger.error(f"All retries failed for {endpoint}")
                     return None
     
+    @timed("fotmob_client.http_get")
+    def _get(self, url, params):
+        """Single GET, reporting the upstream outcome to the adaptive controller"""
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, params=params, timeout=30)
+        except requests.exceptions.RequestException:
+            self.controller.record(False)
+            raise
+        # 429 / 5xx mean upstream trouble, any other 4xx is about our request
+        healthy = response.status_code != 429 and response.status_code < 500
+        self.controller.record(healthy, time.monotonic() - start)
+        return response
+    
     def get_league_fixtures(self, league_id, season):
         data = self.request("leagues", params={"id": league_id, "season": season})
         if data and "fixtures" in data:
@@ -64,8 +169,8 @@ class FotMobClient:
         logger.info(f"Found {len(team_matches)} matches for team {team_id}")
         return team_matches
     
-    def get_match_details(self, match_id):
-        return self.request("matchDetails", params={"matchId": match_id})
+    def get_match_details(self, match_id, raw=False):
+        return self.request("matchDetails", params={"matchId": match_id}, raw=raw)
     
     def close(self):
         if self.gateway:
@@ -0,0 +1,265 @@
+"""
+Deduplicated store of the match history embedded in matchDetails
+
+Every payload repeats content.h2h.matches and content.matchFacts.teamForm,
+so consecutive matches carry mostly the same historical results. The
+extractor normalizes them into dim_historical_matches (one row per
+historical match, keyed by the id after '#' in matchUrl / linkToMatch) and
+a refs table of (match_id, historical_match_id, source, team_id, position),
+and the landed payload no longer carries either section.
+
+Like the match index, the store is one set of parquet objects per landing
+prefix (processed/history/{team}/{season}/), merged into with conditional
+PUTs so concurrent extractors of a prefix keep each other's rows;
+load_historical_matches() merges all of them.
+
+Usage (from the airflow/ directory), to populate the store from payloads
+landed before the history stage existed:
+    python -m extract.history --team real_madrid --season 2024/2025 --source-root ../data/landing
+"""
+import argparse
+import io
+import logging
+import threading
+
+import pandas as pd
+
+from extract import json_backend
+from extract.reprocess import iter_raw_keys, prefetch
+from extract.sections import allowlist, filter_sections
+from extract.storage import LocalStorage, S3Storage, merge_put
+from config.aws_config import S3_PATHS #type:ignore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HISTORY_SECTIONS = allowlist(["history"])
+
+HISTORICAL_COLUMNS = [
+    "historical_match_id", "match_time_utc", "league_id", "league_name",
+    "home_team_id", "home_team_name", "away_team_id", "away_team_name",
+    "home_score", "away_score", "finished", "match_url", "observed_at",
+]
+REF_COLUMNS = ["match_id", "historical_match_id", "source", "team_id", "position"]
+
+
+def history_key(team_name, season, table):
+    return f"{S3_PATHS['history']}/{team_name}/{season.replace('/', '_')}/{table}.parquet"
+
+
+def match_id_from_url(url):
+    """'/matches/real-madrid-vs-mallorca/2h1k3i#4507113' -> 4507113"""
+    _, _, match_id = (url or "").partition("#")
+    return int(match_id) if match_id.isdigit() else None
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_score(score):
+    """'3 - 0' -> (3, 0), (None, None) for matches without a score"""
+    home, sep, away = (score or "").partition("-")
+    return (to_int(home.strip()), to_int(away.strip())) if sep else (None, None)
+
+
+def parse_history(data):
+    """Historical match rows and per-match references from the h2h and teamForm sections.
+
+    Every row carries the kick-off of the match it was observed in
+    (observed_at), which decides which observation wins in merge_historical.
+    Sections FotMob sends as null are treated as empty.
+    """
+    general = data.get("general") or {}
+    match_id = to_int(general.get("matchId"))
+    observed_at = general.get("matchTimeUTCDate")
+    content = data.get("content") or {}
+    matches, refs = [], []
+
+    for position, m in enumerate((content.get("h2h") or {}).get("matches") or []):
+        historical_id = match_id_from_url((m or {}).get("matchUrl"))
+        if historical_id is None:
+            continue
+        status = m.get("status") or {}
+        league, home, away = m.get("league") or {}, m.get("home") or {}, m.get("away") or {}
+        home_score, away_score = parse_score(status.get("scoreStr"))
+        matches.append({
+            "historical_match_id": historical_id,
+            "match_time_utc": status.get("utcTime") or (m.get("time") or {}).get("utcTime"),
+            "league_id": to_int(league.get("id")),
+            "league_name": league.get("name"),
+            "home_team_id": to_int(home.get("id")),
+            "home_team_name": home.get("name"),
+            "away_team_id": to_int(away.get("id")),
+            "away_team_name": away.get("name"),
+            "home_score": home_score,
+            "away_score": away_score,
+            # the top-level "finished" flag is false on every h2h row, status carries the real one
+            "finished": status.get("finished"),
+            "match_url": m.get("matchUrl"),
+            "observed_at": observed_at,
+        })
+        refs.append({"match_id": match_id, "historical_match_id": historical_id,
+                     "source": "h2h", "team_id": None, "position": position})
+
+    for team_form in (content.get("matchFacts") or {}).get("teamForm") or []:
+        for position, m in enumerate(team_form or []):
+            historical_id = match_id_from_url((m or {}).get("linkToMatch"))
+            if historical_id is None:
+                continue
+            tooltip = m.get("tooltipText") or {}
+            our_side = "home" if (m.get("home") or {}).get("isOurTeam") else "away"
+            matches.append({
+                "historical_match_id": historical_id,
+                "match_time_utc": tooltip.get("utcTime") or (m.get("date") or {}).get("utcTime"),
+                "league_id": None,
+                "league_name": None,
+                "home_team_id": to_int(tooltip.get("homeTeamId")),
+                "home_team_name": tooltip.get("homeTeam"),
+                "away_team_id": to_int(tooltip.get("awayTeamId")),
+                "away_team_name": tooltip.get("awayTeam"),
+                "home_score": to_int(tooltip.get("homeScore")),
+                "away_score": to_int(tooltip.get("awayScore")),
+                # team form only lists played matches
+                "finished": True,
+                "match_url": m.get("linkToMatch"),
+                "observed_at": observed_at,
+            })
+            refs.append({"match_id": match_id, "historical_match_id": historical_id, "source": "team_form",
+                         "team_id": to_int((m.get(our_side) or {}).get("id")), "position": position})
+
+    return matches, refs
+
+
+def merge_historical(frame):
+    """One row per historical match, merged column by column (nulls never overwrite).
+
+    Observations are ordered by observed_at rather than arrival, so a
+    backfilled old payload does not overwrite what a newer one saw, and
+    observations of the finished match always win over ones made before it
+    was played (an upcoming h2h fixture stays finished once it has been).
+    """
+    if frame.empty:
+        return frame.reindex(columns=HISTORICAL_COLUMNS)
+    frame = frame.reindex(columns=HISTORICAL_COLUMNS)
+    order = pd.DataFrame({
+        "finished": frame["finished"].astype("boolean").fillna(False).to_numpy(dtype=bool),
+        # rows stored before observed_at existed sort first
+        "observed_at": pd.to_datetime(frame["observed_at"], utc=True, errors="coerce").reset_index(drop=True),
+    }).sort_values(["finished", "observed_at"], kind="stable", na_position="first").index
+    merged = frame.iloc[order].groupby("historical_match_id", sort=True).last().reset_index()
+    ints = ["league_id", "home_team_id", "away_team_id", "home_score", "away_score"]
+    return merged[HISTORICAL_COLUMNS].astype({c: "Int64" for c in ints})
+
+
+class HistoryStore:
+    """dim_historical_matches and refs for one landing prefix, written like MatchIndex:
+    entries are staged with add() and merged into the stored objects by save()"""
+
+    def __init__(self, storage, team_name, season):
+        self.storage = storage
+        self.matches_key = history_key(team_name, season, "dim_historical_matches")
+        self.refs_key = history_key(team_name, season, "refs")
+        self.lock = threading.Lock()
+        self.staged_matches = []
+        self.staged_refs = []
+
+    @staticmethod
+    def _parse(body, columns):
+        if body is None:
+            return pd.DataFrame(columns=columns)
+        return pd.read_parquet(io.BytesIO(body))
+
+    @staticmethod
+    def _serialize(frame):
+        out = io.BytesIO()
+        frame.to_parquet(out, index=False)
+        return out.getvalue()
+
+    def add(self, data):
+        """Stage the history of one decoded payload (only the history sections are needed)"""
+        matches, refs = parse_history(data)
+        with self.lock:
+            self.staged_matches.extend(matches)
+            self.staged_refs.extend(refs)
+        return len(matches)
+
+    def add_body(self, body):
+        """Stage the history of a raw matchDetails body without decoding the rest of it"""
+        return self.add(json_backend.loads(filter_sections(body, HISTORY_SECTIONS)))
+
+    def save(self):
+        with self.lock:
+            if not self.staged_refs:
+                return False
+            staged = pd.DataFrame(self.staged_matches, columns=HISTORICAL_COLUMNS)
+            staged_refs = pd.DataFrame(self.staged_refs, columns=REF_COLUMNS).drop_duplicates(
+                ["match_id", "source", "team_id", "position"], keep="last")
+            merged = {}
+
+            def merge_matches(body):
+                merged["matches"] = merge_historical(pd.concat(
+                    [self._parse(body, HISTORICAL_COLUMNS), staged], ignore_index=True))
+                return self._serialize(merged["matches"])
+
+            def merge_refs(body):
+                refs = self._parse(body, REF_COLUMNS)
+                # a re-landed match replaces its references
+                refs = pd.concat([refs[~refs["match_id"].isin(staged_refs["match_id"])], staged_refs],
+                                 ignore_index=True)
+                merged["refs"] = refs.astype({"match_id": "Int64", "historical_match_id": "int64",
+                                              "team_id": "Int64"}).reset_index(drop=True)
+                return self._serialize(merged["refs"])
+
+            merge_put(self.storage, self.matches_key, merge_matches)
+            merge_put(self.storage, self.refs_key, merge_refs)
+            logger.info(f"History {self.matches_key}: {len(self.staged_matches)} observations -> "
+                        f"{len(merged['matches'])} historical matches, {len(merged['refs'])} refs")
+            self.staged_matches, self.staged_refs = [], []
+            return True
+
+
+def load_historical_matches(storage):
+    """dim_historical_matches across every team/season partition, deduplicated"""
+    prefix = f"{S3_PATHS['history']}/"
+    frames = [
+        pd.read_parquet(io.BytesIO(storage.get_bytes(key)))
+        for key, _ in storage.list_keys(prefix)
+        if key.endswith("/dim_historical_matches.parquet")
+    ]
+    if not frames:
+        return pd.DataFrame(columns=HISTORICAL_COLUMNS)
+    return merge_historical(pd.concat(frames, ignore_index=True))
+
+
+def head_to_head(historical, team_id, opponent_id, before=None):
+    """Finished meetings of two teams, most recent first; `before` is an ISO UTC time"""
+    h = historical
+    pair = ((h["home_team_id"] == team_id) & (h["away_team_id"] == opponent_id)) | \
+           ((h["home_team_id"] == opponent_id) & (h["away_team_id"] == team_id))
+    meetings = h[pair & h["finished"].fillna(False).astype(bool)]
+    if before is not None:
+        meetings = meetings[pd.to_datetime(meetings["match_time_utc"], utc=True) < pd.to_datetime(before, utc=True)]
+    return meetings.sort_values("match_time_utc", ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Populate the history store from landed matchDetails payloads")
+    parser.add_argument("--team", required=True)
+    parser.add_argument("--season", action="append", required=True, help="season like 2023/2024 (repeatable)")
+    parser.add_argument("--source-root", default=None, help="local landing dir instead of S3")
+    args = parser.parse_args()
+
+    storage = LocalStorage(args.source_root) if args.source_root else S3Storage()
+    for season in args.season:
+        store = HistoryStore(storage, args.team, season)
+        for key, body in prefetch(storage, iter_raw_keys(storage, args.team, [season])):
+            store.add_body(body)
+        store.save()
+
+
+if __name__ == "__main__":
+    main()
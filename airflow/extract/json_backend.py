@@ -0,0 +1,60 @@
+"""
+Pluggable JSON backend for match payloads: orjson, msgspec or the stdlib json
+"""
+import json
+import logging
+import os
+
+from extract.profiling import timed
+
+logger = logging.getLogger(__name__)
+
+# "auto" picks the fastest installed backend, otherwise one of orjson / msgspec / json
+JSON_BACKEND = os.environ.get("FOTMOB_JSON_BACKEND", "auto")
+
+
+def _orjson():
+    import orjson
+    return orjson.loads, orjson.dumps
+
+
+def _msgspec():
+    import msgspec
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+    return decoder.decode, encoder.encode
+
+
+def _stdlib():
+    # json.loads takes bytes / str but not the memoryviews CachedStorage.get_view returns
+    loads = lambda raw: json.loads(raw.tobytes() if isinstance(raw, memoryview) else raw)
+    return loads, lambda obj: json.dumps(obj).encode()
+
+
+BACKENDS = {
+    "orjson": _orjson,
+    "msgspec": _msgspec,
+    "json": _stdlib,
+}
+
+
+def select_backend(name=JSON_BACKEND):
+    """Return (name, loads, dumps) for the requested backend; dumps always returns bytes"""
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {name!r}, expected one of {sorted(BACKENDS)}")
+
+    candidates = list(BACKENDS) if name == "auto" else [name]
+    for candidate in candidates:
+        try:
+            loads, dumps = BACKENDS[candidate]()
+        except ImportError:
+            if name != "auto":
+                logger.warning(f"JSON backend {candidate} not installed")
+            continue
+        return candidate, loads, dumps
+    logger.warning(f"Falling back to stdlib json (requested {name})")
+    return ("json",) + _stdlib()
+
+
+backend, loads, dumps = select_backend()
+loads, dumps = timed("json_backend.loads")(loads), timed("json_backend.dumps")(dumps)
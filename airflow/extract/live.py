@@ -0,0 +1,237 @@
+"""
+Live mode: poll matches in progress and land only what changed
+
+Each poll decodes only the "live" sections of matchDetails (status, events,
+shots, stats), keys every item (eventId / shot id / period+stat) and diffs
+it against the previous poll. Changes are written as one small delta object
+per poll under raw/live/{team}/{season}/{match_id}/{seq}.json:
+
+    {"match_id": ..., "seq": 3, "polled_at": ...,
+     "deltas": [{"kind": "event", "op": "add", "key": "11701892", "value": {...}}, ...]}
+
+The poll interval adapts per match: back to `min_interval` after a change,
+growing by `backoff` up to `max_interval` while nothing happens, and
+`max_interval` at half-time. At full time the final payload is landed
+through the normal path (index, history) and the match is dropped. A match
+that has not reported full time `give_up_after` seconds after it was first
+seen live (abandoned, or FotMob stopped answering for it) is dropped with a
+warning and left to the batch extraction.
+
+Usage (from the airflow/ directory):
+    python -m extract.live --config config/teams/real_madrid.json --season 2024/2025
+"""
+import argparse
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+
+from extract import json_backend
+from extract.extract_fotmob_data import (
+    extract_live_matches,
+    land_body,
+    load_team_config,
+    s3_client,
+    team_league_ids,
+    upload_to_s3,
+)
+from extract.fotmob_client import FotMobClient
+from extract.history import HistoryStore
+from extract.match_index import MatchIndex
+from extract.sections import allowlist, filter_sections
+from extract.storage import S3Storage
+from config.aws_config import S3_PATHS #type:ignore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LIVE_SECTIONS = allowlist(["live"])
+HALF_TIME = ("HT",)
+# first seen live -> given up; covers extra time, a shootout and long interruptions
+GIVE_UP_AFTER = 4 * 3600
+
+
+def live_key(team_name, season, match_id, seq):
+    return f"{S3_PATHS['raw_live']}/{team_name}/{season.replace('/', '_')}/{match_id}/{seq:05d}.json"
+
+
+def event_key(event):
+    # goals and cards carry an eventId; substitutions, added time and halves only a reactKey
+    return str(event.get("eventId") or event.get("reactKey")
+               or f"{event.get('type')}:{event.get('time')}:{event.get('overloadTime')}")
+
+
+def live_view(data):
+    """Keyed items of one poll: {kind: {key: value}}"""
+    content = data.get("content") or {}
+    status = (data.get("header") or {}).get("status") or {}
+    stats = {}
+    for period, body in ((content.get("stats") or {}).get("Periods") or {}).items():
+        for category in (body or {}).get("stats") or []:
+            for stat in category.get("stats") or []:
+                stats[f"{period}/{stat.get('key') or stat.get('title')}"] = stat.get("stats")
+    events = ((content.get("matchFacts") or {}).get("events") or {}).get("events") or []
+    return {
+        "status": {"match": {
+            "started": status.get("started"),
+            "finished": status.get("finished"),
+            "score": status.get("scoreStr"),
+            "reason": (status.get("reason") or {}).get("short"),
+            "live_time": (status.get("liveTime") or {}).get("short"),
+        }},
+        "event": {event_key(e): e for e in events},
+        "shot": {str(s.get("id")): s for s in (content.get("shotmap") or {}).get("shots") or []},
+        "stat": stats,
+    }
+
+
+def diff_views(previous, current):
+    """Structural diff of two live views as a list of add / change / remove deltas"""
+    deltas = []
+    for kind, items in current.items():
+        before = previous.get(kind, {})
+        for key, value in items.items():
+            if key not in before:
+                deltas.append({"kind": kind, "op": "add", "key": key, "value": value})
+            elif before[key] != value:
+                deltas.append({"kind": kind, "op": "change", "key": key, "value": value})
+        for key in before.keys() - items.keys():
+            # VAR-cancelled goals and corrected events disappear from the list
+            deltas.append({"kind": kind, "op": "remove", "key": key, "value": None})
+    return deltas
+
+
+class LiveMatch:
+    """Previous view, delta sequence number and poll interval of one match in progress"""
+
+    def __init__(self, match_id, min_interval=15, max_interval=120, backoff=1.5, tracked_at=0.0):
+        self.match_id = match_id
+        self.tracked_at = tracked_at
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.view = {}
+        self.seq = 0
+
+    def update(self, body):
+        """Diff a polled matchDetails body against the previous poll, returns (deltas, finished)"""
+        data = json_backend.loads(filter_sections(body, LIVE_SECTIONS))
+        view = live_view(data)
+        deltas = diff_views(self.view, view)
+        self.view = view
+
+        status = view["status"]["match"]
+        if status["reason"] in HALF_TIME:
+            self.interval = self.max_interval
+        elif deltas:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return deltas, bool(status["finished"])
+
+    def record(self, deltas):
+        self.seq += 1
+        return {
+            "match_id": str(self.match_id),
+            "seq": self.seq,
+            "polled_at": datetime.now(timezone.utc).isoformat(),
+            "deltas": deltas,
+        }
+
+
+def run_live(config_path, season, client=None, upload=upload_to_s3, storage=None, min_interval=15,
+             max_interval=120, fixtures_interval=300, give_up_after=GIVE_UP_AFTER, clock=time.monotonic,
+             sleep=time.sleep):
+    """Poll every match of the team in progress until all of them are finished or given up.
+
+    The fixtures list is re-read every `fixtures_interval` seconds to pick up
+    kick-offs while other matches are being polled; returns the number of
+    matches landed at full time.
+    """
+    config = load_team_config(config_path)
+    team_name = config["team_name"]
+
+    owns_client = client is None
+    client = client or FotMobClient()
+    storage = storage or S3Storage(client=s3_client)
+    index = MatchIndex(storage, team_name, season)
+    history = HistoryStore(storage, team_name, season)
+
+    tracked, done = {}, set()
+    schedule = []
+    next_fixtures = clock()
+    landed = 0
+    try:
+        while True:
+            now = clock()
+            if now >= next_fixtures:
+                for league_id in team_league_ids(config):
+                    for match_id in extract_live_matches(client, league_id, config["team_id"], season):
+                        if match_id not in tracked and match_id not in done:
+                            tracked[match_id] = LiveMatch(match_id, min_interval, max_interval, tracked_at=now)
+                            heapq.heappush(schedule, (now, str(match_id), match_id))
+                next_fixtures = now + fixtures_interval
+            if not schedule:
+                break
+
+            due, _, match_id = schedule[0]
+            if due > now:
+                sleep(min(due, next_fixtures) - now)
+                continue
+            heapq.heappop(schedule)
+            match = tracked[match_id]
+            if now - match.tracked_at > give_up_after:
+                logger.warning(f"Match {match_id} not finished {(now - match.tracked_at) / 3600:.1f}h after it "
+                               f"was first seen live, giving up after {match.seq} delta polls")
+                done.add(match_id)
+                del tracked[match_id]
+                continue
+
+            body = client.get_match_details(match_id, raw=True)
+            if not body:
+                heapq.heappush(schedule, (clock() + match.interval, str(match_id), match_id))
+                continue
+            deltas, finished = match.update(body)
+            if deltas:
+                record = match.record(deltas)
+                storage.put_bytes(live_key(team_name, season, match_id, record["seq"]),
+                                  json_backend.dumps(record), "application/json")
+                logger.info(f"Match {match_id} poll {record['seq']}: {len(deltas)} changes")
+
+            if finished:
+                # full time: the final payload goes through the normal landing path
+                if land_body(body, match_id, team_name, season, upload, index, history=history):
+                    landed += 1
+                    # other matches may be polled for hours yet, the index should not wait for them
+                    index.save()
+                    history.save()
+                done.add(match_id)
+                del tracked[match_id]
+                logger.info(f"Match {match_id} finished after {match.seq} delta polls")
+            else:
+                heapq.heappush(schedule, (clock() + match.interval, str(match_id), match_id))
+    finally:
+        index.save()
+        history.save()
+        if owns_client:
+            client.close()
+
+    return landed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll matches in progress and land delta updates")
+    parser.add_argument("--config", required=True, help="team config file")
+    parser.add_argument("--season", required=True, help="season like 2024/2025")
+    parser.add_argument("--min-interval", type=float, default=15, help="seconds between polls after a change")
+    parser.add_argument("--max-interval", type=float, default=120, help="longest poll interval (and half-time)")
+    parser.add_argument("--give-up-hours", type=float, default=GIVE_UP_AFTER / 3600,
+                        help="stop polling a match this long after it was first seen live")
+    args = parser.parse_args()
+    return run_live(args.config, args.season, min_interval=args.min_interval, max_interval=args.max_interval,
+                    give_up_after=args.give_up_hours * 3600)
+
+
+if __name__ == "__main__":
+    main()
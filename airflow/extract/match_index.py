@@ -0,0 +1,145 @@
+"""
+Per team/season index of landed matches, so lookups never LIST raw/json
+
+One small parquet object per landing prefix (raw/index/{team}/{season}.parquet)
+with the sorted match ids, S3 key, size, MD5 (equal to the S3 ETag of a
+single-part upload) and fetch time of every landed match.
+
+Several writers land into the same prefix (the daily extraction, the
+scheduler, the live poller, backfills). save() therefore merges its staged
+entries into the stored index with a conditional PUT (storage.merge_put):
+when another writer saved in between, the index is re-read and merged
+again, so no writer drops another's entries. The extractors save every few
+landed matches rather than only at the end.
+
+Every save also rewrites a small landed marker
+(raw/markers/landed/{team}/{season}.json) with the ids it just added, so
+consumers that cache derived state (the prediction service) can tell that
+new matches arrived without reading the index itself.
+"""
+import hashlib
+import io
+import logging
+import json
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from config.aws_config import S3_PATHS #type:ignore
+from extract.storage import merge_put, raw_json_prefix
+
+logger = logging.getLogger(__name__)
+
+INDEX_COLUMNS = ["match_id", "key", "size", "md5", "fetched_at"]
+
+
+def index_key(team_name, season):
+    return f"{S3_PATHS['raw_index']}/{team_name}/{season.replace('/', '_')}.parquet"
+
+
+def landed_marker_key(team_name, season):
+    return f"{S3_PATHS['raw_markers']}/landed/{team_name}/{season.replace('/', '_')}.json"
+
+
+class MatchIndex:
+    """Sorted match-id index for one landing prefix.
+
+    Entries are staged with add() and written with save(), which merges them
+    into whatever the stored index holds at that moment (see merge_put).
+    """
+
+    def __init__(self, storage, team_name, season):
+        self.storage = storage
+        self.team_name = team_name
+        self.season = season
+        self.key = index_key(team_name, season)
+        self.lock = threading.Lock()
+        self.staged = []
+        self.frame = self._read()
+
+    def _read(self):
+        return self._parse(self.storage.get_bytes(self.key) if self.storage.exists(self.key) else None)
+
+    @staticmethod
+    def _parse(body):
+        if body is None:
+            return pd.DataFrame({c: pd.Series(dtype=t) for c, t in zip(
+                INDEX_COLUMNS, ["int64", "object", "int64", "object", "datetime64[ns, UTC]"])})
+        return pd.read_parquet(io.BytesIO(body))
+
+    @property
+    def ids(self):
+        return self.frame["match_id"].to_numpy()
+
+    def __contains__(self, match_id):
+        ids = self.ids
+        pos = np.searchsorted(ids, int(match_id))
+        return pos < len(ids) and ids[pos] == int(match_id)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def match_ids(self):
+        return self.ids.tolist()
+
+    def keys(self):
+        return self.frame["key"].tolist()
+
+    def get(self, match_id):
+        ids = self.ids
+        pos = np.searchsorted(ids, int(match_id))
+        if pos < len(ids) and ids[pos] == int(match_id):
+            return self.frame.iloc[pos].to_dict()
+        return None
+
+    def add(self, match_id, key, body, fetched_at=None):
+        with self.lock:
+            self.staged.append({
+                "match_id": int(match_id),
+                "key": key,
+                "size": len(body),
+                "md5": hashlib.md5(body).hexdigest(),
+                "fetched_at": fetched_at or datetime.now(timezone.utc),
+            })
+
+    def _merge(self, base, entries):
+        frame = pd.concat([base, pd.DataFrame(entries, columns=INDEX_COLUMNS)], ignore_index=True)
+        frame["fetched_at"] = pd.to_datetime(frame["fetched_at"], utc=True)
+        # newest fetch wins for re-landed matches
+        frame = frame.sort_values(["match_id", "fetched_at"]).drop_duplicates("match_id", keep="last")
+        return frame.reset_index(drop=True).astype({"match_id": "int64", "size": "int64"})
+
+    def save(self):
+        with self.lock:
+            if not self.staged:
+                return False
+            def merge(body):
+                self.frame = self._merge(self._parse(body), self.staged)
+                out = io.BytesIO()
+                self.frame.to_parquet(out, index=False)
+                return out.getvalue()
+
+            merge_put(self.storage, self.key, merge)
+            self.storage.put_bytes(landed_marker_key(self.team_name, self.season), json.dumps({
+                "team_name": self.team_name,
+                "season": self.season,
+                "matches": len(self.frame),
+                "added": sorted({entry["match_id"] for entry in self.staged}),
+                "saved_at": datetime.now(timezone.utc).isoformat(),
+            }).encode(), "application/json")
+            logger.info(f"Index {self.key}: {len(self.staged)} entries added, {len(self.frame)} total")
+            self.staged = []
+            return True
+
+    @classmethod
+    def rebuild(cls, storage, team_name, season):
+        """Bootstrap an index from one LIST of the landing prefix (existing data, lost index)"""
+        index = cls(storage, team_name, season)
+        for key, _ in storage.list_keys(raw_json_prefix(team_name, season)):
+            name = key.rsplit("/", 1)[-1]
+            if name.endswith(".json") and name[:-len(".json")].isdigit():
+                index.add(name[:-len(".json")], key, storage.get_bytes(key))
+        index.save()
+        return index
@@ -0,0 +1,189 @@
+"""
+Typed msgspec decoders for the subset of matchDetails the parsers read
+
+Mirrors the parts of fotmob_schema() used by parse_teams, parse_leagues,
+parse_players (and its player intervals), parse_matches and parse_stats.
+Everything else in the payload (nav, h2h, buzz, QAData, shotmap, playerStats,
+most of seo, ...) is skipped by the decoder without being materialized.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+from extract import json_backend
+from extract.profiling import timed
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgspec
+except ImportError:  # decode_match_details falls back to a full decode
+    msgspec = None
+
+
+if msgspec is not None:
+
+    class Struct(msgspec.Struct, omit_defaults=True):
+        """Base for the decoders; unset fields are dropped when converted back to dicts"""
+
+    class Team(Struct):
+        id: Optional[int] = None
+        name: Optional[str] = None
+
+    class General(Struct):
+        matchId: Union[int, str, None] = None
+        matchName: Optional[str] = None
+        matchRound: Union[int, str, None] = None
+        matchTimeUTCDate: Optional[str] = None
+        leagueId: Optional[int] = None
+        leagueName: Optional[str] = None
+        countryCode: Optional[str] = None
+        homeTeam: Optional[Team] = None
+        awayTeam: Optional[Team] = None
+        started: Optional[bool] = None
+        finished: Optional[bool] = None
+
+    class HeaderTeam(Struct):
+        id: Optional[int] = None
+        name: Optional[str] = None
+        score: Optional[int] = None
+
+    class Header(Struct):
+        teams: List[HeaderTeam] = []
+
+    class InfoBox(Struct):
+        # Stadium is a dict on current payloads and a plain name on older ones,
+        # Attendance an int or {"number": ...}
+        Stadium: Any = None
+        Attendance: Any = None
+
+    class SwapPlayer(Struct):
+        id: Union[int, str, None] = None
+        name: Optional[str] = None
+
+    class Event(Struct):
+        type: Optional[str] = None
+        time: Optional[int] = None
+        overloadTime: Optional[int] = None
+        eventId: Optional[int] = None
+        isHome: Optional[bool] = None
+        playerId: Optional[int] = None
+        assistPlayerId: Optional[int] = None
+        card: Optional[str] = None
+        ownGoal: Optional[bool] = None
+        isPenaltyShootoutEvent: Optional[bool] = None
+        homeScore: Optional[int] = None
+        awayScore: Optional[int] = None
+        newScore: Optional[List[int]] = None
+        minutesAddedInput: Optional[int] = None
+        swap: List[SwapPlayer] = []
+
+    class MatchEvents(Struct):
+        events: List[Event] = []
+
+    class MatchFacts(Struct):
+        infoBox: Optional[InfoBox] = None
+        events: Optional[MatchEvents] = None
+
+    class SubstitutionEvent(Struct):
+        time: Optional[int] = None
+        type: Optional[str] = None
+
+    class PlayerEvent(Struct):
+        type: Optional[str] = None
+
+    class Performance(Struct):
+        rating: Optional[float] = None
+        substitutionEvents: List[SubstitutionEvent] = []
+        events: List[PlayerEvent] = []
+
+    class Unavailability(Struct):
+        type: Optional[str] = None
+        expectedReturn: Optional[str] = None
+
+    class Player(Struct):
+        id: Optional[int] = None
+        name: Optional[str] = None
+        firstName: Optional[str] = None
+        lastName: Optional[str] = None
+        age: Optional[int] = None
+        countryName: Optional[str] = None
+        countryCode: Optional[str] = None
+        positionId: Optional[int] = None
+        usualPlayingPositionId: Optional[int] = None
+        shirtNumber: Union[int, str, None] = None
+        performance: Optional[Performance] = None
+        unavailability: Optional[Unavailability] = None
+
+    class LineupTeam(Struct):
+        id: Optional[int] = None
+        name: Optional[str] = None
+        formation: Optional[str] = None
+        starters: List[Player] = []
+        subs: List[Player] = []
+        unavailable: List[Player] = []
+
+    class Lineup(Struct):
+        homeTeam: Optional[LineupTeam] = None
+        awayTeam: Optional[LineupTeam] = None
+
+    class Stat(Struct):
+        key: Optional[str] = None
+        title: Optional[str] = None
+        type: Optional[str] = None
+        stats: List[Any] = []
+        highlighted: Optional[str] = None
+
+    class StatCategory(Struct):
+        title: Optional[str] = None
+        key: Optional[str] = None
+        stats: List[Stat] = []
+
+    class Period(Struct):
+        stats: List[StatCategory] = []
+
+    class Stats(Struct):
+        Periods: Dict[str, Period] = {}
+
+    class Content(Struct):
+        matchFacts: Optional[MatchFacts] = None
+        lineup: Optional[Lineup] = None
+        stats: Optional[Stats] = None
+
+    class Address(Struct):
+        addressLocality: Optional[str] = None
+
+    class Location(Struct):
+        latitude: Optional[float] = None
+        longitude: Optional[float] = None
+        address: Optional[Address] = None
+
+    class EventJSONLD(Struct):
+        location: Optional[Location] = None
+
+    class Seo(Struct):
+        # parse_teams only needs the stadium location out of seo
+        eventJSONLD: Optional[EventJSONLD] = None
+
+    class MatchDetails(Struct):
+        general: Optional[General] = None
+        header: Optional[Header] = None
+        content: Optional[Content] = None
+        seo: Optional[Seo] = None
+
+    _decoder = msgspec.json.Decoder(MatchDetails)
+
+
+@timed("match_structs.decode_match_details")
+def decode_match_details(raw):
+    """Decode a matchDetails body (bytes/str) into the dict subset the parsers use.
+
+    Schema drift (a field changing type) is logged with its JSON path, and
+    the payload is then decoded in full so the run keeps going.
+    """
+    if msgspec is None:
+        return json_backend.loads(raw)
+    try:
+        return msgspec.to_builtins(_decoder.decode(raw))
+    except msgspec.ValidationError as e:
+        logger.error(f"matchDetails schema drift: {e}")
+        return json_backend.loads(raw)
@@ -0,0 +1,171 @@
+"""
+Opt-in profiling of extraction and parsing runs
+
+Off unless FOTMOB_PROFILE (or the DAG's "profile" param) names a mode:
+
+    timing    call counts and wall time of the hot paths wrapped with @timed
+              (API requests, JSON decode / encode, section filtering, uploads,
+              data_model_client parsers)
+    sample    timing plus a sampling profiler over every thread, written as
+              collapsed stacks for flamegraph.pl / speedscope / inferno
+    cprofile  timing plus a deterministic cProfile of the calling thread
+              (profile.prof and a cumulative-time table)
+
+Every profiled run writes {PROFILE_DIR}/{run_name}-{timestamp}/. With
+profiling off, a wrapped function costs one global lookup per call.
+
+Usage:
+    FOTMOB_PROFILE=sample python -m extract.backfill --season 2023/2024
+    flamegraph.pl /opt/airflow/data/profiles/backfill-*/stacks.collapsed > backfill.svg
+"""
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config.aws_config import PROFILE_DIR #type:ignore
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "FOTMOB_PROFILE"
+MODES = ("timing", "sample", "cprofile")
+OFF = ("", "0", "off", "false", "none")
+
+# the Profile of the run in progress, None when profiling is off
+_active = None
+
+
+def timed(name):
+    """Record calls and wall time of the wrapped function under `name` while a profile is active"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _active
+            if profile is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of every other thread each `interval` seconds into collapsed-stack counts"""
+
+    def __init__(self, interval=0.005):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Profile:
+    """Timings, samples and cProfile stats of one run, written to its own directory by stop()"""
+
+    def __init__(self, run_name, mode, output_dir=PROFILE_DIR, interval=0.005):
+        self.run_name = run_name
+        self.mode = mode
+        self.directory = os.path.join(output_dir, f"{run_name}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}")
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.sampler = Sampler(interval) if mode == "sample" else None
+        self.profiler = cProfile.Profile() if mode == "cprofile" else None
+        self.started = None
+
+    def record(self, name, seconds):
+        with self.lock:
+            entry = self.timings.get(name)
+            if entry is None:
+                entry = self.timings[name] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def timing_table(self):
+        """Tab-separated rows, slowest total first; times are inclusive of nested wrapped calls"""
+        rows = ["name\tcalls\ttotal_s\tmean_ms\tmax_ms"]
+        for name, (calls, total, longest) in sorted(self.timings.items(), key=lambda item: -item[1][1]):
+            rows.append(f"{name}\t{calls}\t{total:.4f}\t{1000 * total / calls:.3f}\t{1000 * longest:.3f}")
+        return "\n".join(rows) + "\n"
+
+    def stop(self):
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "timings.tsv"), "w") as f:
+            f.write(self.timing_table())
+        if self.sampler is not None:
+            with open(os.path.join(self.directory, "stacks.collapsed"), "w") as f:
+                for stack, count in self.sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        if self.profiler is not None:
+            self.profiler.dump_stats(os.path.join(self.directory, "profile.prof"))
+            table = io.StringIO()
+            pstats.Stats(self.profiler, stream=table).sort_stats("cumulative").print_stats(50)
+            with open(os.path.join(self.directory, "cprofile.txt"), "w") as f:
+                f.write(table.getvalue())
+
+        top = "\n".join(self.timing_table().splitlines()[:11])
+        logger.info(f"Profile of {self.run_name} ({self.mode}, {elapsed:.1f}s) written to {self.directory}\n{top}")
+
+
+@contextmanager
+def profiled(run_name, mode=None, output_dir=PROFILE_DIR):
+    """Profile the block when `mode` (default: $FOTMOB_PROFILE) is set; yields the Profile or None.
+
+    A block nested in an already profiled run is recorded by the outer profile.
+    """
+    global _active
+    mode = (os.environ.get(PROFILE_ENV, "") if mode is None else mode).strip().lower()
+    if mode in OFF or _active is not None:
+        yield _active
+        return
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode {mode!r}, expected one of {MODES}")
+
+    profile = Profile(run_name, mode, output_dir)
+    _active = profile
+    profile.start()
+    try:
+        yield profile
+    finally:
+        _active = None
+        profile.stop()
@@ -0,0 +1,426 @@
+"""
+Memory-bounded streaming reprocessor over the raw/json landing zone
+
+Keys come from the match index (or a paged LIST when a season has none), a
+bounded number of downloads run ahead of the parser (prefetch depth), and parsed rows are flushed to parquet part files
+every `chunk_rows` rows per table. Memory therefore depends on the prefetch
+depth and chunk size, not on how many seasons are reprocessed.
+
+With --workers N the keys are sharded across a process pool instead, so the
+pure-Python parsers are not held to one core by the GIL. Each worker
+downloads and parses its shard and sends every table back as one Arrow IPC
+stream (a flat byte buffer rather than pickled DataFrames); the parent reads
+the batches zero-copy and only concatenates them when writing a part file.
+
+Every batch (a worker shard, or --shard-size matches in-process) goes through
+the data-quality rules in extract/validation.py before it is written: matches
+failing a rule are dropped from every table and listed in the quarantine
+table, and the per-rule counts are written to {output_prefix}/_reports/.
+
+With --cache-dir the raw/json bodies are read through a local disk cache
+(extract/storage.py CachedStorage), so a repeat run of the same seasons
+reads memory-mapped local files; --offline serves a warm cache without S3.
+
+Repeated strings (team / player / country names, stat categories and keys)
+are categoricals from the batch on and are written as dictionary columns
+whose codes come from one registry per output prefix (extract/dictionaries.py).
+
+Usage (from the airflow/ directory):
+    python -m extract.reprocess --team real_madrid --season 2024/2025 --season 2023/2024 \
+        --output-root /opt/airflow/data --prefetch 8 --cache-dir /opt/airflow/data/cache
+    python -m extract.reprocess --team real_madrid --team barcelona --season 2024/2025 \
+        --output-root /opt/airflow/data --workers 0   # 0 = one worker per available core
+"""
+import argparse
+import io
+import logging
+import os
+import resource
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from extract import data_model_client as dmc
+from extract import json_backend
+from extract.dictionaries import DictionaryRegistry, categorize, dictionaries_key
+from extract.dim_players import build_scd2, compact_observations, load_dim, save_dim, split_players
+from extract.match_structs import decode_match_details
+from extract.match_index import MatchIndex
+from extract.profiling import profiled
+from extract.storage import CachedStorage, LocalStorage, S3Storage, raw_json_prefix
+from extract.validation import SOURCE, batch_tables, merge_reports, validate
+from config.aws_config import RAW_CACHE_DIR #type:ignore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PERIODS = ("All", "FirstHalf", "SecondHalf")
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def iter_raw_keys(storage, team_name, seasons):
+    """Landed match keys per season, from the match index when there is one, else a LIST"""
+    for season in seasons:
+        index = MatchIndex(storage, team_name, season)
+        if len(index):
+            if isinstance(storage, CachedStorage):
+                # cached copies of re-landed matches no longer match the index and are refetched
+                storage.expect(dict(zip(index.keys(), index.frame["md5"])))
+            yield from index.keys()
+            continue
+        for key, _ in storage.list_keys(raw_json_prefix(team_name, season)):
+            if key.endswith(".json"):
+                yield key
+
+
+def unique_match_keys(keys):
+    """Keys with every match id once: a match landed under a team and a competition prefix is read from the first"""
+    seen = set()
+    for key in keys:
+        match_id = key.rsplit("/", 1)[-1]
+        if match_id in seen:
+            continue
+        seen.add(match_id)
+        yield key
+
+
+def prefetch(storage, keys, depth=8):
+    """Yield (key, body) in key order with up to `depth` downloads in flight"""
+    # cache hits come back as memoryviews over the mapped file, the decoders take any buffer
+    read = storage.get_view if isinstance(storage, CachedStorage) else storage.get_bytes
+    with ThreadPoolExecutor(max_workers=depth) as pool:
+        pending = deque()
+        for key in keys:
+            pending.append((key, pool.submit(read, key)))
+            if len(pending) >= depth:
+                done_key, future = pending.popleft()
+                yield done_key, future.result()
+        while pending:
+            done_key, future = pending.popleft()
+            yield done_key, future.result()
+
+
+def parse_match(data):
+    """All parser outputs for one match, keyed by output table"""
+    match_id = data.get("general", {}).get("matchId")
+    stats = []
+    for period in PERIODS:
+        stats.extend(dict(row, period=period) for row in dmc.parse_stats(data, period, match_id))
+    # one walk over matchFacts.events feeds the intervals and the event table
+    timeline = dmc.match_timeline(data)
+    players, intervals = dmc.parse_players_and_intervals(data, timeline)
+    return {
+        "teams": dmc.parse_teams(data),
+        "leagues": dmc.parse_leagues(data),
+        "players": players,
+        "player_intervals": intervals,
+        "events": dmc.parse_events(data, timeline),
+        "matches": dmc.parse_matches(data),
+        "stats": stats,
+    }
+
+
+class ChunkedWriter:
+    """Buffers one table's rows and writes a parquet part file every `chunk_rows` rows"""
+
+    def __init__(self, storage, prefix, chunk_rows=50_000, dictionaries=None, table=None):
+        self.storage = storage
+        self.prefix = prefix
+        self.chunk_rows = chunk_rows
+        self.dictionaries = dictionaries
+        self.table = table
+        self.buffer = []
+        self.buffered = 0
+        self.parts = 0
+        self.rows = 0
+
+    def add(self, rows):
+        # rows is a list of dicts, a DataFrame (players, player_intervals) or an Arrow table (workers)
+        if len(rows) == 0:
+            return
+        if isinstance(rows, list):
+            rows = pd.DataFrame(rows)
+        if self.dictionaries is not None:
+            rows = self.dictionaries.encode(self.table, rows)
+        self.buffer.append(rows)
+        self.buffered += len(rows)
+        if self.buffered >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        frames = [b for b in self.buffer if isinstance(b, pd.DataFrame)]
+        tables = [b for b in self.buffer if isinstance(b, pa.Table)]
+        if frames:
+            tables.append(pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False))
+        # shards that only saw nulls in a column typed it as null; promote to the real type
+        table = pa.concat_tables(tables, promote_options="permissive") if len(tables) > 1 else tables[0]
+        if self.dictionaries is not None:
+            table = self.dictionaries.unify(self.table, table)
+        out = io.BytesIO()
+        pq.write_table(table, out)
+        self.storage.put_bytes(f"{self.prefix}/part-{self.parts:05d}.parquet", out.getvalue())
+        self.parts += 1
+        self.rows += table.num_rows
+        self.buffer, self.buffered = [], 0
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+def open_storage(root=None, cache_dir=None, offline=False):
+    """Storage from a picklable spec: a local root, or None for the S3 bucket, optionally behind a disk cache"""
+    backend = None if offline else LocalStorage(root) if root else S3Storage()
+    return CachedStorage(backend, cache_dir) if cache_dir else backend
+
+
+def to_ipc(rows):
+    """Serialize one table's rows to an Arrow IPC stream"""
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def from_ipc(body):
+    # reads the record batches in place over the received buffer
+    return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+
+
+_worker_storage = {}
+
+
+def process_batch(parsed, run_validation=True):
+    """Concatenate a batch of parse_match() outputs and validate it.
+
+    Returns (tables, quarantine rows, report rows, seconds spent validating).
+    """
+    tables = categorize(batch_tables(parsed))
+    if "events" in tables:
+        tables["events"] = dmc.event_frame(tables["events"])
+    if not run_validation:
+        clean, quarantine, report, seconds = {name: df.drop(columns=SOURCE) for name, df in tables.items()}, [], [], 0.0
+    else:
+        start = time.perf_counter()
+        clean, quarantine, report = validate(tables)
+        seconds = time.perf_counter() - start
+    if len(clean.get("players", [])) and "matches" in clean:
+        # slim fact rows; attributes go to dim_players once per run of equal attributes
+        clean["players"], clean["player_observations"] = split_players(clean["players"], clean["matches"])
+    return clean, quarantine, report, seconds
+
+
+def parse_shard(source_spec, keys, run_validation=True, expected=None):
+    """Worker: download, parse and validate a shard of keys, one Arrow IPC stream per table.
+
+    `source_spec` is the open_storage() arguments; `expected` the index MD5s of the keys for a cached source.
+    """
+    storage = _worker_storage.get(source_spec)
+    if storage is None:
+        # one client per worker process; boto3 clients are not picklable
+        storage = _worker_storage[source_spec] = open_storage(*source_spec)
+    read = storage.get_bytes
+    if isinstance(storage, CachedStorage):
+        storage.expect(expected or {})
+        read = storage.get_view
+
+    parsed = []
+    failed = 0
+    for key in keys:
+        try:
+            parsed.append((key, parse_match(decode_match_details(read(key)))))
+        except Exception as e:
+            logger.error(f"Failed to parse {key}: {e}")
+            failed += 1
+
+    tables, quarantine, report, seconds = process_batch(parsed, run_validation)
+    batches = {table: to_ipc(df) for table, df in tables.items() if len(df)}
+    return len(parsed), failed, batches, quarantine, report, seconds
+
+
+def iter_parallel(source_spec, keys, workers, shard_size=64, run_validation=True, expected=None):
+    """Yield parse_shard results in key order with at most 2 shards per worker in flight"""
+    keys = iter(keys)
+    expected = expected or {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            shard = list(islice(keys, shard_size))
+            if shard:
+                shard_expected = {key: expected[key] for key in shard if key in expected}
+                pending.append(pool.submit(parse_shard, source_spec, shard, run_validation, shard_expected))
+            if pending and (not shard or len(pending) >= 2 * workers):
+                yield pending.popleft().result()
+            elif not shard:
+                return
+
+
+class Run:
+    """Writers, counters and the validation report of one reprocess run"""
+
+    def __init__(self, sink, output_prefix, chunk_rows):
+        self.sink = sink
+        self.output_prefix = output_prefix
+        self.chunk_rows = chunk_rows
+        self.writers = {}
+        self.report = {}
+        self.matches = self.failed = self.quarantined = 0
+        self.validation_seconds = 0.0
+        self.observations = None
+        self.dictionaries = DictionaryRegistry(sink, dictionaries_key(output_prefix))
+        self.start = time.monotonic()
+
+    def write(self, table, rows):
+        if table not in self.writers:
+            self.writers[table] = ChunkedWriter(self.sink, f"{self.output_prefix}/{table}", self.chunk_rows,
+                                                self.dictionaries, table)
+        self.writers[table].add(rows)
+
+    def add_batch(self, matches, failed, tables, quarantine, report, seconds):
+        observations = tables.pop("player_observations", None)
+        if observations is not None:
+            if isinstance(observations, pa.Table):
+                observations = observations.to_pandas()
+            # compacted as they arrive, so this stays one row per (player, attribute hash)
+            self.observations = compact_observations(pd.concat([self.observations, observations], ignore_index=True))
+        for table, rows in tables.items():
+            self.write(table, rows)
+        if quarantine:
+            logger.warning(f"Quarantined {len(quarantine)} matches: {quarantine[:5]}")
+            self.write("quarantine", quarantine)
+        merge_reports(self.report, report)
+        reported = self.matches // 100
+        self.matches += matches
+        self.failed += failed
+        self.quarantined += len(quarantine)
+        self.validation_seconds += seconds
+        if self.matches // 100 > reported:
+            logger.info(f"Reprocessed {self.matches} matches, peak RSS {peak_rss_mb():.0f} MB")
+
+    def save_dim_players(self):
+        if self.observations is None:
+            return
+        key = f"{self.output_prefix}/dim_players/dim_players.parquet"
+        save_dim(self.sink, key, build_scd2(load_dim(self.sink, key), self.observations), self.dictionaries)
+
+    def summary(self):
+        for writer in self.writers.values():
+            writer.flush()
+        self.save_dim_players()
+        # after the last part file and dim_players, so a saved dictionary covers every value written
+        self.dictionaries.save()
+        summary = {
+            "matches": self.matches,
+            "failed": self.failed,
+            "quarantined": self.quarantined,
+            "seconds": round(time.monotonic() - self.start, 2),
+            "validation_seconds": round(self.validation_seconds, 3),
+            "rows": {table: writer.rows for table, writer in self.writers.items()},
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        if self.report:
+            summary["validation"] = self.report
+            ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            self.sink.put_bytes(f"{self.output_prefix}/_reports/validation-{ts}.json",
+                                json_backend.dumps(summary), "application/json")
+        logger.info(f"Reprocess complete: {summary}")
+        return summary
+
+
+def reprocess(source, keys, sink, output_prefix="processed", prefetch_depth=8, chunk_rows=50_000,
+              batch_size=64, run_validation=True):
+    """Parse in-process; every `batch_size` matches are validated together before writing"""
+    run = Run(sink, output_prefix, chunk_rows)
+    parsed = []
+    failed = 0
+
+    def flush():
+        run.add_batch(len(parsed), failed, *process_batch(parsed, run_validation))
+
+    for key, body in prefetch(source, keys, prefetch_depth):
+        try:
+            parsed.append((key, parse_match(decode_match_details(body))))
+        except Exception as e:
+            logger.error(f"Failed to parse {key}: {e}")
+            failed += 1
+        if len(parsed) + failed >= batch_size:
+            flush()
+            parsed, failed = [], 0
+    flush()
+
+    return run.summary()
+
+
+def reprocess_parallel(source_root, keys, sink, output_prefix="processed", workers=None,
+                       shard_size=64, chunk_rows=50_000, run_validation=True, cache_dir=None, offline=False,
+                       expected=None):
+    """reprocess() with parsing sharded across processes; source_root None reads from S3.
+
+    With `cache_dir` every worker reads through the shared disk cache; `expected` is the
+    index MD5 per key (CachedStorage.expected after iter_raw_keys).
+    """
+    workers = workers or available_cores()
+    run = Run(sink, output_prefix, chunk_rows)
+    logger.info(f"Parsing with {workers} worker processes, {shard_size} matches per shard")
+
+    for matches, failed, batches, quarantine, report, seconds in iter_parallel(
+            (source_root, cache_dir, offline), keys, workers, shard_size, run_validation, expected):
+        tables = {table: from_ipc(body) for table, body in batches.items()}
+        run.add_batch(matches, failed, tables, quarantine, report, seconds)
+
+    return run.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream landed matchDetails through the parsers into parquet")
+    parser.add_argument("--team", action="append", required=True, help="team or competition landing prefix (repeatable); a match under several is read once")
+    parser.add_argument("--season", action="append", required=True, help="season like 2023/2024 (repeatable)")
+    parser.add_argument("--source-root", default=None, help="local landing dir instead of S3")
+    parser.add_argument("--output-root", default=None, help="local output dir instead of S3")
+    parser.add_argument("--output-prefix", default="processed")
+    parser.add_argument("--prefetch", type=int, default=8, help="downloads in flight ahead of the parser")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="rows per parquet part file")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parse in this many processes (0 = available cores); default parses in-process")
+    parser.add_argument("--shard-size", type=int, default=64, help="matches per worker task / validation batch")
+    parser.add_argument("--no-validate", action="store_true", help="skip the data-quality rules")
+    parser.add_argument("--cache-dir", default=None, help=f"read raw/json through a local disk cache (e.g. {RAW_CACHE_DIR})")
+    parser.add_argument("--offline", action="store_true", help="serve everything from --cache-dir, no S3 / source root")
+    args = parser.parse_args()
+    if args.offline and not args.cache_dir:
+        parser.error("--offline needs --cache-dir")
+
+    source = open_storage(args.source_root, args.cache_dir, args.offline)
+    sink = open_storage(args.output_root)
+    # FOTMOB_PROFILE profiles this process; with --workers the parsing happens in the workers, unprofiled
+    with profiled("reprocess"):
+        if args.workers is not None:
+            # the keys (and the index MD5s the cache validates against) are needed before sharding
+            keys = list(unique_match_keys(key for team in args.team for key in iter_raw_keys(source, team, args.season)))
+            return reprocess_parallel(args.source_root, keys, sink, args.output_prefix,
+                                      args.workers or None, args.shard_size, args.chunk_rows, not args.no_validate,
+                                      args.cache_dir, args.offline, getattr(source, "expected", None))
+        keys = unique_match_keys(key for team in args.team for key in iter_raw_keys(source, team, args.season))
+        return reprocess(source, keys, sink, args.output_prefix, args.prefetch, args.chunk_rows,
+                         args.shard_size, not args.no_validate)
+
+
+if __name__ == "__main__":
+    main()
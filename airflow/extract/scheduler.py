@@ -0,0 +1,184 @@
+"""
+Fixture-calendar scheduling: extract each match shortly after its final whistle
+
+The league fixtures list is cached per league/season in storage
+(raw/fixtures/{league_id}/{season}.json) and only re-fetched when it is
+older than `max_age`, or every `pending_refresh` while a past-due match is
+still shown unfinished (extra time, delays, late data). A match is due once
+its kick-off plus `settle` has passed and the fixtures say it finished;
+only due matches that are not in the match index are fetched, so a run
+with nothing due costs no API calls at all.
+
+Usage (from the airflow/ directory):
+    python -m extract.scheduler --config config/teams/real_madrid.json
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from extract import json_backend
+from extract.extract_fotmob_data import land_matches, load_team_config, s3_client, team_league_ids, upload_to_s3
+from extract.fotmob_client import FotMobClient
+from extract.history import HistoryStore
+from extract.match_index import MatchIndex
+from extract.storage import S3Storage
+from config.aws_config import S3_PATHS, SEASONS #type:ignore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# kick-off to full time is ~115 min with half-time and stoppage; FotMob finalizes the page shortly after
+SETTLE = timedelta(minutes=135)
+PENDING_REFRESH = timedelta(minutes=30)
+FIXTURE_MAX_AGE = timedelta(hours=12)
+GIVE_UP_AFTER = timedelta(days=2)
+
+
+def fixtures_key(league_id, season):
+    return f"{S3_PATHS['raw_fixtures']}/{league_id}/{season.replace('/', '_')}.json"
+
+
+def parse_utc(value):
+    return pd.Timestamp(value).tz_convert("UTC").to_pydatetime() if value else None
+
+
+class FixtureCache:
+    """League fixtures list kept in storage with the time it was fetched"""
+
+    def __init__(self, storage, league_id, season):
+        self.storage = storage
+        self.league_id = league_id
+        self.season = season
+        self.key = fixtures_key(league_id, season)
+        self.fixtures = None
+        self.fetched_at = None
+        if storage.exists(self.key):
+            cached = json_backend.loads(storage.get_bytes(self.key))
+            self.fixtures = cached.get("fixtures", [])
+            self.fetched_at = parse_utc(cached.get("fetched_at"))
+
+    def age(self, now):
+        return now - self.fetched_at if self.fetched_at else timedelta.max
+
+    def refresh(self, client, now):
+        fixtures = client.get_league_fixtures(self.league_id, self.season)
+        if not fixtures:
+            # keep serving the previous list rather than an empty calendar
+            logger.warning(f"No fixtures returned for league {self.league_id} {self.season}, keeping cache")
+            return self.fixtures or []
+        self.fixtures, self.fetched_at = fixtures, now
+        self.storage.put_bytes(self.key, json_backend.dumps({
+            "league_id": self.league_id,
+            "season": self.season,
+            "fetched_at": now.isoformat(),
+            "fixtures": fixtures,
+        }), "application/json")
+        logger.info(f"Cached {len(fixtures)} fixtures for league {self.league_id} {self.season}")
+        return fixtures
+
+
+def plan_matches(fixtures, team_id, landed, now, settle=SETTLE, give_up_after=GIVE_UP_AFTER):
+    """Sort the team's fixtures into due / waiting / overdue match ids plus the next due time.
+
+    due      past kick-off + settle, finished, not landed
+    waiting  past kick-off + settle but not finished yet (re-checked on later runs)
+    overdue  still not landed `give_up_after` past its due time (left to the daily catch-up)
+    """
+    plan = {"due": [], "waiting": [], "overdue": [], "next_due_at": None}
+    for match in fixtures:
+        if str(team_id) not in (str(match.get("home", {}).get("id")), str(match.get("away", {}).get("id"))):
+            continue
+        status = match.get("status", {})
+        kickoff = parse_utc(status.get("utcTime"))
+        if kickoff is None or status.get("cancelled") or str(match.get("id")) in landed:
+            continue
+        due_at = kickoff + settle
+        if due_at > now:
+            if plan["next_due_at"] is None or due_at < plan["next_due_at"]:
+                plan["next_due_at"] = due_at
+        elif now - due_at > give_up_after:
+            plan["overdue"].append(match["id"])
+        elif status.get("finished"):
+            plan["due"].append(match["id"])
+        else:
+            plan["waiting"].append(match["id"])
+    return plan
+
+
+def run_scheduled(config_path, season=None, client=None, upload=upload_to_s3, storage=None, now=None,
+                  settle=SETTLE, pending_refresh=PENDING_REFRESH, max_age=FIXTURE_MAX_AGE):
+    """One scheduler tick for a team: land the matches whose final whistle has passed.
+
+    Returns the number of matches landed. The FotMob client (and its API
+    gateway) is only created when the fixtures cache needs a refresh or a
+    match is due.
+    """
+    config = load_team_config(config_path)
+    team_name = config["team_name"]
+    season = season or (config.get("seasons") or SEASONS)[0]
+    now = now or datetime.now(timezone.utc)
+
+    storage = storage or S3Storage(client=s3_client)
+    index = MatchIndex(storage, team_name, season)
+    # one cached calendar per competition the team plays in
+    caches = [FixtureCache(storage, league_id, season) for league_id in team_league_ids(config)]
+    owns_client = client is None
+
+    def api():
+        nonlocal client
+        client = client or FotMobClient()
+        return client
+
+    def fixtures():
+        return [match for cache in caches for match in cache.fixtures or []]
+
+    try:
+        for cache in caches:
+            if cache.fixtures is None or cache.age(now) >= max_age:
+                cache.refresh(api(), now)
+        landed = {str(m) for m in index.match_ids()}
+        plan = plan_matches(fixtures(), config["team_id"], landed, now, settle)
+
+        waiting = {str(m) for m in plan["waiting"]}
+        stale = [cache for cache in caches if cache.age(now) >= pending_refresh
+                 and any(str(match.get("id")) in waiting for match in cache.fixtures or [])]
+        if stale:
+            # the cached status predates the final whistle; re-check at most every pending_refresh
+            for cache in stale:
+                cache.refresh(api(), now)
+            plan = plan_matches(fixtures(), config["team_id"], landed, now, settle)
+
+        if plan["overdue"]:
+            logger.warning(f"{team_name} {season}: {len(plan['overdue'])} matches overdue: {plan['overdue']}")
+        if not plan["due"]:
+            logger.info(f"{team_name} {season}: nothing due ({len(plan['waiting'])} waiting), "
+                        f"next due at {plan['next_due_at']}")
+            return 0
+
+        logger.info(f"{team_name} {season}: {len(plan['due'])} matches due: {plan['due']}")
+        history = HistoryStore(storage, team_name, season)
+        landed_count = 0
+        try:
+            for match_id, ok in land_matches(api(), plan["due"], team_name, season, upload, index, history=history):
+                landed_count += ok
+        finally:
+            index.save()
+            history.save()
+        return landed_count
+    finally:
+        if owns_client and client is not None:
+            client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Land the team's matches whose final whistle has passed")
+    parser.add_argument("--config", required=True, help="team config file")
+    parser.add_argument("--season", default=None, help="season like 2024/2025 (default: the config's first)")
+    args = parser.parse_args()
+    return run_scheduled(args.config, args.season)
+
+
+if __name__ == "__main__":
+    main()
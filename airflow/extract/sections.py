@@ -0,0 +1,94 @@
+"""
+Section filter for matchDetails bodies before landing
+
+An allowlist is a set of dotted paths ("content.lineup", "seo.eventJSONLD");
+each path is kept whole and everything else is dropped. With msgspec the
+filter is a decoder generated from the allowlist: unknown keys are skipped
+by the parser without being built into objects, and kept sections are
+msgspec.Raw slices written back byte-for-byte. Without msgspec the body is
+decoded in full and pruned.
+"""
+import logging
+from functools import lru_cache
+from typing import Union
+
+from extract import json_backend
+from extract.profiling import timed
+from config.aws_config import LANDED_PRODUCTS, SECTION_ALLOWLISTS #type:ignore
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def allowlist(products):
+    """Union of the section paths of the given output products, None for the full payload"""
+    if products is None:
+        return None
+    unknown = set(products) - set(SECTION_ALLOWLISTS)
+    if unknown:
+        raise ValueError(f"Unknown output products: {sorted(unknown)}")
+    return tuple(sorted({path for product in products for path in SECTION_ALLOWLISTS[product]}))
+
+
+def section_tree(paths):
+    """Dotted paths -> nested dict, None marks a section kept whole"""
+    tree = {}
+    # shortest first, so a parent path wins over its children
+    for path in sorted(paths, key=lambda p: p.count(".")):
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if node is None:
+                break
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def prune(data, tree):
+    """Keep only the tree's sections of an already decoded payload"""
+    kept = {}
+    for key, sub in tree.items():
+        if key not in data:
+            continue
+        if sub is None:
+            kept[key] = data[key]
+        elif isinstance(data[key], dict):
+            kept[key] = prune(data[key], sub)
+    return kept
+
+
+if msgspec is not None:
+
+    def _struct(name, tree):
+        fields = []
+        for key, sub in tree.items():
+            kind = msgspec.Raw if sub is None else _struct(f"{name}_{key}", sub)
+            fields.append((key, Union[kind, msgspec.UnsetType], msgspec.UNSET))
+        return msgspec.defstruct(name, fields)
+
+    @lru_cache(maxsize=None)
+    def _decoder(paths):
+        return msgspec.json.Decoder(_struct("Sections", section_tree(paths)))
+
+
+@timed("sections.filter_sections")
+def filter_sections(body, paths):
+    """Re-encode a matchDetails body (bytes) with only the allowlisted sections"""
+    if not paths:
+        return body
+    if msgspec is not None:
+        try:
+            return msgspec.json.encode(_decoder(tuple(paths)).decode(body))
+        except msgspec.ValidationError as e:
+            # a kept path's parent is not an object (null on older payloads); prune the full decode instead
+            logger.warning(f"Section filter fell back to a full decode: {e}")
+    return json_backend.dumps(prune(json_backend.loads(body), section_tree(paths)))
+
+
+LANDED_SECTIONS = allowlist(LANDED_PRODUCTS)
@@ -0,0 +1,341 @@
+"""
+Object storage for the raw landing zone: S3 or a local directory with the same key layout
+
+CachedStorage puts a size-bounded local disk cache in front of either one
+for the immutable-ish raw/json bodies, so repeat reprocess runs and notebook
+sessions read from local disk (memory-mapped) instead of S3.
+
+Small objects that several writers read, merge and rewrite (the match index,
+the history store) go through merge_put(): a conditional PUT on the version
+that was read, retried on a conflict, so concurrent writers never drop each
+other's entries.
+"""
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import random
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from config.aws_config import AWS_REGION, RAW_CACHE_MAX_BYTES, S3_BUCKET, S3_PATHS #type:ignore
+
+logger = logging.getLogger(__name__)
+
+
+def raw_json_prefix(team_name, season):
+    return f"{S3_PATHS['raw_json']}/{team_name}/{season.replace('/', '_')}/"
+
+
+def raw_json_key(team_name, season, match_id):
+    return f"{raw_json_prefix(team_name, season)}{match_id}.json"
+
+
+def merge_put(storage, key, merge, content_type="application/octet-stream", attempts=10):
+    """Read-merge-write one object without losing a concurrent writer's update.
+
+    `merge` gets the stored body (None when the object does not exist yet)
+    and returns the new body. The PUT only succeeds if the object is still
+    the version that was read; otherwise it is re-read and merged again.
+    Returns the body written.
+    """
+    for attempt in range(attempts):
+        current, version = storage.get_versioned(key)
+        body = merge(current)
+        if storage.put_bytes_if(key, body, version, content_type):
+            return body
+        logger.info(f"{key} changed while merging (attempt {attempt + 1}), merging again")
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+    raise RuntimeError(f"Gave up writing {key} after {attempts} conflicting writes")
+
+
+class S3Storage:
+    def __init__(self, bucket=S3_BUCKET, client=None):
+        self.bucket = bucket
+        self.client = client or boto3.client("s3", region_name=AWS_REGION)
+
+    def list_keys(self, prefix, page_size=1000):
+        """Yield (key, size) under prefix one LIST page at a time"""
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=prefix, PaginationConfig={"PageSize": page_size})
+        for page in pages:
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["Size"]
+
+    def get_bytes(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def put_bytes(self, key, body, content_type="application/octet-stream"):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+
+    def get_versioned(self, key):
+        """(body, ETag), or (None, None) when the object does not exist"""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None, None
+            raise
+        return response["Body"].read(), response["ETag"]
+
+    def put_bytes_if(self, key, body, version, content_type="application/octet-stream"):
+        """PUT only if the object is still at `version` (None: only if it does not exist); False on a conflict"""
+        condition = {"IfMatch": version} if version else {"IfNoneMatch": "*"}
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type, **condition)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return False
+            raise
+        return True
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def __str__(self):
+        return f"s3://{self.bucket}"
+
+
+class LocalStorage:
+    """Directory tree mirroring the bucket layout (dev boxes, benchmarks, reprocess outputs)"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def list_keys(self, prefix, page_size=None):
+        """Yield (key, size) under prefix in key order without building the full listing"""
+        base = self.path(prefix.rstrip("/")) if prefix.endswith("/") else os.path.dirname(self.path(prefix))
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames.sort()
+            for name in sorted(filenames):
+                full = os.path.join(dirpath, name)
+                key = os.path.relpath(full, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    yield key, os.path.getsize(full)
+
+    def get_bytes(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def put_bytes(self, key, body, content_type=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # one temporary file per writer thread: concurrent writers of a key (workers filling the
+        # same cache entry, re-landed matches) must not write into each other's file before the rename
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get_versioned(self, key):
+        """(body, MD5 of the body), or (None, None) when the file does not exist"""
+        try:
+            body = self.get_bytes(key)
+        except FileNotFoundError:
+            return None, None
+        return body, hashlib.md5(body).hexdigest()
+
+    def put_bytes_if(self, key, body, version, content_type=None):
+        """put_bytes() only if the file is still at `version`; an flock on the root serializes the check"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".put.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.get_versioned(key)[1] != version:
+                return False
+            self.put_bytes(key, body)
+        return True
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def __str__(self):
+        return self.root
+
+
+class CachedStorage:
+    """Read-through disk cache in front of another storage.
+
+    Bodies under `cached_prefixes` (raw/json) are kept in `cache_dir` with
+    the bucket's key layout plus a `{key}.md5` sidecar. A hit is served as a
+    memoryview over the memory-mapped file after its MD5 is checked against
+    the sidecar (a torn or corrupted file is re-downloaded) and against the
+    expected MD5 from the match index when one was registered with expect()
+    (a re-landed match is re-downloaded). Least recently read bodies are
+    evicted once the cache grows past `max_bytes`.
+
+    Keys under `mirrored_prefixes` (raw/index) always come from the backend
+    but a copy is kept, so with backend=None (offline) a warm cache serves
+    index lookups and bodies with no S3 at all.
+    """
+
+    def __init__(self, backend, cache_dir, max_bytes=RAW_CACHE_MAX_BYTES,
+                 cached_prefixes=(f"{S3_PATHS['raw_json']}/",), mirrored_prefixes=(f"{S3_PATHS['raw_index']}/",)):
+        self.backend = backend
+        self.local = LocalStorage(cache_dir)
+        self.max_bytes = max_bytes
+        self.cached_prefixes = tuple(cached_prefixes)
+        self.mirrored_prefixes = tuple(mirrored_prefixes)
+        self.lock = threading.Lock()
+        self.expected = {}
+        self.hits = self.misses = self.invalid = 0
+        self.size = sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        """(path, size, last read time) of every cached body"""
+        for prefix in self.cached_prefixes:
+            base = self.local.path(prefix.rstrip("/"))
+            for dirpath, _, filenames in os.walk(base):
+                for name in filenames:
+                    if name.endswith((".md5", ".tmp")):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        # evicted by another worker meanwhile
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def expect(self, md5_by_key):
+        """Register the MD5 each key should have (match index md5 column); stale cached copies are refetched"""
+        self.expected.update(md5_by_key)
+
+    def _cached(self, key):
+        return key.startswith(self.cached_prefixes)
+
+    def _hit(self, key):
+        path = self.local.path(key)
+        try:
+            with open(f"{path}.md5") as f:
+                md5 = f.read().strip()
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: an empty file cannot be mapped
+            return None
+        expected = self.expected.get(key)
+        if (expected and expected != md5) or hashlib.md5(mapped).hexdigest() != md5:
+            self.invalid += 1
+            logger.warning(f"Cached {key} is stale or corrupt, refetching")
+            mapped.close()
+            return None
+        # the modification time is the LRU clock
+        os.utime(path)
+        self.hits += 1
+        return memoryview(mapped)
+
+    def _fill(self, key):
+        if self.backend is None:
+            raise FileNotFoundError(f"{key} is not in the cache at {self.local} (offline)")
+        body = self.backend.get_bytes(key)
+        md5 = hashlib.md5(body).hexdigest()
+        if self.expected.get(key, md5) != md5:
+            # the backend is the truth: keep the body and expect its MD5 from now on, or every read refetches it
+            logger.warning(f"{key} in {self.backend} does not match the index MD5, the index is out of date")
+            self.expected[key] = md5
+        self.misses += 1
+        self._store(key, body, md5)
+        return body
+
+    def _store(self, key, body, md5):
+        try:
+            # a refetched or re-landed body replaces the old copy
+            replaced = os.path.getsize(self.local.path(key))
+        except FileNotFoundError:
+            replaced = 0
+        # body before sidecar: a crash in between leaves a mismatch, which reads as a miss
+        self.local.put_bytes(key, body)
+        self.local.put_bytes(f"{key}.md5", md5.encode())
+        with self.lock:
+            self.size += len(body) - replaced
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self, target=0.9):
+        """Delete least recently read bodies until the cache is below `target` of max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if self.size <= self.max_bytes * target:
+                break
+            for victim in (path, f"{path}.md5"):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            self.size -= size
+            removed += 1
+        logger.info(f"Evicted {removed} cached objects, {self.size / 2**20:.0f} MiB left in {self.local}")
+
+    def get_view(self, key):
+        """Body as a read-only buffer: a memoryview over the mapped cache file on a hit, bytes otherwise"""
+        if not self._cached(key):
+            return self.get_bytes(key)
+        return self._hit(key) or self._fill(key)
+
+    def get_bytes(self, key):
+        if self._cached(key):
+            body = self.get_view(key)
+            return body if isinstance(body, bytes) else body.tobytes()
+        if self.backend is None:
+            return self.local.get_bytes(key)
+        body = self.backend.get_bytes(key)
+        if key.startswith(self.mirrored_prefixes):
+            self.local.put_bytes(key, body)
+        return body
+
+    def put_bytes(self, key, body, content_type="application/octet-stream"):
+        if self.backend is not None:
+            self.backend.put_bytes(key, body, content_type)
+        if self._cached(key):
+            # write-through, so a match landed from this box is a hit right away
+            self._store(key, body, hashlib.md5(body).hexdigest())
+        elif self.backend is None or key.startswith(self.mirrored_prefixes):
+            self.local.put_bytes(key, body)
+
+    def get_versioned(self, key):
+        if self.backend is None:
+            return self.local.get_versioned(key)
+        return self.backend.get_versioned(key)
+
+    def put_bytes_if(self, key, body, version, content_type="application/octet-stream"):
+        if self.backend is None:
+            return self.local.put_bytes_if(key, body, version, content_type)
+        if not self.backend.put_bytes_if(key, body, version, content_type):
+            return False
+        if key.startswith(self.mirrored_prefixes):
+            self.local.put_bytes(key, body)
+        return True
+
+    def list_keys(self, prefix, page_size=1000):
+        if self.backend is None:
+            for key, size in self.local.list_keys(prefix):
+                if not key.endswith((".md5", ".tmp")):
+                    yield key, size
+            return
+        yield from self.backend.list_keys(prefix, page_size)
+
+    def exists(self, key):
+        if self.backend is None:
+            return self.local.exists(key)
+        return self.backend.exists(key)
+
+    def __str__(self):
+        return f"{self.local} (cache of {self.backend or 'nothing, offline'})"
@@ -0,0 +1,147 @@
+"""
+Declarative data-quality rules applied to whole batches of parser output
+
+A batch is the parse_match() tables of many matches concatenated, with a
+`_source` column holding the landed key each row came from. Every rule is a
+vectorized check over one table that flags failing rows; any match with a
+failing row is quarantined (all of its rows are dropped from every table)
+and the per-rule counts go into the run report.
+
+Checks:
+    not_null    every listed column is set
+    range       listed columns are numeric and within [min, max]
+    sum         listed columns add up to `equals` (+/- tolerance)
+    references  the listed columns exist in `ref_table` for the same match
+"""
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "_source"
+
+XG_KEYS = ["expected_goals", "expected_goals_open_play", "expected_goals_set_play",
+           "expected_goals_non_penalty", "expected_goals_on_target"]
+
+RULES = [
+    {"name": "match_keys_not_null", "table": "matches", "check": "not_null",
+     "columns": ["match_id", "league_id", "home_team_id", "away_team_id"]},
+    {"name": "team_id_not_null", "table": "teams", "check": "not_null", "columns": ["team_id"]},
+    {"name": "player_keys_not_null", "table": "players", "check": "not_null",
+     "columns": ["match_id", "team_id", "player_id"]},
+    {"name": "score_range", "table": "matches", "check": "range",
+     "columns": ["home_score", "away_score"], "min": 0, "max": 30},
+    {"name": "xg_bounds", "table": "stats", "check": "range", "where": {"stat_key": XG_KEYS},
+     "columns": ["home_value", "away_value"], "min": 0, "max": 10},
+    {"name": "possession_sums_to_100", "table": "stats", "check": "sum", "where": {"stat_key": ["BallPossesion"]},
+     "columns": ["home_value", "away_value"], "equals": 100, "tolerance": 1},
+    {"name": "minutes_played_range", "table": "player_intervals", "check": "range",
+     "columns": ["minutes_played"], "min": 0, "max": 150},
+    {"name": "player_team_in_match", "table": "players", "check": "references",
+     "columns": ["team_id"], "ref_table": "teams", "ref_columns": ["team_id"]},
+    {"name": "home_team_in_match", "table": "matches", "check": "references",
+     "columns": ["home_team_id"], "ref_table": "teams", "ref_columns": ["team_id"]},
+    {"name": "away_team_in_match", "table": "matches", "check": "references",
+     "columns": ["away_team_id"], "ref_table": "teams", "ref_columns": ["team_id"]},
+]
+
+
+def numeric(df, columns):
+    return df[columns].apply(pd.to_numeric, errors="coerce")
+
+
+def check_not_null(df, rule, tables):
+    return df[rule["columns"]].isna().any(axis=1)
+
+
+def check_range(df, rule, tables):
+    values = numeric(df, rule["columns"])
+    # unparseable and missing values fail as well
+    return (values.isna() | (values < rule["min"]) | (values > rule["max"])).any(axis=1)
+
+
+def check_sum(df, rule, tables):
+    values = numeric(df, rule["columns"])
+    total = values.sum(axis=1, min_count=len(rule["columns"]))
+    return total.isna() | ((total - rule["equals"]).abs() > rule.get("tolerance", 0))
+
+
+def check_references(df, rule, tables):
+    ref = tables.get(rule["ref_table"])
+    if ref is None or ref.empty:
+        return pd.Series(True, index=df.index)
+    keys = numeric(df, rule["columns"]).assign(**{SOURCE: df[SOURCE]})
+    ref_keys = numeric(ref, rule["ref_columns"]).set_axis(rule["columns"], axis=1)
+    ref_keys = ref_keys.assign(**{SOURCE: ref[SOURCE], "_found": True}).drop_duplicates()
+    found = keys.merge(ref_keys, how="left", on=list(keys.columns))["_found"].notna().to_numpy()
+    return pd.Series(~found, index=df.index) | keys[rule["columns"]].isna().any(axis=1)
+
+
+CHECKS = {
+    "not_null": check_not_null,
+    "range": check_range,
+    "sum": check_sum,
+    "references": check_references,
+}
+
+
+def batch_tables(parsed):
+    """[(source key, parse_match() tables), ...] -> one DataFrame per table with a _source column"""
+    parts = {}
+    for source, tables in parsed:
+        for name, rows in tables.items():
+            if len(rows):
+                parts.setdefault(name, []).append((source, rows))
+
+    batch = {}
+    for name, items in parts.items():
+        sources = [source for source, rows in items for _ in range(len(rows))]
+        if isinstance(items[0][1], pd.DataFrame):
+            frame = pd.concat([rows for _, rows in items], ignore_index=True)
+        else:
+            # list-of-dict tables become one DataFrame per batch rather than one per match
+            frame = pd.DataFrame([row for _, rows in items for row in rows])
+        frame[SOURCE] = sources
+        batch[name] = frame
+    return batch
+
+
+def validate(tables, rules=RULES):
+    """Apply the rules to a batch.
+
+    Returns (clean tables without the _source column, quarantine rows with
+    the failed rules per source, report rows per rule).
+    """
+    failed_rules = {}
+    report = []
+    for rule in rules:
+        df = tables.get(rule["table"])
+        if df is None or df.empty:
+            continue
+        for column, allowed in rule.get("where", {}).items():
+            df = df[df[column].isin(allowed)]
+        failed = CHECKS[rule["check"]](df, rule, tables)
+        bad_sources = df.loc[failed, SOURCE].unique()
+        for source in bad_sources:
+            failed_rules.setdefault(source, []).append(rule["name"])
+        report.append({"rule": rule["name"], "table": rule["table"], "checked": len(df),
+                       "failed_rows": int(failed.sum()), "failed_matches": len(bad_sources)})
+
+    quarantined = list(failed_rules)
+    clean = {}
+    for name, df in tables.items():
+        keep = ~df[SOURCE].isin(quarantined) if quarantined else slice(None)
+        clean[name] = df.loc[keep].drop(columns=SOURCE).reset_index(drop=True)
+    quarantine = [{"key": source, "failed_rules": ",".join(names)} for source, names in failed_rules.items()]
+    return clean, quarantine, report
+
+
+def merge_reports(total, report):
+    """Accumulate per-batch report rows into per-rule run totals"""
+    for row in report:
+        entry = total.setdefault(row["rule"], {"table": row["table"], "checked": 0,
+                                               "failed_rows": 0, "failed_matches": 0})
+        for field in ("checked", "failed_rows", "failed_matches"):
+            entry[field] += row[field]
+    return total
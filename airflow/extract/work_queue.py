@@ -0,0 +1,338 @@
+"""
+Prioritized extraction work queue over whole competitions (config COMPETITIONS)
+
+`enqueue` reads every competition's fixtures (through the scheduler's
+FixtureCache, so a past season's calendar is only refetched while some of
+its fixtures are unfinished) and queues each
+finished match that is not in the competition's match index. The queue is a
+SQLite file on the data volume, one row per (competition, season, match),
+and is claimed in priority order:
+
+    0  fresh     current season, kicked off within FRESH_WINDOW
+    1  current   the rest of the current season
+    2  backfill  past seasons
+
+then by the competition's priority and newest kick-off first, so a backlog
+of historical seasons never delays a match that finished an hour ago.
+
+Any number of `work` processes (Airflow tasks, shells) claim batches under a
+lease, land them with land_matches() into raw/json/{competition}/{season}/
+and mark them done; a worker that dies leaves its lease to expire and the
+matches go back to the queue. Failed matches are retried with backoff up to
+MAX_ATTEMPTS. Every FotMobClient on the host (queue workers, team DAG,
+scheduler, live, backfill) waits on the same SQLite-backed rate budget
+(fotmob_client.SharedRateLimiter, a table in this file), so adding workers
+adds concurrency, not request rate.
+
+A competition prefix and a team prefix can both land the same match (Real
+Madrid's LaLiga, Champions League and Copa del Rey matches); the
+reprocessor reads each match id once across the prefixes it is given.
+
+Usage (from the airflow/ directory):
+    python -m extract.work_queue enqueue --competition laliga --competition champions_league
+    python -m extract.work_queue work --max-minutes 50
+    python -m extract.work_queue status
+"""
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from extract.extract_fotmob_data import land_matches, s3_client, upload_to_s3
+from extract.fotmob_client import FotMobClient, SharedRateLimiter
+from extract.history import HistoryStore
+from extract.match_index import MatchIndex
+from extract.scheduler import FIXTURE_MAX_AGE, SETTLE, FixtureCache, parse_utc
+from extract.storage import S3Storage
+from config.aws_config import COMPETITIONS, WORK_QUEUE_PATH #type:ignore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FRESH, CURRENT, BACKFILL = 0, 1, 2
+FRESH_WINDOW = timedelta(days=7)
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 5
+MAX_BACKOFF_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    competition TEXT NOT NULL,
+    season TEXT NOT NULL,
+    match_id TEXT NOT NULL,
+    kickoff TEXT,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    updated_at TEXT,
+    UNIQUE (competition, season, match_id)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_priority ON tasks (state, priority, kickoff);
+"""
+
+
+@contextmanager
+def transaction(path):
+    """A write transaction on its own connection; BEGIN IMMEDIATE serializes writers across processes"""
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+class WorkQueue:
+    """Leased, prioritized (competition, season, match) tasks in one SQLite file"""
+
+    def __init__(self, path=WORK_QUEUE_PATH, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=60)
+        try:
+            # readers (status, claims waiting for the lock) never block the writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def enqueue(self, tasks):
+        """Queue task dicts (competition, season, match_id, kickoff, priority); returns how many were new.
+
+        A match that is already queued keeps its state; a pending one takes the new priority.
+        """
+        rows = [(t["competition"], t["season"], str(t["match_id"]), t["kickoff"], t["priority"],
+                 datetime.now(timezone.utc).isoformat()) for t in tasks]
+        with transaction(self.path) as conn:
+            added = conn.executemany(
+                "INSERT OR IGNORE INTO tasks (competition, season, match_id, kickoff, priority, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows).rowcount
+            conn.executemany(
+                "UPDATE tasks SET kickoff = ?, priority = ? "
+                "WHERE competition = ? AND season = ? AND match_id = ? AND state = 'pending'",
+                [(kickoff, priority, competition, season, match_id)
+                 for competition, season, match_id, kickoff, priority, _ in rows])
+        return added
+
+    def claim(self, worker, limit):
+        """Lease up to `limit` tasks in priority order: pending ones past their backoff, then expired leases"""
+        now = time.time()
+        with transaction(self.path) as conn:
+            conn.execute("UPDATE tasks SET state = 'failed' WHERE state = 'leased' AND lease_until <= ? "
+                         "AND attempts >= ?", (now, self.max_attempts))
+            tasks = [dict(row) for row in conn.execute(
+                "SELECT id, competition, season, match_id, kickoff, priority, attempts FROM tasks "
+                "WHERE (state = 'pending' AND available_at <= ?) OR (state = 'leased' AND lease_until <= ?) "
+                "ORDER BY priority, kickoff DESC LIMIT ?", (now, now, limit))]
+            conn.executemany(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, lease_until = ?, worker = ?, "
+                "updated_at = ? WHERE id = ?",
+                [(now + self.lease_seconds, worker, datetime.now(timezone.utc).isoformat(), task["id"])
+                 for task in tasks])
+        return tasks
+
+    def finish(self, done=(), failed=(), released=()):
+        """Settle claimed task ids.
+
+        done      landed, never claimed again
+        failed    back to pending after an exponential backoff, or failed for good after max_attempts
+        released  back to pending at once without spending the attempt (upstream outage, shutdown)
+        """
+        now = time.time()
+        stamp = datetime.now(timezone.utc).isoformat()
+        with transaction(self.path) as conn:
+            conn.executemany("UPDATE tasks SET state = 'done', lease_until = NULL, updated_at = ? WHERE id = ?",
+                             [(stamp, task_id) for task_id in done])
+            conn.executemany(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "available_at = ? + MIN(?, 60 * (1 << attempts)), lease_until = NULL, updated_at = ? WHERE id = ?",
+                [(self.max_attempts, now, MAX_BACKOFF_SECONDS, stamp, task_id) for task_id in failed])
+            conn.executemany(
+                "UPDATE tasks SET state = 'pending', attempts = attempts - 1, available_at = ?, lease_until = NULL, "
+                "updated_at = ? WHERE id = ?", [(now, stamp, task_id) for task_id in released])
+
+    def counts(self):
+        """{(competition, state): tasks} plus the number of pending tasks per priority tier"""
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            states = {(competition, state): n for competition, state, n in conn.execute(
+                "SELECT competition, state, COUNT(*) FROM tasks GROUP BY competition, state")}
+            tiers = dict(conn.execute(
+                "SELECT priority, COUNT(*) FROM tasks WHERE state = 'pending' GROUP BY priority"))
+        finally:
+            conn.close()
+        return states, tiers
+
+
+def task_priority(competition, season, kickoff, now, fresh_window=FRESH_WINDOW):
+    """Tier (fresh / current / backfill) times 10 plus the competition's own priority"""
+    if season != competition["seasons"][0]:
+        tier = BACKFILL
+    elif kickoff is not None and now - kickoff <= fresh_window:
+        tier = FRESH
+    else:
+        tier = CURRENT
+    return 10 * tier + competition.get("priority", 0)
+
+
+def finished_fixtures(fixtures, now, settle=SETTLE):
+    """(match_id, kick-off) of the finished, not cancelled fixtures whose final whistle has settled"""
+    for match in fixtures:
+        status = match.get("status", {})
+        kickoff = parse_utc(status.get("utcTime"))
+        if kickoff is None or status.get("cancelled") or not status.get("finished") or kickoff + settle > now:
+            continue
+        yield str(match["id"]), kickoff
+
+
+def plan_competition(name, competition, season, storage, api, now, max_age=FIXTURE_MAX_AGE):
+    """Tasks for every settled match of one competition season that is not in its match index"""
+    cache = FixtureCache(storage, competition["league_id"], season)
+    current = season == competition["seasons"][0]
+    # a past season's calendar only changes until its last match is played; the cache is shared with
+    # the scheduler, which stops refreshing a season once it rolls out of SEASONS
+    unfinished = any(not (m.get("status", {}).get("finished") or m.get("status", {}).get("cancelled"))
+                     for m in cache.fixtures or [])
+    if cache.fixtures is None or ((current or unfinished) and cache.age(now) >= max_age):
+        cache.refresh(api(), now)
+    index = MatchIndex(storage, name, season)
+    return [
+        {"competition": name, "season": season, "match_id": match_id, "kickoff": kickoff.isoformat(),
+         "priority": task_priority(competition, season, kickoff, now)}
+        for match_id, kickoff in finished_fixtures(cache.fixtures or [], now)
+        if match_id not in index
+    ]
+
+
+def enqueue_competitions(queue, names=None, seasons=None, client=None, storage=None, now=None,
+                         competitions=COMPETITIONS):
+    """Queue the unlanded finished matches of the named competitions (default: all); returns tasks added"""
+    now = now or datetime.now(timezone.utc)
+    storage = storage or S3Storage(client=s3_client)
+    owns_client = client is None
+
+    def api():
+        nonlocal client
+        client = client or FotMobClient(rate_limiter=SharedRateLimiter(queue.path))
+        return client
+
+    added = 0
+    try:
+        for name in names or competitions:
+            competition = competitions[name]
+            for season in seasons or competition["seasons"]:
+                try:
+                    tasks = plan_competition(name, competition, season, storage, api, now)
+                except Exception as e:
+                    logger.error(f"Could not plan {name} {season}: {e}")
+                    continue
+                new = queue.enqueue(tasks)
+                added += new
+                logger.info(f"{name} {season}: {len(tasks)} matches not landed, {new} newly queued")
+    finally:
+        if owns_client and client is not None:
+            client.close()
+    return added
+
+
+def run_worker(queue, client=None, storage=None, upload=upload_to_s3, worker=None, batch_size=None,
+               max_seconds=None):
+    """Claim and land batches until the queue has nothing available or `max_seconds` have passed.
+
+    Returns the number of matches landed.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    owns_client = client is None
+    client = client or FotMobClient(rate_limiter=SharedRateLimiter(queue.path))
+    storage = storage or S3Storage(client=s3_client)
+    batch_size = batch_size or 4 * client.controller.max_limit
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    landed = 0
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            tasks = queue.claim(worker, batch_size)
+            if not tasks:
+                break
+            groups = {}
+            for task in tasks:
+                groups.setdefault((task["competition"], task["season"]), []).append(task)
+
+            for (competition, season), group in groups.items():
+                index = MatchIndex(storage, competition, season)
+                history = HistoryStore(storage, competition, season)
+                ids = {task["match_id"]: task["id"] for task in group}
+                results = dict(land_matches(client, list(ids), competition, season, upload, index, history=history))
+                done = [ids[m] for m, ok in results.items() if ok]
+                failed = [ids[m] for m, ok in results.items() if not ok]
+
+                # the saves merge with conditional PUTs (extract/storage.py merge_put), so they need no
+                # queue lock; a task is only done once its index entry is stored
+                try:
+                    index.save()
+                    history.save()
+                except Exception as e:
+                    logger.error(f"[{worker}] {competition} {season}: index save failed, retrying the batch: {e}")
+                    failed, done = failed + done, []
+
+                if client.controller.is_open:
+                    # FotMob is failing every request; the matches are not at fault
+                    queue.finish(done, released=failed)
+                    logger.warning(f"Circuit open, released {len(failed)} matches, pausing {client.controller.cooldown}s")
+                    time.sleep(client.controller.cooldown)
+                else:
+                    queue.finish(done, failed)
+                landed += len(done)
+                logger.info(f"[{worker}] {competition} {season}: {len(done)} landed, {len(failed)} failed")
+    finally:
+        if owns_client:
+            client.close()
+    logger.info(f"[{worker}] {landed} matches landed")
+    return landed
+
+
+def log_status(queue):
+    states, tiers = queue.counts()
+    for (competition, state), n in sorted(states.items()):
+        logger.info(f"{competition:<20} {state:<8} {n}")
+    names = {FRESH: "fresh", CURRENT: "current", BACKFILL: "backfill"}
+    for priority, n in sorted(tiers.items()):
+        logger.info(f"pending {names.get(priority // 10, priority)} (priority {priority}): {n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prioritized extraction queue over the configured competitions")
+    parser.add_argument("command", choices=["enqueue", "work", "status"])
+    parser.add_argument("--queue", default=WORK_QUEUE_PATH, help="SQLite queue file")
+    parser.add_argument("--competition", action="append", choices=sorted(COMPETITIONS),
+                        help="competition to enqueue (repeatable, default: all)")
+    parser.add_argument("--season", action="append", help="season like 2024/2025 (repeatable, default: configured)")
+    parser.add_argument("--batch-size", type=int, default=None, help="matches claimed per batch")
+    parser.add_argument("--max-minutes", type=float, default=None, help="stop claiming after this long")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue)
+    if args.command == "enqueue":
+        enqueue_competitions(queue, args.competition, args.season)
+    elif args.command == "work":
+        run_worker(queue, batch_size=args.batch_size, max_seconds=args.max_minutes and args.max_minutes * 60)
+    log_status(queue)
+
+
+if __name__ == "__main__":
+    main()
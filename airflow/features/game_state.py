@@ -0,0 +1,92 @@
+"""
+Game-state features from the events table
+
+Goals in the events table carry the score after them and the elapsed
+playing minute, so every match splits into score-state segments (kick-off
+to the first goal, goal to goal, last goal to the end) with one sort and a
+shift; minutes leading / level / trailing are sums over those segments.
+
+Usage (from the airflow/ directory):
+    python -m features.game_state --events /opt/airflow/data/processed/events \
+        --output /opt/airflow/data/features/game_state.parquet
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def score_segments(events):
+    """One row per (match_id, start, end) stretch with an unchanged score.
+
+    A match ends at its last event minute (the full-time Half row includes
+    the announced added time); penalty shoot-out goals do not change the state.
+    """
+    events = events.dropna(subset=["elapsed_minute"])
+    goals = events[events["event_type"].eq("Goal") & ~events["penalty_shootout"].fillna(False).astype(bool)]
+    match_ids = events["match_id"].unique()
+    kickoff = pd.DataFrame({"match_id": match_ids, "start": 0, "home_score": 0, "away_score": 0})
+    changes = goals[["match_id", "elapsed_minute", "home_score", "away_score"]].rename(
+        columns={"elapsed_minute": "start"})
+
+    segments = pd.concat([kickoff, changes], ignore_index=True).astype(
+        {"start": "int64", "home_score": "int64", "away_score": "int64"})
+    segments = segments.sort_values(["match_id", "start"], kind="stable", ignore_index=True)
+    match_end = segments["match_id"].map(events.groupby("match_id")["elapsed_minute"].max()).astype("int64")
+    next_start = segments.groupby("match_id")["start"].shift(-1)
+    segments["end"] = next_start.fillna(match_end).astype("int64").clip(upper=match_end)
+    segments["minutes"] = (segments["end"] - segments["start"]).clip(lower=0)
+    segments["goal_diff"] = segments["home_score"] - segments["away_score"]
+    return segments[["match_id", "start", "end", "minutes", "home_score", "away_score", "goal_diff"]]
+
+
+def minutes_by_state(events):
+    """Minutes the home side led, the score was level and the away side led, per match"""
+    segments = score_segments(events)
+    state = np.sign(segments["goal_diff"].to_numpy())
+    minutes = segments["minutes"].to_numpy()
+    out = pd.DataFrame({
+        "match_id": segments["match_id"],
+        "minutes_home_leading": np.where(state > 0, minutes, 0),
+        "minutes_level": np.where(state == 0, minutes, 0),
+        "minutes_away_leading": np.where(state < 0, minutes, 0),
+    })
+    return out.groupby("match_id", as_index=False).sum()
+
+
+def team_minutes_leading(states, matches):
+    """Per (match_id, team_id) minutes leading / level / trailing, joined to the matches' home and away teams"""
+    teams = matches[["match_id", "home_team_id", "away_team_id"]].astype(
+        {"match_id": "int64"}).drop_duplicates("match_id")
+    df = states.merge(teams, on="match_id")
+    home = df.assign(team_id=df["home_team_id"], side="home", minutes_leading=df["minutes_home_leading"],
+                     minutes_trailing=df["minutes_away_leading"])
+    away = df.assign(team_id=df["away_team_id"], side="away", minutes_leading=df["minutes_away_leading"],
+                     minutes_trailing=df["minutes_home_leading"])
+    columns = ["match_id", "team_id", "side", "minutes_leading", "minutes_level", "minutes_trailing"]
+    return pd.concat([home[columns], away[columns]], ignore_index=True).sort_values(
+        ["match_id", "side"], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minutes leading / level / trailing per match from the events table")
+    parser.add_argument("--events", required=True, help="events parquet file or directory of parts")
+    parser.add_argument("--matches", default=None, help="matches parquet, for one row per team instead of per match")
+    parser.add_argument("--output", required=True, help="parquet file for the game-state minutes")
+    args = parser.parse_args()
+
+    states = minutes_by_state(pd.read_parquet(args.events))
+    if args.matches:
+        states = team_minutes_leading(states, pd.read_parquet(args.matches))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    states.to_parquet(args.output, index=False)
+    logger.info(f"Wrote {len(states)} game-state rows from {states['match_id'].nunique()} matches to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Match x player incidence matrices for player-combination features
+
+Player and match ids are mapped to dense indices (sorted ids, so lookups are
+a searchsorted) and each season becomes a few scipy CSR matrices built from
+the player_intervals and matches tables:
+
+    starters  1 where the player started the match
+    minutes   share of the match the player was on the pitch (0..1)
+    side      +1 home / -1 away for every player who appeared
+    on_pitch  goals for minus against while the player was on the pitch
+              (from the events table; penalty shootouts do not count)
+
+Matches missing from the matches table have no side entries and are left
+out of every side-dependent feature.
+
+Pair and plus-minus features are then sparse products, e.g.
+    together = (S.T @ S + Ss.T @ Ss) / 2   with Ss = S.multiply(side)
+counts matches two players started as team-mates (opponents cancel out).
+
+Matrices are stored as plain .npy arrays (data / indices / indptr per
+matrix) in one directory per season so they can be opened with mmap.
+
+Usage (from the airflow/ directory):
+    python -m features.incidence --processed /opt/airflow/data/processed \
+        --output /opt/airflow/data/features/incidence/real_madrid/2024_2025
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MATRICES = ("starters", "minutes", "side", "on_pitch")
+
+
+class Incidence:
+    """Match x player CSR matrices sharing one pair of id indices"""
+
+    def __init__(self, match_ids, player_ids, matrices, goal_diff=None):
+        self.match_ids = match_ids
+        self.player_ids = player_ids
+        self.matrices = matrices
+        # home minus away goals per match row, for plus-minus
+        self.goal_diff = goal_diff
+
+    def __getitem__(self, name):
+        return self.matrices[name]
+
+    @property
+    def shape(self):
+        return len(self.match_ids), len(self.player_ids)
+
+    def player_index(self, player_ids):
+        """Dense column index for each player id, -1 when unknown"""
+        ids = np.asarray(player_ids, dtype=np.int64)
+        if not len(self.player_ids):
+            return np.full(len(ids), -1)
+        pos = np.clip(np.searchsorted(self.player_ids, ids), 0, len(self.player_ids) - 1)
+        return np.where(self.player_ids[pos] == ids, pos, -1)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "match_ids.npy"), self.match_ids)
+        np.save(os.path.join(directory, "player_ids.npy"), self.player_ids)
+        if self.goal_diff is not None:
+            np.save(os.path.join(directory, "goal_diff.npy"), self.goal_diff)
+        for name, matrix in self.matrices.items():
+            matrix = matrix.tocsr()
+            for part in ("data", "indices", "indptr"):
+                np.save(os.path.join(directory, f"{name}.{part}.npy"), getattr(matrix, part))
+        logger.info(f"Saved {self.shape[0]}x{self.shape[1]} incidence ({', '.join(self.matrices)}) to {directory}")
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """Open a saved season; with mmap_mode the arrays are read lazily from disk"""
+        def load_array(name):
+            return np.load(os.path.join(directory, name), mmap_mode=mmap_mode)
+
+        match_ids = load_array("match_ids.npy")
+        player_ids = load_array("player_ids.npy")
+        shape = (len(match_ids), len(player_ids))
+        matrices = {}
+        for name in MATRICES:
+            if not os.path.exists(os.path.join(directory, f"{name}.data.npy")):
+                continue
+            parts = [load_array(f"{name}.{part}.npy") for part in ("data", "indices", "indptr")]
+            matrices[name] = sparse.csr_matrix(tuple(parts), shape=shape, copy=False)
+        goal_diff_path = os.path.join(directory, "goal_diff.npy")
+        goal_diff = load_array("goal_diff.npy") if os.path.exists(goal_diff_path) else None
+        return cls(match_ids, player_ids, matrices, goal_diff)
+
+
+def goals_by_side(events):
+    """(match_id, elapsed_minute, home_delta) per goal: +1 for a home goal, -1 for an away goal.
+
+    The scoring side comes from the score after the goal (own goals count
+    for the team the score moved for), falling back to is_home when the
+    event carries no score.
+    """
+    goals = pd.DataFrame(events)
+    goals = goals[goals["event_type"].astype(str).eq("Goal")
+                  & ~goals["penalty_shootout"].astype("boolean").fillna(False)]
+    goals = goals.dropna(subset=["match_id", "elapsed_minute"]).sort_values(["match_id", "elapsed_minute"], kind="stable")
+    home = pd.to_numeric(goals["home_score"], errors="coerce")
+    away = pd.to_numeric(goals["away_score"], errors="coerce")
+    by_match = goals["match_id"]
+    home_up = home - home.groupby(by_match).shift(fill_value=0)
+    away_up = away - away.groupby(by_match).shift(fill_value=0)
+    fallback = np.where(goals["is_home"].astype("boolean").fillna(False).to_numpy(dtype=bool), 1, -1)
+    delta = np.where(home_up.gt(0).to_numpy(), 1, np.where(away_up.gt(0).to_numpy(), -1, fallback))
+    return pd.DataFrame({"match_id": goals["match_id"].astype("int64").to_numpy(),
+                         "minute": goals["elapsed_minute"].astype("float64").to_numpy(),
+                         "home_delta": delta.astype(np.float32)})
+
+
+def build_incidence(intervals, matches=None, events=None):
+    """Incidence matrices from player_intervals rows, plus side / goal difference from parse_matches rows
+    and the on-pitch goal difference from parse_events rows"""
+    df = pd.DataFrame(intervals).dropna(subset=["match_id", "player_id"])
+    df = df.astype({"match_id": "int64", "player_id": "int64"})
+
+    match_ids, rows = np.unique(df["match_id"].to_numpy(), return_inverse=True)
+    player_ids, cols = np.unique(df["player_id"].to_numpy(), return_inverse=True)
+    shape = (len(match_ids), len(player_ids))
+
+    def csr(values, mask=None):
+        mask = np.ones(len(df), dtype=bool) if mask is None else mask
+        # duplicates (a player with two spells) are summed by the conversion
+        return sparse.coo_matrix((values[mask], (rows[mask], cols[mask])), shape=shape).tocsr()
+
+    started = df["on_reason"].eq("start").to_numpy()
+    match_length = df.groupby("match_id")["off_minute"].transform("max").to_numpy(dtype=np.float32)
+    share = df["minutes_played"].to_numpy(dtype=np.float32) / np.maximum(match_length, 1)
+    matrices = {
+        "starters": csr(np.ones(len(df), dtype=np.float32), started),
+        "minutes": csr(share),
+    }
+
+    goal_diff = None
+    if matches is not None:
+        m = pd.DataFrame(matches).drop_duplicates("match_id")
+        m = m.astype({"match_id": "int64"}).set_index("match_id").reindex(match_ids)
+        home = m["home_team_id"].to_numpy(dtype=np.float64)[rows]
+        side = np.where(df["team_id"].to_numpy(dtype=np.float64) == home, 1.0, -1.0).astype(np.float32)
+        # a player with two spells appears twice; one side entry per appearance.
+        # A match missing from `matches` has no home team and gets no side at all
+        known = ~np.isnan(home)
+        first = ~df.duplicated(["match_id", "player_id"]).to_numpy() & known
+        matrices["side"] = csr(side, first)
+        goal_diff = (m["home_score"] - m["away_score"]).to_numpy(dtype=np.float32)
+
+        if events is not None:
+            goals = goals_by_side(events)
+            spells = pd.DataFrame({"row": np.arange(len(df)), "match_id": df["match_id"].to_numpy(),
+                                   "on": df["on_minute"].to_numpy(dtype=np.float64),
+                                   "off": df["off_minute"].to_numpy(dtype=np.float64)})
+            hits = spells.merge(goals, on="match_id")
+            # a goal in the minute a player comes on counts for the player already on
+            hits = hits[(hits["minute"] > hits["on"]) & (hits["minute"] <= hits["off"])]
+            home_goals = np.zeros(len(df), dtype=np.float32)
+            np.add.at(home_goals, hits["row"].to_numpy(), hits["home_delta"].to_numpy())
+            # explicit zeros keep every known appearance in the matrix
+            matrices["on_pitch"] = csr(side * home_goals, known)
+
+    return Incidence(match_ids, player_ids, matrices, goal_diff)
+
+
+def co_occurrence(incidence, matrix="starters"):
+    """Player x player matrix of matches (or shared minutes share) as team-mates"""
+    if "side" not in incidence.matrices:
+        M = incidence[matrix]
+        return (M.T @ M).tocsr()
+    M = sided(incidence, matrix)
+    signed = M.multiply(incidence["side"]).tocsr()
+    # same side: +1 * +1 or -1 * -1, opponents contribute -1 and cancel M.T @ M
+    together = ((M.T @ M + signed.T @ signed) / 2).tocsr()
+    together.eliminate_zeros()
+    return together
+
+
+def sided(incidence, matrix):
+    """`matrix` restricted to the matches with a known side (present in the matches table)"""
+    known = np.asarray((abs(incidence["side"]).sum(axis=1) > 0)).ravel().astype(np.float32)
+    return sparse.diags(known) @ incidence[matrix]
+
+
+def plus_minus(incidence):
+    """Goals for minus against for each player's team while they were on the pitch"""
+    if "on_pitch" not in incidence.matrices:
+        raise ValueError("plus_minus needs an incidence built with the matches and events tables")
+    return pd.DataFrame({
+        "player_id": np.asarray(incidence.player_ids),
+        "plus_minus": np.asarray(incidence["on_pitch"].sum(axis=0)).ravel(),
+        "matches": np.asarray((sided(incidence, "minutes") > 0).sum(axis=0)).ravel(),
+    })
+
+
+def weighted_goal_diff(incidence, matrix="minutes"):
+    """Full-match goal difference of each player's team weighted by `matrix` (share of minutes by default).
+
+    A cheap approximation of plus_minus when there is no events table: a
+    substitute is credited with the goals of the whole match, scaled by
+    the minutes they played.
+    """
+    if incidence.goal_diff is None or "side" not in incidence.matrices:
+        raise ValueError("weighted_goal_diff needs an incidence built with the matches table")
+    signed = sided(incidence, matrix).multiply(incidence["side"]).tocsr()
+    goal_diff = np.nan_to_num(np.asarray(incidence.goal_diff, dtype=np.float32))
+    return pd.DataFrame({
+        "player_id": np.asarray(incidence.player_ids),
+        "weighted_goal_diff": signed.T @ goal_diff,
+        "matches": np.asarray((signed != 0).sum(axis=0)).ravel(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the match x player incidence matrices for one season")
+    parser.add_argument("--processed", required=True, help="reprocess output with player_intervals/ and matches/ parts")
+    parser.add_argument("--output", required=True, help="directory for the .npy matrices")
+    args = parser.parse_args()
+
+    intervals = pd.read_parquet(os.path.join(args.processed, "player_intervals"))
+    matches = pd.read_parquet(os.path.join(args.processed, "matches"))
+    events_dir = os.path.join(args.processed, "events")
+    events = pd.read_parquet(events_dir) if os.path.exists(events_dir) else None
+    build_incidence(intervals, matches, events).save(args.output)
+
+
+if __name__ == "__main__":
+    main()
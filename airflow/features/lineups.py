@@ -0,0 +1,74 @@
+"""
+Player-time features from the player_intervals table
+
+Each row of player_intervals is one on-pitch spell (match_id, team_id,
+player_id, on_minute, off_minute). Minutes per player and which players
+shared the pitch are interval sums / self-joins on whole columns.
+
+Usage (from the airflow/ directory):
+    python -m features.lineups --intervals /opt/airflow/data/processed/player_intervals \
+        --output /opt/airflow/data/features/lineup_overlap.parquet
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def player_minutes(intervals):
+    """Total minutes, appearances and starts per player"""
+    df = intervals.assign(started=intervals["on_reason"].eq("start"))
+    return (df.groupby("player_id", as_index=False)
+              .agg(minutes=("minutes_played", "sum"),
+                   appearances=("match_id", "nunique"),
+                   starts=("started", "sum")))
+
+
+def lineup_overlap(intervals, min_minutes=1):
+    """Minutes every pair of team-mates spent on the pitch together.
+
+    One row per (match_id, team_id, player_id, teammate_id) with
+    player_id < teammate_id, overlap = min(off) - max(on) clipped at 0.
+    """
+    cols = ["match_id", "team_id", "player_id", "on_minute", "off_minute"]
+    df = intervals[cols]
+    pairs = df.merge(df, on=["match_id", "team_id"], suffixes=("", "_mate"))
+    pairs = pairs[pairs["player_id"] < pairs["player_id_mate"]]
+
+    overlap = np.minimum(pairs["off_minute"].to_numpy(), pairs["off_minute_mate"].to_numpy()) - \
+        np.maximum(pairs["on_minute"].to_numpy(), pairs["on_minute_mate"].to_numpy())
+    pairs = pairs.assign(overlap_minutes=np.clip(overlap, 0, None))
+    pairs = pairs[pairs["overlap_minutes"] >= min_minutes]
+    return pairs.rename(columns={"player_id_mate": "teammate_id"})[
+        ["match_id", "team_id", "player_id", "teammate_id", "overlap_minutes"]
+    ].reset_index(drop=True)
+
+
+def pair_totals(overlap):
+    """Season-level minutes together per player pair"""
+    return (overlap.groupby(["player_id", "teammate_id"], as_index=False)
+                   .agg(overlap_minutes=("overlap_minutes", "sum"),
+                        matches=("match_id", "nunique"))
+                   .sort_values("overlap_minutes", ascending=False, ignore_index=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Player minutes and lineup overlap from player_intervals")
+    parser.add_argument("--intervals", required=True, help="player_intervals parquet file or directory of parts")
+    parser.add_argument("--output", required=True, help="parquet file for the per-pair overlap totals")
+    args = parser.parse_args()
+
+    intervals = pd.read_parquet(args.intervals)
+    totals = pair_totals(lineup_overlap(intervals))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    totals.to_parquet(args.output, index=False)
+    logger.info(f"Wrote {len(totals)} player pairs from {intervals['match_id'].nunique()} matches to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
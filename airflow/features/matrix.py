@@ -0,0 +1,163 @@
+"""
+Memory-mapped training matrix for the win/draw/loss model
+
+features.model can rebuild its (match x feature) matrix by replaying every
+processed match through the rolling engine; this stage keeps the matrix on
+disk instead, as contiguous .npy files a training job opens with mmap (and
+concurrent jobs share the same page-cache pages):
+
+    {root}/{version}/X.npy          float32 (matches, len(FEATURE_NAMES))
+    {root}/{version}/y.npy          int8 labels, index into features.model.CLASSES
+    {root}/{version}/match_ids.npy  int64
+    {root}/{version}/meta.json      committed rows, feature names, engine snapshot
+
+`version` hashes the feature names and engine parameters, so a changed
+feature set starts a new matrix next to the old one. Newly landed matches
+are appended in place: rows are written after the committed end, then the
+.npy headers (padded to a fixed size so the data never moves) are rewritten
+with the new shape, and the rolling engine snapshot is saved next to them
+so an update only replays the new matches. meta.json is the commit point;
+rows past its count are overwritten by the next append.
+
+Usage (from the airflow/ directory):
+    python -m features.matrix --processed /opt/airflow/data/processed --output /opt/airflow/data/features/matrix
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+from features.model import FEATURE_NAMES, MAX_REST_DAYS, load_processed, match_strengths, replay
+from features.rolling import FeatureEngine, parse_time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARRAYS = {"X": np.float32, "y": np.int8, "match_ids": np.int64}
+# magic, version and header length take 10 bytes; the rest is the padded header dict
+HEADER_BYTES = 128
+
+
+def schema_version(engine_params):
+    spec = {"features": FEATURE_NAMES, "engine_params": engine_params, "max_rest_days": MAX_REST_DAYS}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def npy_header(dtype, shape):
+    """A version 1.0 .npy header of exactly HEADER_BYTES, whatever the shape"""
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False,
+                   "shape": tuple(shape)})
+    text = header.ljust(HEADER_BYTES - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(text)) + text.encode("latin1")
+
+
+def append_rows(path, array, committed):
+    """Write `array` after the first `committed` rows of the .npy at `path`, then its new shape"""
+    row_bytes = array.dtype.itemsize * int(np.prod(array.shape[1:], dtype=np.int64))
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+        f.seek(HEADER_BYTES + committed * row_bytes)
+        f.truncate()
+        f.write(np.ascontiguousarray(array).tobytes())
+        f.seek(0)
+        f.write(npy_header(array.dtype, (committed + len(array),) + array.shape[1:]))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class TrainingMatrix:
+    """One versioned matrix directory with its engine snapshot"""
+
+    def __init__(self, root, engine_params=None):
+        self.engine_params = engine_params or {}
+        self.version = schema_version(self.engine_params)
+        self.directory = os.path.join(root, self.version)
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.meta = {"version": self.version, "features": FEATURE_NAMES, "engine_params": self.engine_params,
+                     "rows": 0, "engine": None, "updated_at": None}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+
+    @property
+    def rows(self):
+        return self.meta["rows"]
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def engine(self):
+        if self.meta["engine"] is None:
+            return FeatureEngine(**self.engine_params)
+        return FeatureEngine.load(self.path(self.meta["engine"]), **self.engine_params)
+
+    def commit(self, rows, engine):
+        previous = self.meta["engine"]
+        snapshot = f"engine-{rows}.json"
+        engine.save(self.path(snapshot))
+        self.meta.update(rows=rows, engine=snapshot, updated_at=datetime.now(timezone.utc).isoformat())
+        tmp = f"{self.meta_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+        if previous and previous != snapshot:
+            os.remove(self.path(previous))
+
+    def update(self, matches, stats_by_match):
+        """Append the finished matches that are not in the matrix yet; returns the rows appended.
+
+        A match older than the engine's watermark cannot be appended without
+        changing the rows after it, so the matrix is rebuilt from scratch.
+        Rows keep the strength from the ratings fit at the time they were
+        appended; a rebuild can differ slightly since the league scoring
+        rate of the fit covers every match it sees.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        engine = self.engine()
+        finished = [m for m in matches if m["home_score"] is not None and m["away_score"] is not None]
+        new = [m for m in finished if str(m["match_id"]) not in engine.processed]
+        if not new:
+            return 0
+
+        committed = self.rows
+        if engine.watermark and min(parse_time(m["match_time_utc"]) for m in new) < parse_time(engine.watermark):
+            logger.warning(f"Matches older than {engine.watermark} landed, rebuilding {self.directory}")
+            engine, new, committed = FeatureEngine(**self.engine_params), finished, 0
+
+        rows = list(replay(engine, new, stats_by_match, match_strengths(matches)))
+        arrays = {
+            "X": np.array([x for _, x, _ in rows], dtype=np.float32).reshape(-1, len(FEATURE_NAMES)),
+            "y": np.array([label for _, _, label in rows], dtype=np.int8),
+            "match_ids": np.array([int(match_id) for match_id, _, _ in rows], dtype=np.int64),
+        }
+        for name, array in arrays.items():
+            append_rows(self.path(f"{name}.npy"), array, committed)
+        self.commit(committed + len(rows), engine)
+        logger.info(f"Appended {len(rows)} matches to {self.directory}, {self.rows} rows")
+        return len(rows)
+
+    def load(self, mmap_mode="r"):
+        """(X, y, match_ids) over the committed rows, memory-mapped read-only by default"""
+        if not self.rows:
+            return (np.empty((0, len(FEATURE_NAMES)), np.float32), np.empty(0, np.int8), np.empty(0, np.int64))
+        return tuple(np.load(self.path(f"{name}.npy"), mmap_mode=mmap_mode)[:self.rows] for name in ARRAYS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append newly processed matches to the memory-mapped training matrix")
+    parser.add_argument("--processed", required=True, help="reprocessor output dir (matches/ and stats/ parquet)")
+    parser.add_argument("--output", required=True, help="matrix root; one subdirectory per feature version")
+    parser.add_argument("--window", type=int, default=5, help="rolling window of the team features")
+    args = parser.parse_args()
+
+    matrix = TrainingMatrix(args.output, {"window": args.window})
+    appended = matrix.update(*load_processed(args.processed))
+    logger.info(f"{matrix.directory}: {appended} new rows, {matrix.rows} total")
+
+
+if __name__ == "__main__":
+    main()
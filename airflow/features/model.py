@@ -0,0 +1,206 @@
+"""
+Win / draw / loss model over pre-match team features
+
+Training rows come from replaying the reprocessor's matches in kick-off
+order through the rolling FeatureEngine: every finished match contributes
+the home and away features as they were before kick-off (rolling xG and
+goals, form, rest days, Elo, plus the pre-match strength from the ratings
+fit) and its result. The model is a multinomial logistic regression fitted
+with numpy and saved as JSON, so serving needs nothing beyond numpy.
+
+Usage (from the airflow/ directory):
+    python -m features.model --processed /opt/airflow/data/processed --output /opt/airflow/data/models/wdl.json
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from features.ratings import fit_ratings, join_ratings
+from features.rolling import FeatureEngine, parse_time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLASSES = ["home_win", "draw", "away_win"]
+# the model sees home minus away for every team feature
+TEAM_FEATURES = ["xg_for_avg", "xg_against_avg", "goals_for_avg", "goals_against_avg",
+                 "form_points", "rest_days", "elo", "strength"]
+FEATURE_NAMES = [f"{name}_diff" for name in TEAM_FEATURES]
+# an international break reads like a long week off rather than an outlier
+MAX_REST_DAYS = 10.0
+MATCH_COLUMNS = ["match_id", "match_time_utc", "home_team_id", "away_team_id", "home_score", "away_score"]
+
+
+def load_processed(processed):
+    """parse_matches-style rows and "All" expected_goals stats rows per match from the reprocessor's parquet"""
+    matches = pd.read_parquet(os.path.join(processed, "matches"), columns=MATCH_COLUMNS)
+    matches = matches.drop_duplicates("match_id", keep="last")
+    stats = pd.read_parquet(os.path.join(processed, "stats"),
+                            columns=["match_id", "period", "stat_key", "home_value", "away_value"])
+    stats = stats[stats["period"].eq("All") & stats["stat_key"].eq("expected_goals")]
+
+    rows = matches.astype(object).where(matches.notna(), None).to_dict("records")
+    stats_by_match = {}
+    for row in stats.to_dict("records"):
+        stats_by_match.setdefault(str(row["match_id"]), []).append(row)
+    return rows, stats_by_match
+
+
+def team_features(engine, team_id, strength=None):
+    """A team's current engine features plus strength and last kick-off, ready for feature_vector()"""
+    features = engine.features(team_id)
+    features["strength"] = strength
+    features["last_match_time"] = engine.team(team_id).last_match_time
+    return features
+
+
+def rest_days(features, kickoff):
+    if not kickoff or not features.get("last_match_time"):
+        return None
+    days = (parse_time(kickoff) - parse_time(features["last_match_time"])).total_seconds() / 86400
+    return min(max(days, 0.0), MAX_REST_DAYS)
+
+
+def feature_vector(home, away, kickoff=None):
+    """FEATURE_NAMES values for a fixture; a feature missing on either side counts as no difference"""
+    home = dict(home, rest_days=rest_days(home, kickoff))
+    away = dict(away, rest_days=rest_days(away, kickoff))
+    return np.array([
+        0.0 if home.get(name) is None or away.get(name) is None else float(home[name]) - float(away[name])
+        for name in TEAM_FEATURES
+    ])
+
+
+def match_strengths(matches):
+    """Pre-match home_strength / away_strength per match_id (each rating only uses earlier match days)"""
+    strengths = join_ratings(matches, fit_ratings(matches)).set_index("match_id")[["home_strength", "away_strength"]]
+    return strengths[~strengths.index.duplicated()]
+
+
+def replay(engine, matches, stats_by_match, strengths):
+    """Yield (match_id, feature vector, label) per finished match in kick-off order.
+
+    Each match is applied to `engine` after its row is produced, so the
+    features are the ones both teams had before kick-off.
+    """
+    for match in sorted(matches, key=lambda m: parse_time(m["match_time_utc"])):
+        if match["home_score"] is None or match["away_score"] is None:
+            continue
+        strength = strengths.loc[match["match_id"]] if match["match_id"] in strengths.index else {}
+        home = team_features(engine, match["home_team_id"], strength.get("home_strength"))
+        away = team_features(engine, match["away_team_id"], strength.get("away_strength"))
+        diff = match["home_score"] - match["away_score"]
+        # the first matches of a replay have no history, they only teach the intercept
+        yield match["match_id"], feature_vector(home, away, match["match_time_utc"]), 0 if diff > 0 else 1 if diff == 0 else 2
+        engine.update(match, stats_by_match.get(str(match["match_id"]), ()))
+
+
+def training_rows(matches, stats_by_match, engine_params=None):
+    """(X, y) over every finished match with both teams' features as they were before kick-off"""
+    engine = FeatureEngine(**(engine_params or {}))
+    rows = list(replay(engine, matches, stats_by_match, match_strengths(matches)))
+    X = np.array([x for _, x, _ in rows]).reshape(-1, len(FEATURE_NAMES))
+    return X, np.array([label for _, _, label in rows], dtype=np.int64)
+
+
+def softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(logits)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class Model:
+    """Standardized multinomial logistic regression over FEATURE_NAMES"""
+
+    def __init__(self, mean, std, coef, intercept, engine_params=None, trained_on=0):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.engine_params = engine_params or {}
+        self.trained_on = trained_on
+
+    @classmethod
+    def fit(cls, X, y, l2=1.0, iterations=2000, learning_rate=0.5, engine_params=None):
+        """Full-batch gradient descent on the L2-penalized cross entropy"""
+        mean, std = X.mean(axis=0), X.std(axis=0)
+        std[std == 0] = 1.0
+        Z = (X - mean) / std
+        Y = np.eye(len(CLASSES))[y]
+        n = len(Z)
+        coef = np.zeros((Z.shape[1], len(CLASSES)))
+        intercept = np.log(Y.mean(axis=0) + 1e-9)
+        for _ in range(iterations):
+            G = (softmax(Z @ coef + intercept) - Y) / n
+            coef -= learning_rate * (Z.T @ G + l2 / n * coef)
+            intercept -= learning_rate * G.sum(axis=0)
+        return cls(mean, std, coef, intercept, engine_params, n)
+
+    def predict_proba(self, X):
+        X = np.atleast_2d(X)
+        return softmax(((X - self.mean) / self.std) @ self.coef + self.intercept)
+
+    def to_dict(self):
+        return {
+            "classes": CLASSES,
+            "features": FEATURE_NAMES,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "coef": self.coef.tolist(),
+            "intercept": self.intercept.tolist(),
+            "engine_params": self.engine_params,
+            "trained_on": self.trained_on,
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            saved = json.load(f)
+        if saved["features"] != FEATURE_NAMES or saved["classes"] != CLASSES:
+            raise ValueError(f"{path} was trained on different features, retrain it")
+        return cls(saved["mean"], saved["std"], saved["coef"], saved["intercept"],
+                   saved.get("engine_params"), saved.get("trained_on", 0))
+
+
+def log_loss(model, X, y):
+    p = model.predict_proba(X)[np.arange(len(y)), y]
+    return float(-np.log(np.clip(p, 1e-12, None)).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the win/draw/loss model on the processed matches")
+    parser.add_argument("--processed", required=True, help="reprocessor output dir (matches/ and stats/ parquet)")
+    parser.add_argument("--output", required=True, help="model JSON file")
+    parser.add_argument("--window", type=int, default=5, help="rolling window of the team features")
+    parser.add_argument("--l2", type=float, default=1.0)
+    parser.add_argument("--matrix", default=None,
+                        help="training matrix root (features.matrix): append new matches, then train on the mmap")
+    args = parser.parse_args()
+
+    engine_params = {"window": args.window}
+    if args.matrix:
+        # features.matrix builds on this module
+        from features.matrix import TrainingMatrix
+        matrix = TrainingMatrix(args.matrix, engine_params)
+        matrix.update(*load_processed(args.processed))
+        X, y, _ = matrix.load()
+    else:
+        X, y = training_rows(*load_processed(args.processed), engine_params)
+    model = Model.fit(X, y, l2=args.l2, engine_params=engine_params)
+    model.save(args.output)
+    logger.info(f"Trained on {len(y)} matches, log loss {log_loss(model, X, y):.4f}, saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Incremental per-team rolling features: rolling xG / goals, form, rest days, Elo
+
+Each new match updates the two teams involved in O(1): ring buffers of the
+last `window` values with running sums, the last kick-off time and an
+Elo-like strength. Snapshots are saved as JSON so a daily run only applies
+the matches landed since the previous snapshot.
+
+Usage (from the airflow/ directory):
+    python -m features.rolling --raw-dir ../data --snapshot /opt/airflow/data/features/rolling.json
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+
+from extract.data_model_client import parse_matches, parse_stats
+from extract.match_structs import decode_match_details
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROLLING_KEYS = ("xg_for", "xg_against", "goals_for", "goals_against", "points")
+
+
+def parse_time(value):
+    """FotMob kick-off times look like 2024-08-18T19:30:00.000Z"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def match_xg(stats_rows):
+    """(home_xg, away_xg) from parse_stats rows for the "All" period"""
+    for row in stats_rows:
+        if row["stat_key"] == "expected_goals" and row["home_value"] is not None:
+            return float(row["home_value"]), float(row["away_value"])
+    return None, None
+
+
+class Rolling:
+    """Fixed-size ring buffer with a running sum"""
+
+    def __init__(self, window, values=()):
+        self.values = deque(values, maxlen=window)
+        self.total = sum(self.values)
+
+    def push(self, value):
+        if len(self.values) == self.values.maxlen:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+
+class TeamState:
+    def __init__(self, window, elo, last_match_time=None, matches_played=0, **buffers):
+        self.rolling = {key: Rolling(window, buffers.get(key, ())) for key in ROLLING_KEYS}
+        self.elo = elo
+        self.last_match_time = last_match_time
+        self.matches_played = matches_played
+
+    def to_dict(self):
+        return {
+            "elo": self.elo,
+            "last_match_time": self.last_match_time,
+            "matches_played": self.matches_played,
+            **{key: list(buf.values) for key, buf in self.rolling.items()},
+        }
+
+
+class FeatureEngine:
+    def __init__(self, window=5, k=20.0, home_advantage=60.0, initial_elo=1500.0):
+        self.window = window
+        self.k = k
+        self.home_advantage = home_advantage
+        self.initial_elo = initial_elo
+        self.teams = {}
+        self.processed = set()
+        self.watermark = None
+
+    def team(self, team_id):
+        team_id = str(team_id)
+        if team_id not in self.teams:
+            self.teams[team_id] = TeamState(self.window, self.initial_elo)
+        return self.teams[team_id]
+
+    def features(self, team_id, as_of=None):
+        """Current feature vector for a team; rest_days is measured up to `as_of` (ISO string)"""
+        state = self.team(team_id)
+        rest_days = None
+        if as_of and state.last_match_time:
+            rest_days = (parse_time(as_of) - parse_time(state.last_match_time)).total_seconds() / 86400
+        return {
+            "xg_for_avg": state.rolling["xg_for"].mean(),
+            "xg_against_avg": state.rolling["xg_against"].mean(),
+            "goals_for_avg": state.rolling["goals_for"].mean(),
+            "goals_against_avg": state.rolling["goals_against"].mean(),
+            "form_points": state.rolling["points"].total,
+            "rest_days": rest_days,
+            "elo": state.elo,
+            "matches_played": state.matches_played,
+        }
+
+    def update(self, match, stats_rows=()):
+        """Apply one finished match (a parse_matches row plus its "All" parse_stats rows).
+
+        Matches must be applied in kick-off order; an already processed match
+        is ignored so re-running a delta is safe.
+        """
+        match_id = str(match["match_id"])
+        home_score, away_score = match["home_score"], match["away_score"]
+        if match_id in self.processed or home_score is None or away_score is None:
+            return False
+
+        kickoff = match["match_time_utc"]
+        if self.watermark and parse_time(kickoff) < parse_time(self.watermark):
+            logger.warning(f"Match {match_id} at {kickoff} is older than watermark {self.watermark}, "
+                           f"rolling windows will not match a full recomputation")
+
+        home, away = self.team(match["home_team_id"]), self.team(match["away_team_id"])
+        home_xg, away_xg = match_xg(stats_rows)
+
+        expected_home = 1 / (1 + 10 ** ((away.elo - home.elo - self.home_advantage) / 400))
+        result = 1.0 if home_score > away_score else 0.5 if home_score == away_score else 0.0
+        delta = self.k * (result - expected_home)
+        home.elo += delta
+        away.elo -= delta
+
+        home_points = {1.0: 3, 0.5: 1, 0.0: 0}[result]
+        away_points = {1.0: 0, 0.5: 1, 0.0: 3}[result]
+        for state, gf, ga, xgf, xga, points in (
+            (home, home_score, away_score, home_xg, away_xg, home_points),
+            (away, away_score, home_score, away_xg, home_xg, away_points),
+        ):
+            state.rolling["goals_for"].push(gf)
+            state.rolling["goals_against"].push(ga)
+            state.rolling["points"].push(points)
+            if xgf is not None:
+                state.rolling["xg_for"].push(xgf)
+                state.rolling["xg_against"].push(xga)
+            state.last_match_time = kickoff
+            state.matches_played += 1
+
+        self.processed.add(match_id)
+        if self.watermark is None or parse_time(kickoff) > parse_time(self.watermark):
+            self.watermark = kickoff
+        return True
+
+    def update_batch(self, matches, stats_by_match):
+        """Apply a delta of matches in kick-off order; returns how many were new"""
+        applied = 0
+        for match in sorted(matches, key=lambda m: parse_time(m["match_time_utc"])):
+            if self.update(match, stats_by_match.get(str(match["match_id"]), ())):
+                applied += 1
+        return applied
+
+    # ---- snapshots ----
+
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "k": self.k,
+            "home_advantage": self.home_advantage,
+            "initial_elo": self.initial_elo,
+            "watermark": self.watermark,
+            "processed": sorted(self.processed),
+            "teams": {team_id: state.to_dict() for team_id, state in self.teams.items()},
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **params):
+        """Load a snapshot, or start empty (with `params`) if there is none yet"""
+        if not os.path.exists(path):
+            return cls(**params)
+        with open(path) as f:
+            snapshot = json.load(f)
+        engine = cls(snapshot["window"], snapshot["k"], snapshot["home_advantage"], snapshot["initial_elo"])
+        engine.watermark = snapshot["watermark"]
+        engine.processed = set(snapshot["processed"])
+        engine.teams = {
+            team_id: TeamState(engine.window, **state) for team_id, state in snapshot["teams"].items()
+        }
+        return engine
+
+
+def recompute(matches, stats_by_match, **params):
+    """Rebuild every team's state from the full history"""
+    engine = FeatureEngine(**params)
+    engine.update_batch(matches, stats_by_match)
+    return engine
+
+
+def verify(engine, matches, stats_by_match, tolerance=1e-9):
+    """Compare an incrementally maintained engine with a full recomputation; returns mismatching team ids"""
+    full = recompute(matches, stats_by_match, window=engine.window, k=engine.k,
+                     home_advantage=engine.home_advantage, initial_elo=engine.initial_elo)
+    mismatches = []
+    for team_id in set(engine.teams) | set(full.teams):
+        if team_id not in engine.teams or team_id not in full.teams:
+            mismatches.append(team_id)
+            continue
+        a, b = engine.teams[team_id].to_dict(), full.teams[team_id].to_dict()
+        same = all(
+            abs(a[key] - b[key]) <= tolerance if isinstance(a[key], float) else a[key] == b[key]
+            for key in a
+        )
+        if not same:
+            mismatches.append(team_id)
+    if mismatches:
+        logger.error(f"Incremental state differs from full recomputation for teams {mismatches}")
+    return mismatches
+
+
+def parse_payloads(paths):
+    """parse_matches rows and "All" parse_stats rows per match for landed matchDetails files"""
+    matches, stats_by_match = [], {}
+    for path in paths:
+        with open(path, "rb") as f:
+            data = decode_match_details(f.read())
+        if not data.get("general", {}).get("finished", True):
+            continue
+        match = parse_matches(data)[0]
+        matches.append(match)
+        stats_by_match[str(match["match_id"])] = parse_stats(data, "All", match["match_id"])
+    return matches, stats_by_match
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply newly landed matches to the rolling feature snapshot")
+    parser.add_argument("--raw-dir", required=True, help="directory of landed matchDetails JSON (searched recursively)")
+    parser.add_argument("--snapshot", required=True)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--verify", action="store_true", help="check the result against a full recomputation")
+    args = parser.parse_args()
+
+    engine = FeatureEngine.load(args.snapshot, window=args.window)
+    paths = sorted(glob.glob(os.path.join(args.raw_dir, "**", "*.json"), recursive=True))
+    new_paths = [p for p in paths if os.path.basename(p)[:-len(".json")] not in engine.processed]
+    matches, stats_by_match = parse_payloads(new_paths)
+    applied = engine.update_batch(matches, stats_by_match)
+    engine.save(args.snapshot)
+    logger.info(f"Applied {applied} new matches ({len(paths) - len(new_paths)} already in snapshot)")
+
+    if args.verify:
+        verify(engine, *parse_payloads(paths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Prediction service: win / draw / loss for upcoming fixtures in milliseconds
+
+The model (features/model.py) is loaded once. At start-up the service
+replays the reprocessor's parquet outputs through the rolling FeatureEngine,
+fits the strength ratings as of today and keeps every team's latest
+features in memory, so a prediction is two dict lookups, a rest-days
+subtraction and one small matrix product.
+
+The extractor rewrites a landed marker per team/season whenever it saves
+the match index (extract/match_index.py). The service reads the markers at
+most every `check_interval` seconds; a changed marker applies the newly
+landed matches to the engine, refits the ratings and drops the cached
+team features. Landed matches without a final score are remembered with
+their index MD5 and only downloaded again once they are re-landed.
+
+Usage (from the airflow/ directory):
+    python -m serving.predict --model /opt/airflow/data/models/wdl.json \
+        --processed /opt/airflow/data/processed --port 8080
+    curl 'localhost:8080/predict?home=8633&away=8634&kickoff=2025-03-01T20:00:00Z'
+
+    python -m serving.predict --model ... --processed ... --home 8633 --away 8634
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from extract.data_model_client import parse_matches, parse_stats
+from extract.match_index import MatchIndex
+from extract.match_structs import decode_match_details
+from extract.reprocess import open_storage
+from features.model import CLASSES, Model, feature_vector, load_processed, team_features
+from features.ratings import fit_ratings
+from features.rolling import parse_time, recompute
+from config.aws_config import S3_PATHS #type:ignore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PredictionService:
+    """Loaded model plus an in-memory cache of every team's latest features"""
+
+    def __init__(self, model, matches, stats_by_match, storage=None, check_interval=30, clock=time.monotonic):
+        self.model = model
+        self.storage = storage
+        self.check_interval = check_interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+        self.matches = {str(m["match_id"]): m for m in matches}
+        self.engine = recompute(matches, stats_by_match, **model.engine_params)
+        self.markers = self.read_markers()
+        # match_id -> index MD5 of landed matches the engine could not apply yet (no final score)
+        self.unfinished = {}
+        self.next_check = clock() + check_interval
+        self.refit()
+        logger.info(f"Warmed {len(self.engine.teams)} teams from {len(self.engine.processed)} matches")
+
+    def refit(self):
+        """Strength ratings as of today for every team; drops the cached features"""
+        ratings = fit_ratings(list(self.matches.values()), as_of=datetime.now(timezone.utc))
+        latest = ratings.sort_values("rating_date").drop_duplicates("team_id", keep="last")
+        self.strength = dict(zip(latest["team_id"].astype(str), latest["strength"].astype(float)))
+        self.cache = {}
+
+    def features(self, team_id):
+        team_id = str(team_id)
+        cached = self.cache.get(team_id)
+        if cached is None:
+            cached = self.cache[team_id] = team_features(self.engine, team_id, self.strength.get(team_id))
+        return cached
+
+    # ---- invalidation ----
+
+    def read_markers(self):
+        """{marker key: marker} for every team/season the extractor has landed matches for"""
+        if self.storage is None:
+            return {}
+        prefix = f"{S3_PATHS['raw_markers']}/landed/"
+        return {key: json.loads(self.storage.get_bytes(key)) for key, _ in self.storage.list_keys(prefix)
+                if key.endswith(".json")}
+
+    def fetch_landed(self, markers):
+        """parse_matches rows, "All" stats and index MD5s of matches in changed markers that the engine
+        has not applied, skipping unfinished ones already downloaded in the same version"""
+        matches, stats_by_match, md5s = [], {}, {}
+        for marker in markers:
+            index = MatchIndex(self.storage, marker["team_name"], marker["season"])
+            for match_id, key, md5 in zip(index.frame["match_id"].astype(str), index.frame["key"], index.frame["md5"]):
+                if match_id in self.engine.processed or self.unfinished.get(match_id) == md5:
+                    continue
+                data = decode_match_details(self.storage.get_bytes(key))
+                match = parse_matches(data)[0]
+                matches.append(match)
+                stats_by_match[str(match["match_id"])] = parse_stats(data, "All", match["match_id"])
+                md5s[str(match["match_id"])] = md5
+        return matches, stats_by_match, md5s
+
+    def refresh(self):
+        """Apply matches landed since the previous check; returns how many were new to the engine"""
+        markers = self.read_markers()
+        changed = [m for key, m in markers.items() if self.markers.get(key, {}).get("saved_at") != m.get("saved_at")]
+        if not changed:
+            return 0
+        # downloads happen outside the lock, predictions keep using the previous features meanwhile
+        matches, stats_by_match, md5s = self.fetch_landed(changed)
+        with self.lock:
+            self.matches.update((str(m["match_id"]), m) for m in matches)
+            applied = self.engine.update_batch(matches, stats_by_match)
+            if applied:
+                self.refit()
+        for match_id, md5 in md5s.items():
+            if match_id in self.engine.processed:
+                self.unfinished.pop(match_id, None)
+            else:
+                self.unfinished[match_id] = md5
+        # only now: a failed download or apply is retried at the next check
+        self.markers = markers
+        logger.info(f"{len(changed)} landed markers changed: {applied} new matches applied, feature cache dropped")
+        return applied
+
+    def maybe_refresh(self):
+        if self.storage is None or self.clock() < self.next_check:
+            return
+        if not self.refresh_lock.acquire(blocking=False):
+            # another request is already refreshing
+            return
+        try:
+            self.next_check = self.clock() + self.check_interval
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Feature cache refresh failed, serving the previous features: {e}")
+        finally:
+            self.refresh_lock.release()
+
+    # ---- predictions ----
+
+    def predict(self, home_team_id, away_team_id, kickoff=None):
+        self.maybe_refresh()
+        kickoff = kickoff or datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            home, away = self.features(home_team_id), self.features(away_team_id)
+        probabilities = self.model.predict_proba(feature_vector(home, away, kickoff))[0]
+        return {
+            "home_team_id": home_team_id,
+            "away_team_id": away_team_id,
+            "kickoff": kickoff,
+            **{name: round(float(p), 4) for name, p in zip(CLASSES, probabilities)},
+        }
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+            if url.path == "/health":
+                self.send_json(200, {"teams": len(service.engine.teams), "matches": len(service.engine.processed),
+                                     "watermark": service.engine.watermark})
+            elif url.path == "/predict":
+                try:
+                    home, away = int(params["home"]), int(params["away"])
+                except (KeyError, ValueError):
+                    self.send_json(400, {"error": "home and away team ids are required"})
+                    return
+                kickoff = params.get("kickoff")
+                try:
+                    if kickoff and parse_time(kickoff).tzinfo is None:
+                        raise ValueError(kickoff)
+                except ValueError:
+                    self.send_json(400, {"error": f"kickoff must be an ISO time with a UTC offset, got {kickoff!r}"})
+                    return
+                self.send_json(200, service.predict(home, away, kickoff))
+            else:
+                self.send_json(404, {"error": f"unknown path {url.path}"})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve win/draw/loss predictions for upcoming fixtures")
+    parser.add_argument("--model", required=True, help="model JSON from features.model")
+    parser.add_argument("--processed", required=True, help="reprocessor output dir (matches/ and stats/ parquet)")
+    parser.add_argument("--landing-root", default=None, help="local landing dir instead of S3 for markers and new matches")
+    parser.add_argument("--no-refresh", action="store_true", help="never check for newly landed matches")
+    parser.add_argument("--check-interval", type=float, default=30, help="seconds between landed-marker checks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--home", type=int, default=None, help="predict one fixture and exit")
+    parser.add_argument("--away", type=int, default=None)
+    parser.add_argument("--kickoff", default=None, help="ISO UTC kick-off time (default: now)")
+    args = parser.parse_args()
+
+    storage = None if args.no_refresh else open_storage(args.landing_root)
+    service = PredictionService(Model.load(args.model), *load_processed(args.processed),
+                                storage=storage, check_interval=args.check_interval)
+    if args.home is not None and args.away is not None:
+        print(json.dumps(service.predict(args.home, args.away, args.kickoff)))
+        return
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    logger.info(f"Serving predictions on http://{args.host}:{args.port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Shared fixtures: the recorded matchDetails payload in data/ and a LocalStorage bucket
+
+Run from the airflow/ directory:
+    python -m pytest -q tests
+"""
+import json
+import os
+import random
+import sys
+
+import pytest
+
+AIRFLOW_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AIRFLOW_DIR)
+
+from extract.data_model_client import parse_matches, parse_stats  # noqa: E402
+from extract.storage import LocalStorage  # noqa: E402
+
+FIXTURE_PATH = os.path.join(AIRFLOW_DIR, "..", "data", "4506747.json")
+TEAMS = [8633, 8661, 9906, 8634, 8302, 7732]
+
+
+@pytest.fixture(scope="session")
+def raw_body():
+    with open(FIXTURE_PATH, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def payload(raw_body):
+    """Mallorca - Real Madrid, 2024-08-18, decoded fresh for every test"""
+    return json.loads(raw_body)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path / "bucket"))
+
+
+@pytest.fixture
+def make_payload(raw_body):
+    """The fixture payload as another match: new id and kick-off"""
+    def make(match_id, kickoff):
+        data = json.loads(raw_body)
+        data["general"]["matchId"] = str(match_id)
+        data["general"]["matchTimeUTCDate"] = kickoff
+        return data
+    return make
+
+
+@pytest.fixture
+def season(make_payload):
+    """40 matches between six teams, in kick-off order, with their "All" stats"""
+    rng = random.Random(1)
+    matches, stats_by_match = [], {}
+    for i in range(40):
+        data = make_payload(1000 + i, f"2024-{1 + i // 10:02d}-{1 + i % 10 * 2:02d}T19:30:00.000Z")
+        home, away = rng.sample(TEAMS, 2)
+        data["general"]["homeTeam"]["id"], data["general"]["awayTeam"]["id"] = home, away
+        data["header"]["teams"][0].update(id=home, score=rng.randint(0, 3))
+        data["header"]["teams"][1].update(id=away, score=rng.randint(0, 2))
+        match = parse_matches(data)[0]
+        matches.append(match)
+        stats_by_match[str(match["match_id"])] = parse_stats(data, "All", match["match_id"])
+    return matches, stats_by_match
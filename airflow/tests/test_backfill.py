@@ -0,0 +1,51 @@
+import json
+
+from extract.backfill import Checkpoint, Progress, backfill_season
+from extract.flow_control import AdaptiveController
+from extract.match_index import MatchIndex
+from extract.storage import raw_json_key
+
+CONFIG = {"team_id": 8633, "team_name": "t", "league_id": 87}
+SEASON = "2024/2025"
+
+
+class FixtureClient:
+    """Three finished fixtures, each answered with the recorded payload under its own id"""
+
+    def __init__(self, make_payload):
+        self.make_payload = make_payload
+        self.controller = AdaptiveController()
+        self.fetched = []
+
+    def get_team_fixtures(self, league_id, season, team_id):
+        return [{"id": match_id, "status": {"finished": True}} for match_id in (1, 2, 3)]
+
+    def get_match_details(self, match_id, raw=False):
+        self.fetched.append(match_id)
+        return json.dumps(self.make_payload(match_id, "2024-08-18T19:30:00.000Z")).encode()
+
+
+def test_resume_reconciles_the_index_and_refetches_missing_bodies(storage, make_payload, tmp_path):
+    def upload(body, team_name, match_id, season):
+        storage.put_bytes(raw_json_key(team_name, season, match_id), body)
+        return True
+
+    # a killed run: match 1 landed and checkpointed but not indexed,
+    # match 2 checkpointed but its body never reached this bucket
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    checkpoint = Checkpoint(checkpoint_dir, "t", SEASON)
+    upload(json.dumps(make_payload(1, "2024-08-18T19:30:00.000Z")).encode(), "t", 1, SEASON)
+    checkpoint.mark(1)
+    checkpoint.mark(2)
+
+    client = FixtureClient(make_payload)
+    landed = backfill_season(client, CONFIG, SEASON, checkpoint_dir, Progress(), upload, storage)
+    assert landed == 2
+    assert sorted(client.fetched) == [2, 3]
+    assert MatchIndex(storage, "t", SEASON).ids.tolist() == [1, 2, 3]
+    assert Checkpoint(checkpoint_dir, "t", SEASON).done == {"1", "2", "3"}
+
+    # a second resume has nothing left to do
+    client = FixtureClient(make_payload)
+    assert backfill_season(client, CONFIG, SEASON, checkpoint_dir, Progress(), upload, storage) == 0
+    assert client.fetched == []
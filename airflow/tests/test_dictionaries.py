@@ -0,0 +1,88 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from extract.dictionaries import DICTIONARY_COLUMNS, DictionaryRegistry, categorize, dictionaries_key
+from extract.reprocess import iter_raw_keys, reprocess
+from extract.storage import LocalStorage, raw_json_key
+
+
+def test_codes_are_append_only(storage):
+    registry = DictionaryRegistry(storage, dictionaries_key("processed"))
+    assert registry.codes("stat_key", ["a", "b", "a"]).tolist() == [0, 1, 0]
+    registry.save()
+    reloaded = DictionaryRegistry(storage, dictionaries_key("processed"))
+    assert reloaded.codes("stat_key", ["c", "b"]).tolist() == [2, 1]
+
+
+def test_categorize_only_dictionary_columns():
+    tables = categorize({"stats": pd.DataFrame({"stat_key": ["a"], "home_value": [1.0]}),
+                         "other": pd.DataFrame({"stat_key": ["a"]})})
+    assert str(tables["stats"]["stat_key"].dtype) == "category"
+    assert tables["stats"]["home_value"].dtype == float
+    assert str(tables["other"]["stat_key"].dtype) != "category"
+
+
+def test_players_entries_are_columns_split_players_keeps():
+    assert set(DICTIONARY_COLUMNS["players"]) == {"side", "role", "unavailability_type"}
+    assert {"name", "country_name"} <= set(DICTIONARY_COLUMNS["dim_players"])
+
+
+def test_unify_uses_the_registry_dictionary():
+    registry = DictionaryRegistry()
+    first = registry.encode("stats", pd.DataFrame({"stat_key": ["x", "y", "z"], "period": ["All"] * 3}))
+    second = registry.encode("stats", pd.DataFrame({"stat_key": ["w", "z", None], "period": ["FirstHalf"] * 3}))
+    rows = registry.unify("stats", second)
+    assert rows.column("stat_key").chunk(0).dictionary.to_pylist() == ["x", "y", "z", "w"]
+    assert rows.column("stat_key").chunk(0).indices.to_pylist() == [3, 2, None]
+    both = registry.unify("stats", pa.concat_tables([first, second]))
+    assert both.column("stat_key").to_pandas().cat.codes.tolist() == [0, 1, 2, 3, 2, -1]
+
+
+def test_reprocess_writes_dictionary_columns(make_payload, tmp_path):
+    source = LocalStorage(str(tmp_path / "source"))
+    for i in range(6):
+        data = make_payload(1000 + i, f"2024-08-{10 + i}T19:30:00.000Z")
+        source.put_bytes(raw_json_key("rm", "2024/2025", 1000 + i), json.dumps(data).encode())
+    sink = LocalStorage(str(tmp_path / "sink"))
+    reprocess(source, list(iter_raw_keys(source, "rm", ["2024/2025"])), sink, batch_size=4)
+
+    processed = str(tmp_path / "sink" / "processed")
+    field = pq.ParquetFile(os.path.join(processed, "stats", "part-00000.parquet")).schema_arrow.field("stat_key")
+    assert pa.types.is_dictionary(field.type)
+    teams = pd.read_parquet(os.path.join(processed, "teams"))
+    assert sorted(teams["team_name"].cat.categories) == ["Mallorca", "Real Madrid"]
+
+    dim = pq.read_table(os.path.join(processed, "dim_players", "dim_players.parquet"))
+    assert pa.types.is_dictionary(dim.schema.field("name").type)
+    assert dim.to_pandas()["name"].notna().all()
+    registry = DictionaryRegistry(sink, dictionaries_key("processed"))
+    assert len(registry.values["player_name"]) == dim.num_rows
+
+
+def test_parts_share_the_saved_codes(make_payload, tmp_path):
+    source = LocalStorage(str(tmp_path / "source"))
+    for i in range(4):
+        data = make_payload(1000 + i, f"2024-08-{10 + i}T19:30:00.000Z")
+        if i >= 2:
+            data["general"]["homeTeam"]["name"] = data["header"]["teams"][0]["name"] = f"Team {i}"
+        source.put_bytes(raw_json_key("rm", "2024/2025", 1000 + i), json.dumps(data).encode())
+    sink = LocalStorage(str(tmp_path / "sink"))
+    reprocess(source, list(iter_raw_keys(source, "rm", ["2024/2025"])), sink, chunk_rows=4, batch_size=2)
+
+    teams_dir = str(tmp_path / "sink" / "processed" / "teams")
+    assert sorted(os.listdir(teams_dir)) == ["part-00000.parquet", "part-00001.parquet"]
+    values = DictionaryRegistry(sink, dictionaries_key("processed")).values["team_name"]
+    for part in sorted(os.listdir(teams_dir)):
+        column = pd.read_parquet(os.path.join(teams_dir, part))["team_name"]
+        # each part carries a prefix of the saved dictionary, so its codes are the saved codes
+        categories = column.cat.categories.tolist()
+        assert categories == values[:len(categories)]
+        assert [values[code] for code in column.cat.codes] == column.astype(str).tolist()
+
+    teams = pd.read_parquet(teams_dir)
+    assert teams["team_name"].cat.categories.tolist() == values
+    assert sorted(set(teams["team_name"])) == ["Mallorca", "Real Madrid", "Team 2", "Team 3"]
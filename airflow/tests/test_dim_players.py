@@ -0,0 +1,108 @@
+import pandas as pd
+
+from extract import data_model_client as dmc
+from extract.dim_players import (
+    OBSERVATION_COLUMNS,
+    PLAYER_ATTRIBUTES,
+    build_scd2,
+    compact_observations,
+    players_as_of,
+    split_players,
+)
+
+PLAYER = 623537
+
+
+def batch(make_payload, count, change=None):
+    """players and matches rows of `count` monthly matches; change(i, player) edits the tracked player"""
+    players, matches = [], []
+    for i in range(count):
+        data = make_payload(1000 + i, f"2024-{1 + i:02d}-01T19:30:00.000Z")
+        for p in data["content"]["lineup"]["awayTeam"]["starters"]:
+            if p["id"] == PLAYER and change:
+                change(i, p)
+        rows, _ = dmc.parse_players_and_intervals(data)
+        players.append(pd.DataFrame(rows))
+        matches.extend(dmc.parse_matches(data))
+    return pd.concat(players, ignore_index=True), pd.DataFrame(matches)
+
+
+def versions(dim):
+    return dim[dim["player_id"] == PLAYER].sort_values("valid_from").reset_index(drop=True)
+
+
+def test_split_drops_attributes_and_keeps_age(make_payload):
+    players, matches = batch(make_payload, 2)
+    facts, observations = split_players(players, matches)
+    assert not set(PLAYER_ATTRIBUTES) & set(facts.columns)
+    assert "age" in facts.columns and "age" not in PLAYER_ATTRIBUTES
+    assert facts[["match_id", "team_id", "player_id"]].dtypes.eq("int64").all()
+    # the same attributes in both matches: one observation per player
+    assert len(observations) == players["player_id"].nunique()
+    assert list(observations.columns) == OBSERVATION_COLUMNS
+
+
+def test_split_drops_rows_without_keys(make_payload):
+    players, matches = batch(make_payload, 1)
+    players.loc[0, "team_id"] = None
+    players.loc[1, "match_id"] = None
+    facts, _ = split_players(players, matches)
+    assert len(facts) == len(players) - 2
+
+
+def test_birthday_does_not_version(make_payload):
+    players, matches = batch(make_payload, 4, lambda i, p: p.update(age=p["age"] + (i >= 2)))
+    dim = build_scd2(None, split_players(players, matches)[1])
+    assert len(versions(dim)) == 1
+
+
+def test_change_opens_a_version_and_a_change_back_another(make_payload):
+    def change(i, p):
+        if i in (2, 3):
+            p["countryName"] = "Elsewhere"
+
+    players, matches = batch(make_payload, 6, change)
+    facts, observations = split_players(players, matches)
+    dim = build_scd2(None, observations)
+    rows = versions(dim)
+    assert list(rows["country_name"]) == ["France", "Elsewhere", "France"]
+    assert list(rows["is_current"]) == [False, False, True]
+    assert rows.loc[0, "valid_to"] == rows.loc[1, "valid_from"]
+    assert rows["player_key"].is_unique
+
+    as_of = players_as_of(facts, matches, dim)
+    seen = as_of[as_of["player_id"] == PLAYER].sort_values("match_time")["country_name"]
+    assert list(seen) == ["France", "France", "Elsewhere", "Elsewhere", "France", "France"]
+
+
+def test_incremental_build_matches_one_pass(make_payload):
+    players, matches = batch(make_payload, 6, lambda i, p: p.update(lastName=f"Name{i // 2}"))
+    # two runs: the first four matches, then the last two
+    first = players["match_id"].astype(int) < 1004
+    _, earlier = split_players(players[first], matches)
+    _, later = split_players(players[~first], matches)
+    incremental = build_scd2(build_scd2(None, earlier), later)
+    one_pass = build_scd2(None, split_players(players, matches)[1])
+    assert len(versions(one_pass)) == 3
+    pd.testing.assert_frame_equal(incremental.sort_values("player_key").reset_index(drop=True),
+                                  one_pass.sort_values("player_key").reset_index(drop=True))
+
+
+def test_stored_hashes_are_recomputed(make_payload):
+    players, matches = batch(make_payload, 2)
+    _, observations = split_players(players, matches)
+    dim = build_scd2(None, observations)
+    # a dimension written before an attribute change carries other hashes (and the old age column)
+    stale = dim.assign(attr_hash=dim["attr_hash"] + 1, age=30)
+    assert len(build_scd2(stale, observations)) == len(dim)
+
+
+def test_compaction_keeps_runs_apart():
+    obs = pd.DataFrame({"player_id": [1, 1, 1, 1], "attr_hash": [7, 7, 8, 7],
+                        "first_seen": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-03-01", "2024-04-01"], utc=True)})
+    for column in PLAYER_ATTRIBUTES:
+        obs[column] = None
+    obs["last_seen"] = obs["first_seen"]
+    runs = compact_observations(obs[OBSERVATION_COLUMNS])
+    assert list(runs["attr_hash"]) == [7, 8, 7]
+    assert runs.loc[0, "last_seen"] == pd.Timestamp("2024-02-01", tz="UTC")
@@ -0,0 +1,59 @@
+from extract.flow_control import CLOSED, HALF_OPEN, OPEN, AdaptiveController
+from extract.fotmob_client import FotMobClient, RateLimiter
+
+
+def test_breaker_opens_at_the_error_threshold():
+    controller = AdaptiveController(min_samples=4, error_threshold=0.5)
+    controller.record(True, 0.1)
+    controller.record(False)
+    controller.record(True, 0.1)
+    assert controller.state == CLOSED  # below min_samples
+    controller.record(False)
+    assert controller.state == OPEN
+    assert not controller.allow()
+
+
+def test_open_breaker_fails_fast_without_a_request():
+    controller = AdaptiveController(min_samples=1, error_threshold=0.5)
+    controller.record(False)
+    client = FotMobClient(base_url="http://127.0.0.1:9", rate_limiter=RateLimiter(0), controller=controller)
+    client.session.get = lambda *args, **kwargs: 1 / 0
+    assert client.request("matchDetails") is None
+
+
+def test_half_open_probe_after_the_cooldown():
+    controller = AdaptiveController(min_samples=1, error_threshold=0.5, cooldown=30)
+    controller.record(False)
+    assert not controller.allow()
+
+    controller.opened_at -= 30
+    assert controller.allow()
+    assert controller.state == HALF_OPEN
+    assert not controller.allow()  # a single probe
+    controller.record(False)
+    assert controller.state == OPEN and not controller.allow()
+
+    controller.opened_at -= 30
+    assert controller.allow()
+    controller.record(True, 0.1)
+    assert controller.state == CLOSED and controller.allow()
+    assert not controller.outcomes
+
+
+def test_limit_grows_additively_and_halves():
+    controller = AdaptiveController(min_samples=100, latency_target=1.0, min_limit=1, max_limit=4)
+    limits = []
+    for _ in range(12):
+        controller.record(True, 0.1)
+        limits.append(controller.limit)
+    # +1 per `limit` healthy responses
+    assert limits[:3] == [2.0, 2.5, 2.9]
+    assert limits[-1] == 4.0
+    assert all(a <= b for a, b in zip(limits, limits[1:]))
+
+    controller.record(False)
+    assert controller.limit == 2.0
+    controller.record(True, 5.0)  # slow
+    assert controller.limit == 1.0
+    controller.record(False)
+    assert controller.limit == 1.0
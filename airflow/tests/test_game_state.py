@@ -0,0 +1,45 @@
+from collections import Counter
+
+import pandas as pd
+
+from extract.data_model_client import event_frame, parse_events, parse_matches
+from features.game_state import minutes_by_state, score_segments, team_minutes_leading
+
+
+def test_parse_events(payload):
+    events = event_frame(parse_events(payload))
+    assert Counter(events["event_type"]) == {
+        "Substitution": 8, "Card": 3, "Goal": 2, "AddedTime": 2, "Half": 2}
+    # elapsed minutes count the 3 added first-half minutes
+    goals = events[events["event_type"].eq("Goal")]
+    assert goals["minute"].tolist() == [13, 53]
+    assert goals["elapsed_minute"].tolist() == [13, 56]
+    assert list(zip(goals["home_score"], goals["away_score"])) == [(0, 1), (1, 1)]
+    red = events[events["card"].eq("Red")].iloc[0]
+    assert (red["minute"], red["added_time"], red["elapsed_minute"]) == (90, 7, 100)
+
+
+def test_score_segments(payload):
+    segments = score_segments(event_frame(parse_events(payload)))
+    assert segments[["start", "end", "home_score", "away_score"]].values.tolist() == [
+        [0, 13, 0, 0], [13, 56, 0, 1], [56, 100, 1, 1]]
+
+
+def test_minutes_add_up_to_the_match_length(payload):
+    events = event_frame(parse_events(payload))
+    states = minutes_by_state(events)
+    assert states.iloc[0][["minutes_home_leading", "minutes_level", "minutes_away_leading"]].tolist() == [0, 57, 43]
+
+    teams = team_minutes_leading(states, pd.DataFrame(parse_matches(payload)))
+    assert teams[["team_id", "side", "minutes_leading", "minutes_trailing"]].values.tolist() == [
+        [8633, "away", 43, 0], [8661, "home", 0, 43]]
+    totals = teams[["minutes_leading", "minutes_level", "minutes_trailing"]].sum(axis=1)
+    assert (totals == events["elapsed_minute"].max()).all()
+
+
+def test_shootout_goals_keep_the_state(payload):
+    events = event_frame(parse_events(payload))
+    shootout = events[events["event_type"].eq("Goal")].tail(1).assign(
+        elapsed_minute=130, home_score=2, away_score=1, penalty_shootout=True)
+    states = minutes_by_state(pd.concat([events, shootout], ignore_index=True))
+    assert states.iloc[0][["minutes_home_leading", "minutes_level", "minutes_away_leading"]].tolist() == [0, 87, 43]
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from extract.history import (
+    HistoryStore,
+    head_to_head,
+    load_historical_matches,
+    match_id_from_url,
+    merge_historical,
+    parse_history,
+    parse_score,
+)
+
+UPCOMING = 4507113
+
+
+def test_url_and_score_parsing():
+    assert match_id_from_url("/matches/real-madrid-vs-mallorca/2h1k3i#4507113") == 4507113
+    assert match_id_from_url("/matches/no-id") is None
+    assert parse_score("3 - 0") == (3, 0)
+    assert parse_score(None) == (None, None)
+
+
+def test_parse_history(payload):
+    matches, refs = parse_history(payload)
+    frame = pd.DataFrame(matches)
+    assert {"h2h", "team_form"} == {r["source"] for r in refs}
+    assert all(r["match_id"] == 4506747 for r in refs)
+    assert set(frame["observed_at"]) == {"2024-08-18T19:30:00.000Z"}
+    upcoming = frame[frame["historical_match_id"] == UPCOMING].iloc[0]
+    assert not upcoming["finished"] and pd.isna(upcoming["home_score"])
+
+
+def test_parse_history_null_sections(payload):
+    payload["content"]["h2h"] = None
+    payload["content"]["matchFacts"]["teamForm"] = None
+    assert parse_history(payload) == ([], [])
+    assert parse_history({"general": None, "content": None}) == ([], [])
+
+
+def observations(payload):
+    return pd.DataFrame(parse_history(payload)[0])
+
+
+def test_merge_one_row_per_match(payload):
+    frame = observations(payload)
+    merged = merge_historical(pd.concat([frame, frame], ignore_index=True))
+    assert merged["historical_match_id"].is_unique
+    assert len(merged) == frame["historical_match_id"].nunique()
+
+
+def test_finished_is_never_replaced_by_unfinished(payload):
+    frame = observations(payload)
+    played = frame[frame["historical_match_id"] == UPCOMING].assign(
+        finished=True, home_score=2, away_score=1, observed_at="2025-05-01T00:00:00Z")
+    # a later kick-off that still lists the match as upcoming, arriving last
+    stale = frame.assign(observed_at="2025-09-01T00:00:00Z")
+    row = merge_historical(pd.concat([played, stale], ignore_index=True)).set_index("historical_match_id").loc[UPCOMING]
+    assert row["finished"] and (row["home_score"], row["away_score"]) == (2, 1)
+
+
+def test_newer_observation_wins_regardless_of_arrival(payload):
+    frame = observations(payload)
+    newer = frame.assign(home_team_name="Newer", observed_at="2025-01-01T00:00:00Z")
+    merged = merge_historical(pd.concat([newer, frame], ignore_index=True))
+    assert set(merged["home_team_name"]) == {"Newer"}
+
+
+def test_nulls_never_overwrite(payload):
+    frame = observations(payload)
+    blank = frame.assign(league_name=None, observed_at="2025-01-01T00:00:00Z")
+    merged = merge_historical(pd.concat([frame, blank], ignore_index=True))
+    h2h = merged[merged["historical_match_id"].isin(frame.dropna(subset=["league_name"])["historical_match_id"])]
+    assert h2h["league_name"].notna().all()
+
+
+def test_store_merges_writers(payload, raw_body, storage):
+    first, second = HistoryStore(storage, "rm", "2024/2025"), HistoryStore(storage, "rm", "2024/2025")
+    first.add_body(raw_body)
+    payload["general"]["matchId"] = "4506748"
+    second.add(payload)
+    assert first.save() and second.save()
+    refs = pd.read_parquet(storage.path(second.refs_key))
+    assert set(refs["match_id"]) == {4506747, 4506748}
+    historical = load_historical_matches(storage)
+    assert historical["historical_match_id"].is_unique
+    meetings = head_to_head(historical, 8633, 8661)
+    assert len(meetings) and meetings["finished"].all()
+    assert UPCOMING not in set(meetings["historical_match_id"])
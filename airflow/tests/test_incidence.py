@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from extract import data_model_client as dmc
+from features.incidence import Incidence, build_incidence, co_occurrence, plus_minus, weighted_goal_diff
+
+HOME, AWAY = 8661, 8633
+
+
+def tables(payload):
+    _, intervals = dmc.parse_players_and_intervals(payload)
+    return intervals, dmc.parse_matches(payload), dmc.event_frame(dmc.parse_events(payload))
+
+
+def test_plus_minus_counts_goals_while_on_the_pitch(payload):
+    intervals, matches, events = tables(payload)
+    # 0-1 at 13', then the home equaliser moved to 80': after the 66' and 70' substitutions
+    events.loc[events["event_type"] == "Goal", "elapsed_minute"] = [13, 80]
+    pm = plus_minus(build_incidence(intervals, matches, events)).set_index("player_id")["plus_minus"]
+    assert pm[213516] == -1   # home, off at 70'
+    assert pm[1055327] == 1   # home, on at 70'
+    assert pm[914458] == 1    # away, off at 66'
+    assert pm[31097] == -1    # away, on at 66'
+    assert pm[170323] == 0    # away, full match
+
+
+def test_plus_minus_needs_events(payload):
+    intervals, matches, _ = tables(payload)
+    with pytest.raises(ValueError):
+        plus_minus(build_incidence(intervals, matches))
+
+
+def test_match_missing_from_matches_has_no_side(payload):
+    intervals, matches, events = tables(payload)
+    incidence = build_incidence(intervals, pd.DataFrame(matches).assign(match_id=1), events)
+    assert incidence["side"].nnz == 0
+    assert weighted_goal_diff(incidence)["weighted_goal_diff"].abs().sum() == 0
+    assert co_occurrence(incidence).nnz == 0
+
+
+def test_save_and_load_roundtrip(payload, tmp_path):
+    incidence = build_incidence(*tables(payload))
+    incidence.save(str(tmp_path))
+    loaded = Incidence.load(str(tmp_path))
+    assert (loaded["minutes"] != incidence["minutes"]).nnz == 0
+    assert plus_minus(loaded).equals(plus_minus(incidence))
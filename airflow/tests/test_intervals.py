@@ -0,0 +1,58 @@
+import pandas as pd
+
+from extract import data_model_client as dmc
+
+
+def intervals(data):
+    _, rows = dmc.parse_players_and_intervals(data)
+    return pd.DataFrame(rows).set_index("player_id")
+
+
+def test_elapsed_minutes_include_added_time(payload):
+    timeline = dmc.match_timeline(payload)
+    # 3 minutes added to the first half, the second half's added time ends the match at 100
+    assert timeline["elapsed"](45, 3) == 48
+    assert timeline["elapsed"](63) == 66
+    assert timeline["end"] == 100
+
+
+def test_substitution_closes_and_opens_intervals(payload):
+    rows = intervals(payload)
+    assert len(rows) == 30
+    off, on = rows.loc[914458], rows.loc[31097]
+    assert (off["on_minute"], off["off_minute"], off["off_reason"]) == (0, 66, "sub")
+    assert (on["on_minute"], on["off_minute"], on["on_reason"], on["off_reason"]) == (66, 100, "sub", "full_time")
+    assert on["minutes_played"] == 34
+
+
+def test_red_card_ends_interval(payload):
+    rows = intervals(payload)
+    assert rows.loc[623537, "off_reason"] == "red_card"
+    assert rows.loc[623537, "off_minute"] == 100
+
+
+def test_early_red_card_minute_counts_first_half_added_time(payload):
+    events = payload["content"]["matchFacts"]["events"]["events"]
+    red = next(e for e in events if e.get("card") == "Red")
+    red["time"], red["overloadTime"] = 60, None
+    rows = intervals(payload)
+    assert (rows.loc[623537, "off_minute"], rows.loc[623537, "minutes_played"]) == (63, 63)
+    # the team plays on with ten: nobody else's interval changes
+    assert (rows["off_reason"] == "red_card").sum() == 1
+
+
+def test_second_yellow_is_a_red_card(payload):
+    events = payload["content"]["matchFacts"]["events"]["events"]
+    yellow = next(e for e in events if e.get("card") == "Yellow" and e.get("playerId") == 673356)
+    yellow.update(card="YellowRed", time=80, overloadTime=None)
+    rows = intervals(payload)
+    assert rows.loc[673356, "off_reason"] == "red_card"
+    assert rows.loc[673356, "off_minute"] == 83
+
+
+def test_no_events_fall_back_to_lineup_minutes(payload):
+    payload["content"]["matchFacts"]["events"]["events"] = []
+    rows = intervals(payload)
+    # the lineup's substitutionEvents only carry the clock minute, without added time
+    assert (rows.loc[914458, "off_minute"], rows.loc[914458, "off_reason"]) == (63, "sub")
+    assert (rows.loc[623537, "off_minute"], rows.loc[623537, "off_reason"]) == (90, "full_time")
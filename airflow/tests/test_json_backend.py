@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from extract.json_backend import BACKENDS, select_backend
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+    try:
+        return BACKENDS[request.param]()
+    except ImportError:
+        pytest.skip(f"{request.param} is not installed")
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview])
+def test_loads(backend, wrap, raw_body):
+    loads, _ = backend
+    assert loads(wrap(raw_body)) == json.loads(raw_body)
+
+
+def test_dumps_returns_bytes(backend, payload):
+    loads, dumps = backend
+    body = dumps(payload)
+    assert isinstance(body, bytes)
+    assert loads(body) == payload
+
+
+def test_select_backend():
+    name, _, _ = select_backend("json")
+    assert name == "json"
+    assert select_backend("auto")[0] in BACKENDS
+    with pytest.raises(ValueError):
+        select_backend("simplejson")
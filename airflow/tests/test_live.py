@@ -0,0 +1,99 @@
+import json
+import os
+
+from extract import json_backend
+from extract.live import LiveMatch, diff_views, live_view, run_live
+
+
+def test_diff_add_change_remove():
+    before = {"event": {"1": {"t": 10}, "2": {"t": 20}}, "stat": {"All/xg": [1, 2]}}
+    after = {"event": {"1": {"t": 10}, "3": {"t": 30}}, "stat": {"All/xg": [1, 3]}}
+    deltas = {(d["kind"], d["op"], d["key"]) for d in diff_views(before, after)}
+    assert deltas == {("event", "add", "3"), ("event", "remove", "2"), ("stat", "change", "All/xg")}
+
+
+def test_live_view_keys(payload):
+    view = live_view(payload)
+    assert view["status"]["match"]["finished"]
+    assert len(view["event"]) == len(payload["content"]["matchFacts"]["events"]["events"])
+    assert view["stat"]
+
+
+def test_live_view_null_sections(payload):
+    # a match that has not kicked off yet sends nulls instead of empty sections
+    payload["content"].update(stats=None, matchFacts=None, shotmap=None)
+    payload["header"]["status"]["reason"] = None
+    view = live_view(payload)
+    assert view["status"]["match"]["reason"] is None
+    assert view["event"] == view["shot"] == view["stat"] == {}
+
+
+def test_update_backs_off_and_resets(payload):
+    body = json_backend.dumps(payload)
+    match = LiveMatch(1, min_interval=10, max_interval=100, backoff=2)
+    deltas, finished = match.update(body)
+    assert deltas and finished and match.interval == 10
+    assert match.update(body) == ([], True)
+    assert match.interval == 20
+    payload["content"]["matchFacts"]["events"]["events"].pop()
+    deltas, _ = match.update(json_backend.dumps(payload))
+    assert [d["op"] for d in deltas] == ["remove"] and match.interval == 10
+
+
+def test_half_time_polls_at_max_interval(payload):
+    match = LiveMatch(1, min_interval=10, max_interval=100)
+    for reason, interval in (("HT", 100), ("PEN", 10)):
+        payload["header"]["status"]["reason"] = {"short": reason}
+        payload["header"]["status"]["scoreStr"] = reason  # a change every poll
+        match.update(json_backend.dumps(payload))
+        assert match.interval == interval
+
+
+class ReplayClient:
+    """Answers every poll with the same body (None: a match FotMob never answers for)"""
+
+    def __init__(self, body):
+        self.body = body
+        self.calls = 0
+
+    def get_match_details(self, match_id, raw=False):
+        self.calls += 1
+        return self.body
+
+    def close(self):
+        pass
+
+
+def poll(client, storage, tmp_path, monkeypatch, upload=None, **kwargs):
+    import extract.live as live
+    monkeypatch.setattr(live, "extract_live_matches", lambda client, league_id, team_id, season: [4506747])
+    config = tmp_path / "team.json"
+    config.write_text(json.dumps({"team_id": 8633, "team_name": "t", "league_id": 87}))
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    return run_live(str(config), "2024/2025", client=client, storage=storage, upload=upload, min_interval=60,
+                    max_interval=60, fixtures_interval=10**9, clock=lambda: now[0], sleep=sleep, **kwargs)
+
+
+def test_full_time_lands_the_final_payload(raw_body, storage, tmp_path, monkeypatch):
+    uploaded = []
+
+    def upload(body, team_name, match_id, season):
+        uploaded.append(match_id)
+        return True
+
+    client = ReplayClient(raw_body)
+    assert poll(client, storage, tmp_path, monkeypatch, upload) == 1
+    assert client.calls == 1 and uploaded == [4506747]
+    deltas = os.listdir(os.path.join(storage.root, "raw", "live", "t", "2024_2025", "4506747"))
+    assert deltas == ["00001.json"]
+
+
+def test_gives_up_on_a_match_that_never_finishes(storage, tmp_path, monkeypatch):
+    client = ReplayClient(None)
+    assert poll(client, storage, tmp_path, monkeypatch, give_up_after=600) == 0
+    # polled every 60s until 600s after it was first seen
+    assert client.calls == 11
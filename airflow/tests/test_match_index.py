@@ -0,0 +1,44 @@
+import threading
+
+from extract.match_index import MatchIndex, landed_marker_key
+from extract.storage import LocalStorage, merge_put, raw_json_key
+
+
+def test_index_lookup_and_marker(storage, raw_body):
+    index = MatchIndex(storage, "rm", "2024/2025")
+    for match_id in (30, 10, 20):
+        index.add(match_id, raw_json_key("rm", "2024/2025", match_id), raw_body)
+    index.save()
+    stored = MatchIndex(storage, "rm", "2024/2025")
+    assert list(stored.ids) == [10, 20, 30]
+    assert 20 in stored and "30" in stored and 40 not in stored
+    assert storage.exists(landed_marker_key("rm", "2024/2025"))
+
+
+def test_concurrent_index_saves_keep_every_entry(tmp_path):
+    def writer(n):
+        index = MatchIndex(LocalStorage(str(tmp_path)), "rm", "2024/2025")
+        for i in range(5):
+            index.add(n * 100 + i, f"raw/json/rm/2024_2025/{n * 100 + i}.json", b"{}")
+            index.save()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert len(MatchIndex(LocalStorage(str(tmp_path)), "rm", "2024/2025")) == 20
+
+
+def test_merge_put_retries_on_conflict(storage):
+    storage.put_bytes("k", b"1")
+    calls = []
+
+    def merge(body):
+        calls.append(body)
+        if len(calls) == 1:
+            # another writer gets in between the read and the conditional write
+            storage.put_bytes("k", body + b"2")
+        return body + b"3"
+
+    merge_put(storage, "k", merge)
+    assert calls == [b"1", b"12"]
+    assert storage.get_bytes("k") == b"123"
@@ -0,0 +1,33 @@
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+from extract import match_structs
+from extract.match_structs import decode_match_details
+from extract.reprocess import parse_match
+
+pytestmark = pytest.mark.skipif(match_structs.msgspec is None, reason="msgspec is not installed")
+
+
+def test_subset_decode_parses_like_a_full_decode(raw_body, payload):
+    data = decode_match_details(raw_body)
+    subset, full = parse_match(data), parse_match(payload)
+    assert list(subset) == list(full)
+    for table, rows in full.items():
+        if isinstance(rows, pd.DataFrame):
+            pd.testing.assert_frame_equal(subset[table], rows, obj=table)
+        else:
+            assert subset[table] == rows, table
+    # sections no parser reads are skipped
+    assert "h2h" not in data["content"] and "nav" not in data
+
+
+def test_type_drift_falls_back_to_a_full_decode(payload, caplog):
+    payload["general"]["leagueId"] = "87"
+    body = json.dumps(payload).encode()
+    with caplog.at_level(logging.ERROR, logger="extract.match_structs"):
+        data = decode_match_details(body)
+    assert "schema drift" in caplog.text and "leagueId" in caplog.text
+    assert data == payload
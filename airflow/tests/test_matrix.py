@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+
+from features.matrix import HEADER_BYTES, TrainingMatrix, append_rows, npy_header
+from features.model import FEATURE_NAMES, training_rows
+
+PARAMS = {"window": 5}
+
+
+def test_header_has_a_fixed_size():
+    assert len(npy_header(np.float32, (3, 7))) == HEADER_BYTES
+    assert len(npy_header(np.float32, (10**12, 7))) == HEADER_BYTES
+
+
+def test_append_rows_overwrites_uncommitted_tail(tmp_path):
+    path = str(tmp_path / "a.npy")
+    append_rows(path, np.arange(6, dtype=np.int64).reshape(3, 2), 0)
+    append_rows(path, np.full((2, 2), 9, dtype=np.int64), 3)
+    # a crashed append past row 4 is overwritten by the next one
+    append_rows(path, np.full((1, 2), 7, dtype=np.int64), 4)
+    loaded = np.load(path, mmap_mode="r")
+    assert loaded.shape == (5, 2)
+    assert loaded[:, 0].tolist() == [0, 2, 4, 9, 7]
+
+
+def test_appends_match_a_full_build(season, tmp_path):
+    matches, stats_by_match = season
+    root = str(tmp_path)
+    assert TrainingMatrix(root, PARAMS).update(matches[:25], stats_by_match) == 25
+    matrix = TrainingMatrix(root, PARAMS)
+    assert matrix.update(matches, stats_by_match) == 15
+    assert matrix.update(matches, stats_by_match) == 0
+
+    X, y, match_ids = matrix.load()
+    assert isinstance(X, np.memmap) and X.shape == (40, len(FEATURE_NAMES))
+    full_X, full_y = training_rows(matches, stats_by_match, PARAMS)
+    assert np.array_equal(y, full_y)
+    assert match_ids.tolist() == [int(m["match_id"]) for m in matches]
+    # the strength column comes from the ratings fit at append time
+    other = [i for i, name in enumerate(FEATURE_NAMES) if "strength" not in name]
+    assert np.allclose(X[:, other], full_X[:, other], atol=1e-5)
+
+
+def test_older_match_rebuilds(season, tmp_path):
+    matches, stats_by_match = season
+    matrix = TrainingMatrix(str(tmp_path), PARAMS)
+    matrix.update(matches[10:], stats_by_match)
+    assert matrix.update(matches, stats_by_match) == 40
+    assert matrix.load()[2].tolist() == [int(m["match_id"]) for m in matches]
+    # one engine snapshot next to the arrays
+    assert sorted(os.listdir(matrix.directory)) == ["X.npy", "engine-40.json", "match_ids.npy", "meta.json", "y.npy"]
+
+
+def test_unfinished_matches_are_skipped(season, tmp_path):
+    matches, stats_by_match = season
+    matches[-1] = dict(matches[-1], home_score=None)
+    assert TrainingMatrix(str(tmp_path), PARAMS).update(matches, stats_by_match) == 39
+
+
+def test_new_parameters_start_a_new_version(tmp_path):
+    assert TrainingMatrix(str(tmp_path), PARAMS).version != TrainingMatrix(str(tmp_path), {"window": 8}).version
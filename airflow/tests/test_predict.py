@@ -0,0 +1,99 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from extract.match_index import MatchIndex
+from extract.storage import raw_json_key
+from features.model import CLASSES, Model, training_rows
+from serving.predict import PredictionService, make_handler
+
+PARAMS = {"window": 5}
+
+
+@pytest.fixture
+def clock():
+    return [0.0]
+
+
+@pytest.fixture
+def service(season, storage, clock):
+    matches, stats_by_match = season
+    model = Model.fit(*training_rows(matches, stats_by_match, PARAMS), engine_params=PARAMS)
+    return PredictionService(model, matches, stats_by_match, storage=storage, check_interval=30,
+                             clock=lambda: clock[0])
+
+
+def land(storage, make_payload, *match_ids):
+    index = MatchIndex(storage, "rm", "2024/2025")
+    for match_id in match_ids:
+        body = json.dumps(make_payload(match_id, f"2024-06-{match_id % 100:02d}T19:30:00.000Z")).encode()
+        key = raw_json_key("rm", "2024/2025", match_id)
+        storage.put_bytes(key, body)
+        index.add(match_id, key, body)
+    index.save()
+
+
+def test_predict_shape(service):
+    prediction = service.predict(8633, 8661, "2024-06-01T20:00:00Z")
+    assert set(prediction) == {"home_team_id", "away_team_id", "kickoff", *CLASSES}
+    assert prediction["home_team_id"] == 8633 and prediction["away_team_id"] == 8661
+    assert all(0 < prediction[name] < 1 for name in CLASSES)
+    assert sum(prediction[name] for name in CLASSES) == pytest.approx(1, abs=1e-3)
+
+
+def test_maybe_refresh_applies_changed_markers(service, storage, make_payload, clock, monkeypatch):
+    land(storage, make_payload, 2001, 2002)
+    clock[0] = 10
+    service.maybe_refresh()
+    assert "2001" not in service.engine.processed
+
+    clock[0] = 31
+    service.maybe_refresh()
+    assert {"2001", "2002"} <= service.engine.processed
+    assert service.markers == service.read_markers()
+
+    # a failed apply keeps the previous markers so the next check retries
+    land(storage, make_payload, 2003)
+    markers = service.markers
+    apply = service.engine.update_batch
+    monkeypatch.setattr(service.engine, "update_batch", lambda *args: 1 / 0)
+    clock[0] = 62
+    service.maybe_refresh()
+    assert service.markers == markers
+    assert "2003" not in service.engine.processed
+
+    monkeypatch.setattr(service.engine, "update_batch", apply)
+    clock[0] = 93
+    service.maybe_refresh()
+    assert "2003" in service.engine.processed
+    assert service.markers == service.read_markers()
+
+
+@pytest.fixture
+def server(service):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_handler_validates_query(server):
+    status, body = get(f"{server}/predict?home=8633&away=8661&kickoff=2024-06-01T20:00:00Z")
+    assert status == 200 and body["kickoff"] == "2024-06-01T20:00:00Z"
+    assert get(f"{server}/predict?home=8633&away=8661&kickoff=tomorrow")[0] == 400
+    assert get(f"{server}/predict?home=8633&away=8661&kickoff=2024-06-01T20:00:00")[0] == 400
+    assert get(f"{server}/predict?home=8633")[0] == 400
+    assert get(f"{server}/nope")[0] == 404
@@ -0,0 +1,56 @@
+import os
+import time
+
+import pytest
+
+from extract import profiling
+from extract.profiling import profiled, timed
+
+
+@timed("test.work")
+def work(seconds=0.0):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+def test_timed_is_a_pass_through_when_off(monkeypatch, tmp_path):
+    monkeypatch.delenv(profiling.PROFILE_ENV, raising=False)
+    with profiled("off", output_dir=str(tmp_path)) as profile:
+        assert profile is None
+        assert work() == "done"
+    assert work.__name__ == "work"
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("mode, files", [
+    ("timing", ["timings.tsv"]),
+    ("sample", ["stacks.collapsed", "timings.tsv"]),
+    ("cprofile", ["cprofile.txt", "profile.prof", "timings.tsv"]),
+])
+def test_profiled_writes_the_mode_outputs(mode, files, tmp_path):
+    with profiled("run", mode=mode, output_dir=str(tmp_path)) as profile:
+        work(0.05)
+        work()
+        # a nested block is recorded by the outer profile
+        with profiled("inner", mode=mode, output_dir=str(tmp_path)) as inner:
+            assert inner is profile
+    assert profiling._active is None
+
+    assert os.listdir(tmp_path) == [os.path.basename(profile.directory)]
+    assert sorted(os.listdir(profile.directory)) == files
+    with open(os.path.join(profile.directory, "timings.tsv")) as f:
+        rows = [line.split("\t") for line in f.read().splitlines()]
+    assert rows[0] == ["name", "calls", "total_s", "mean_ms", "max_ms"]
+    assert rows[1][:2] == ["test.work", "2"] and float(rows[1][2]) >= 0.05
+    if mode == "sample":
+        with open(os.path.join(profile.directory, "stacks.collapsed")) as f:
+            assert "test_profiling.py:work" in f.read()
+
+
+def test_unknown_mode_raises(tmp_path):
+    with pytest.raises(ValueError):
+        with profiled("run", mode="flame", output_dir=str(tmp_path)):
+            pass
+    assert profiling._active is None
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from features.ratings import fit_ratings, join_ratings
+
+COLUMNS = ["attack", "defence", "strength"]
+
+
+def ratings_on(ratings, day):
+    return ratings[ratings["rating_date"] == pd.Timestamp(day)].set_index("team_id")[COLUMNS]
+
+
+def test_a_day_only_uses_earlier_matches(season):
+    matches, _ = season
+    full = fit_ratings(matches)
+    for day in ("2024-02-01", "2024-03-01", "2024-04-19"):
+        earlier = [m for m in matches if m["match_time_utc"] < day]
+        refit = fit_ratings(earlier, as_of=day)
+        # teams that have not played yet are missing from the refit; everyone else is unchanged
+        expected = ratings_on(full, day)
+        actual = ratings_on(refit, day)
+        assert len(actual) > 0
+        pd.testing.assert_frame_equal(expected.loc[actual.index], actual)
+
+    # later results change later ratings only
+    changed = [dict(m, home_score=9) if m["match_time_utc"] >= "2024-03-01" else m for m in matches]
+    pd.testing.assert_frame_equal(ratings_on(fit_ratings(changed), "2024-03-01"), ratings_on(full, "2024-03-01"))
+
+
+def test_first_day_has_no_history(season):
+    matches, _ = season
+    first = ratings_on(fit_ratings(matches), "2024-01-01")
+    assert np.allclose(first[["attack", "defence"]], 1.0) and np.allclose(first["strength"], 0.0)
+
+
+def test_join_ratings_attaches_pre_match_values(season):
+    matches, _ = season
+    ratings = fit_ratings(matches)
+    joined = join_ratings(matches, ratings)
+    assert len(joined) == len(matches)
+    assert joined[[f"{side}_{c}" for side in ("home", "away") for c in COLUMNS]].notna().all().all()
+
+    row = joined.iloc[25]
+    day_ratings = ratings_on(ratings, row["match_date"])
+    for side in ("home", "away"):
+        team = day_ratings.loc[row[f"{side}_team_id"]]
+        assert [row[f"{side}_{c}"] for c in COLUMNS] == team.tolist()
@@ -0,0 +1,44 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from extract.reprocess import iter_raw_keys, reprocess, reprocess_parallel
+from extract.storage import LocalStorage, raw_json_key
+
+
+@pytest.fixture
+def source(make_payload, tmp_path):
+    source = LocalStorage(str(tmp_path / "source"))
+    for i in range(6):
+        data = make_payload(1000 + i, f"2024-08-{10 + i}T19:30:00.000Z")
+        data["header"]["teams"][0]["score"] = i % 3
+        if i % 2:
+            data["general"]["homeTeam"]["name"] = data["header"]["teams"][0]["name"] = f"Team {i}"
+        source.put_bytes(raw_json_key("rm", "2024/2025", 1000 + i), json.dumps(data).encode())
+    return source
+
+
+def read_tables(root):
+    processed = os.path.join(root, "processed")
+    return {table: pd.read_parquet(os.path.join(processed, table))
+            for table in sorted(os.listdir(processed)) if not table.startswith("_")}
+
+
+def test_parallel_writes_the_same_tables(source, tmp_path):
+    keys = list(iter_raw_keys(source, "rm", ["2024/2025"]))
+    serial = reprocess(source, keys, LocalStorage(str(tmp_path / "serial")), batch_size=2)
+    parallel = reprocess_parallel(source.root, keys, LocalStorage(str(tmp_path / "parallel")), workers=2,
+                                  shard_size=2)
+    assert serial["matches"] == parallel["matches"] == 6
+    assert serial["rows"] == parallel["rows"]
+
+    expected, actual = read_tables(str(tmp_path / "serial")), read_tables(str(tmp_path / "parallel"))
+    assert list(actual) == list(expected)
+    for table, frame in expected.items():
+        pd.testing.assert_frame_equal(actual[table], frame, obj=table)
+    with open(tmp_path / "serial" / "processed" / "_dictionaries" / "dictionaries.json") as f:
+        dictionaries = json.load(f)
+    with open(tmp_path / "parallel" / "processed" / "_dictionaries" / "dictionaries.json") as f:
+        assert json.load(f) == dictionaries
@@ -0,0 +1,51 @@
+from features.rolling import FeatureEngine, recompute, verify
+
+PARAMS = {"window": 3}
+
+
+def test_snapshot_then_delta_matches_a_full_recompute(season, tmp_path):
+    matches, stats_by_match = season
+    path = str(tmp_path / "rolling.json")
+    engine = FeatureEngine(**PARAMS)
+    assert engine.update_batch(matches[:17], stats_by_match) == 17
+    engine.save(path)
+
+    engine = FeatureEngine.load(path)
+    assert engine.window == 3
+    assert engine.update_batch(matches, stats_by_match) == 23
+    assert engine.update_batch(matches, stats_by_match) == 0
+    assert verify(engine, matches, stats_by_match) == []
+    assert engine.to_dict() == recompute(matches, stats_by_match, **PARAMS).to_dict()
+
+
+def test_ring_buffers_wrap_past_the_window(season):
+    matches, stats_by_match = season
+    engine = recompute(matches, stats_by_match, **PARAMS)
+    team_id = str(matches[-1]["home_team_id"])
+    played = [m for m in matches if team_id in (str(m["home_team_id"]), str(m["away_team_id"]))]
+    assert len(played) > PARAMS["window"]
+
+    goals = [m["home_score"] if str(m["home_team_id"]) == team_id else m["away_score"] for m in played]
+    state = engine.teams[team_id]
+    assert list(state.rolling["goals_for"].values) == goals[-3:]
+    assert state.rolling["goals_for"].total == sum(goals[-3:])
+    assert state.matches_played == len(played)
+
+
+def test_rest_days_and_elo(season):
+    matches, stats_by_match = season
+    engine = FeatureEngine(**PARAMS)
+    first = matches[0]
+    engine.update(first, stats_by_match[str(first["match_id"])])
+
+    home = engine.features(first["home_team_id"], as_of="2024-01-04T19:30:00.000Z")
+    away = engine.features(first["away_team_id"])
+    assert home["rest_days"] == 3.0
+    assert away["rest_days"] is None
+    # Elo is zero-sum and moves towards the result
+    assert home["elo"] + away["elo"] == 2 * engine.initial_elo
+    if first["home_score"] > first["away_score"]:
+        assert home["elo"] > engine.initial_elo
+    elif first["home_score"] < first["away_score"]:
+        assert home["elo"] < engine.initial_elo
+    assert engine.update(first, stats_by_match[str(first["match_id"])]) is False
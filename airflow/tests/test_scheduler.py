@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+from extract.scheduler import SETTLE, FixtureCache, plan_matches
+
+NOW = datetime(2025, 3, 10, 12, tzinfo=timezone.utc)
+TEAM, OTHER = 8633, 8661
+
+
+def fixture(match_id, hours_ago, finished=True, cancelled=False, home=TEAM, away=OTHER):
+    kickoff = (NOW - timedelta(hours=hours_ago)).isoformat().replace("+00:00", "Z")
+    return {"id": match_id, "home": {"id": home}, "away": {"id": away},
+            "status": {"utcTime": kickoff, "finished": finished, "cancelled": cancelled}}
+
+
+def test_plan_sorts_fixtures():
+    fixtures = [
+        fixture(1, 3),                        # finished, settled
+        fixture(2, 3, finished=False),        # settled but still unfinished (extra time, delay)
+        fixture(3, 1),                        # kicked off an hour ago, not settled
+        fixture(4, 72),                       # two days past due and never landed
+        fixture(5, 3, home=1, away=2),        # not the team's match
+        fixture(6, 3, cancelled=True),
+        fixture(7, 3),                        # already landed
+        fixture(8, -24),                      # tomorrow
+    ]
+    plan = plan_matches(fixtures, TEAM, {"7"}, NOW)
+    assert plan["due"] == [1]
+    assert plan["waiting"] == [2]
+    assert plan["overdue"] == [4]
+    assert plan["next_due_at"] == NOW - timedelta(hours=1) + SETTLE
+
+
+def test_away_matches_and_string_ids():
+    plan = plan_matches([fixture("9", 3, home=OTHER, away=TEAM)], str(TEAM), set(), NOW)
+    assert plan["due"] == ["9"]
+
+
+def test_nothing_due():
+    plan = plan_matches([], TEAM, set(), NOW)
+    assert plan == {"due": [], "waiting": [], "overdue": [], "next_due_at": None}
+
+
+class Fixtures:
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.calls = 0
+
+    def get_league_fixtures(self, league_id, season):
+        self.calls += 1
+        return self.fixtures
+
+
+def test_fixture_cache_roundtrip_and_empty_response(storage):
+    cache = FixtureCache(storage, 87, "2024/2025")
+    assert cache.fixtures is None and cache.age(NOW) == timedelta.max
+    cache.refresh(Fixtures([fixture(1, 3)]), NOW)
+
+    stored = FixtureCache(storage, 87, "2024/2025")
+    assert [m["id"] for m in stored.fixtures] == [1]
+    assert stored.age(NOW + timedelta(hours=1)) == timedelta(hours=1)
+    # an empty answer keeps the previous calendar
+    assert [m["id"] for m in stored.refresh(Fixtures([]), NOW)] == [1]
+    assert FixtureCache(storage, 87, "2024/2025").fetched_at == NOW
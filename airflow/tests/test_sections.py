@@ -0,0 +1,46 @@
+import pytest
+
+from extract import json_backend, sections
+from extract.history import HISTORY_SECTIONS
+from extract.sections import LANDED_SECTIONS, allowlist, filter_sections, prune, section_tree
+
+
+def test_section_tree_parent_wins():
+    assert section_tree(["content.matchFacts.events", "content.matchFacts", "general"]) == {
+        "content": {"matchFacts": None}, "general": None}
+
+
+def test_unknown_product_is_rejected():
+    with pytest.raises(ValueError):
+        allowlist(["parsers", "nope"])
+
+
+def test_filter_keeps_only_allowlisted_sections(raw_body, payload):
+    kept = json_backend.loads(filter_sections(raw_body, LANDED_SECTIONS))
+    assert set(kept) == {"general", "header", "content", "seo"}
+    assert set(kept["content"]) == {"matchFacts", "lineup", "stats", "shotmap"}
+    assert set(kept["content"]["matchFacts"]) == {"infoBox", "events"}
+    # kept sections are byte-for-byte the original values
+    assert kept["content"]["lineup"] == payload["content"]["lineup"]
+    assert kept["general"] == payload["general"]
+
+
+def test_history_sections(raw_body):
+    kept = json_backend.loads(filter_sections(raw_body, HISTORY_SECTIONS))
+    assert set(kept["content"]) == {"h2h", "matchFacts"}
+    assert set(kept["content"]["matchFacts"]) == {"teamForm"}
+
+
+def test_null_parent_falls_back_to_pruning(payload):
+    payload["content"]["matchFacts"] = None
+    kept = json_backend.loads(filter_sections(json_backend.dumps(payload), LANDED_SECTIONS))
+    assert "matchFacts" not in kept["content"]
+    assert kept["content"]["lineup"] == payload["content"]["lineup"]
+
+
+def test_no_allowlist_keeps_the_body(raw_body):
+    assert filter_sections(raw_body, None) is raw_body
+
+
+def test_prune_matches_filter(raw_body, payload):
+    assert prune(payload, section_tree(LANDED_SECTIONS)) == json_backend.loads(filter_sections(raw_body, LANDED_SECTIONS))
@@ -0,0 +1,99 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from extract.match_index import MatchIndex
+from extract.storage import CachedStorage, raw_json_key
+
+KEY = raw_json_key("rm", "2024/2025", 4506747)
+
+
+def md5(body):
+    return hashlib.md5(body).hexdigest()
+
+
+def test_miss_then_mapped_hit(storage, tmp_path, raw_body):
+    storage.put_bytes(KEY, raw_body)
+    cache = CachedStorage(storage, str(tmp_path / "cache"))
+    assert cache.get_bytes(KEY) == raw_body
+    view = cache.get_view(KEY)
+    assert isinstance(view, memoryview) and view == raw_body
+    assert (cache.hits, cache.misses, cache.size) == (1, 1, len(raw_body))
+
+
+def test_corrupt_copy_is_refetched(storage, tmp_path, raw_body):
+    storage.put_bytes(KEY, raw_body)
+    cache = CachedStorage(storage, str(tmp_path / "cache"))
+    cache.get_bytes(KEY)
+    with open(cache.local.path(KEY), "r+b") as f:
+        f.write(b"x")
+    assert cache.get_bytes(KEY) == raw_body
+    assert (cache.invalid, cache.misses) == (1, 2)
+
+
+def test_relanded_match_is_refetched(storage, tmp_path, raw_body):
+    storage.put_bytes(KEY, b"{}")
+    cache = CachedStorage(storage, str(tmp_path / "cache"))
+    cache.get_bytes(KEY)
+    storage.put_bytes(KEY, raw_body)
+    cache.expect({KEY: md5(raw_body)})
+    assert cache.get_bytes(KEY) == raw_body
+    assert cache.size == len(raw_body)
+
+
+def test_stale_index_md5_is_fetched_once(storage, tmp_path, raw_body):
+    storage.put_bytes(KEY, raw_body)
+    cache = CachedStorage(storage, str(tmp_path / "cache"))
+    cache.expect({KEY: "0" * 32})
+    for _ in range(3):
+        assert cache.get_bytes(KEY) == raw_body
+    assert (cache.misses, cache.hits, cache.invalid) == (1, 2, 0)
+
+
+def test_overwrite_keeps_size(storage, tmp_path):
+    cache = CachedStorage(storage, str(tmp_path / "cache"))
+    cache.put_bytes(KEY, b"a" * 100)
+    cache.put_bytes(KEY, b"b" * 40)
+    assert cache.size == 40
+    assert CachedStorage(storage, str(tmp_path / "cache")).size == 40
+    assert storage.get_bytes(KEY) == b"b" * 40
+
+
+def test_concurrent_fills_of_one_key(storage, tmp_path):
+    bodies = [bytes([i]) * 200_000 for i in range(8)]
+    cache = CachedStorage(storage, str(tmp_path / "cache"))
+
+    def fill(body):
+        for _ in range(20):
+            cache._store(KEY, body, md5(body))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(fill, bodies))
+    assert cache.local.get_bytes(KEY) in bodies
+    assert sorted(os.listdir(os.path.dirname(cache.local.path(KEY)))) == ["4506747.json", "4506747.json.md5"]
+
+
+def test_eviction_drops_least_recently_read(storage, tmp_path):
+    cache = CachedStorage(storage, str(tmp_path / "cache"), max_bytes=250)
+    keys = [raw_json_key("rm", "2024/2025", i) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put_bytes(key, bytes([i]) * 100)
+        # distinct LRU clocks: the first key is the oldest
+        os.utime(cache.local.path(key), (i, i))
+    assert not os.path.exists(cache.local.path(keys[0]))
+    assert all(os.path.exists(cache.local.path(key)) for key in keys[1:])
+    assert cache.size <= 250
+
+
+def test_offline_serves_warm_cache(storage, tmp_path, raw_body):
+    storage.put_bytes(KEY, raw_body)
+    index = MatchIndex(storage, "rm", "2024/2025")
+    index.add(4506747, KEY, raw_body)
+    index.save()
+    online = CachedStorage(storage, str(tmp_path / "cache"))
+    assert len(MatchIndex(online, "rm", "2024/2025")) == 1
+    online.get_bytes(KEY)
+
+    offline = CachedStorage(None, str(tmp_path / "cache"))
+    assert MatchIndex(offline, "rm", "2024/2025").keys() == [KEY]
+    assert offline.get_bytes(KEY) == raw_body
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from extract.reprocess import parse_match
+from extract.validation import RULES, SOURCE, batch_tables, merge_reports, validate
+
+
+def parsed_batch(make_payload, count=4):
+    return [(f"raw/json/t/2024_2025/{1000 + i}.json", parse_match(make_payload(1000 + i, "2024-08-18T19:30:00.000Z")))
+            for i in range(count)]
+
+
+def test_clean_batch_passes(make_payload):
+    tables = batch_tables(parsed_batch(make_payload))
+    assert set(tables["matches"][SOURCE]) == {f"raw/json/t/2024_2025/{1000 + i}.json" for i in range(4)}
+    clean, quarantine, report = validate(tables)
+    assert quarantine == []
+    assert len(clean["matches"]) == 4 and SOURCE not in clean["players"].columns
+    assert {row["rule"] for row in report} == {rule["name"] for rule in RULES}
+    assert all(row["failed_rows"] == 0 for row in report)
+
+
+def test_failing_match_is_quarantined_from_every_table(make_payload):
+    parsed = parsed_batch(make_payload)
+    parsed[1][1]["matches"][0]["home_score"] = 99
+    possession = [row for row in parsed[2][1]["stats"] if row["stat_key"] == "BallPossesion"]
+    possession[0]["home_value"] = 80
+    parsed[3][1]["players"].loc[0, "team_id"] = 1
+
+    clean, quarantine, report = validate(batch_tables(parsed))
+    failed = {row["key"]: row["failed_rules"] for row in quarantine}
+    assert failed == {
+        "raw/json/t/2024_2025/1001.json": "score_range",
+        "raw/json/t/2024_2025/1002.json": "possession_sums_to_100",
+        "raw/json/t/2024_2025/1003.json": "player_team_in_match",
+    }
+    for name, frame in clean.items():
+        if "match_id" in frame.columns:
+            assert set(pd.to_numeric(frame["match_id"])) == {1000}, name
+
+
+def test_null_keys_fail(make_payload):
+    parsed = parsed_batch(make_payload, 2)
+    parsed[0][1]["players"].loc[0, "player_id"] = None
+    _, quarantine, _ = validate(batch_tables(parsed))
+    assert [row["key"] for row in quarantine] == ["raw/json/t/2024_2025/1000.json"]
+    assert "player_keys_not_null" in quarantine[0]["failed_rules"]
+
+
+def test_reports_accumulate():
+    total = {}
+    row = {"rule": "score_range", "table": "matches", "checked": 4, "failed_rows": 1, "failed_matches": 1}
+    merge_reports(total, [row])
+    merge_reports(total, [row])
+    assert total["score_range"] == {"table": "matches", "checked": 8, "failed_rows": 2, "failed_matches": 2}
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from extract.flow_control import AdaptiveController
+from extract.fotmob_client import SharedRateLimiter
+from extract.match_index import MatchIndex
+from extract.reprocess import unique_match_keys
+from extract.scheduler import FixtureCache
+from extract.work_queue import BACKFILL, CURRENT, FRESH, WorkQueue, enqueue_competitions, plan_competition, run_worker
+
+NOW = datetime(2025, 3, 10, 12, tzinfo=timezone.utc)
+SEASONS = ["2024/2025", "2023/2024"]
+
+
+def fixture(match_id, days_ago, finished=True):
+    kickoff = (NOW - timedelta(days=days_ago)).isoformat().replace("+00:00", "Z")
+    return {"id": match_id, "status": {"utcTime": kickoff, "finished": finished}}
+
+
+FIXTURES = {
+    (87, "2024/2025"): [fixture(1, 1), fixture(2, 20), fixture(3, -2, finished=False), fixture(4, 0.01)],
+    (87, "2023/2024"): [fixture(10, 300), fixture(11, 320)],
+    (42, "2024/2025"): [fixture(20, 3)],
+    (42, "2023/2024"): [fixture(21, 330)],
+}
+COMPETITIONS = {
+    "laliga": {"league_id": 87, "seasons": SEASONS, "priority": 0},
+    "champions_league": {"league_id": 42, "seasons": SEASONS, "priority": 1},
+}
+
+
+class FakeClient:
+    def __init__(self, body=None, fail=()):
+        self.controller = AdaptiveController()
+        self.body = body
+        self.fail = set(fail)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_league_fixtures(self, league_id, season):
+        self.calls.append(("fixtures", league_id, season))
+        return FIXTURES[(league_id, season)]
+
+    def get_match_details(self, match_id, raw=False):
+        with self.lock:
+            self.calls.append(("details", str(match_id)))
+        return None if str(match_id) in self.fail else self.body
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue.sqlite"))
+
+
+def enqueue(queue, storage, client):
+    return enqueue_competitions(queue, client=client, storage=storage, now=NOW, competitions=COMPETITIONS)
+
+
+def test_priorities(queue, storage):
+    # 3 is in two days and 4 kicked off 15 minutes ago: neither has settled
+    assert enqueue(queue, storage, FakeClient()) == 6
+    tasks = queue.claim("w", 100)
+    assert [(t["competition"], t["match_id"], t["priority"]) for t in tasks] == [
+        ("laliga", "1", 10 * FRESH), ("champions_league", "20", 10 * FRESH + 1),
+        ("laliga", "2", 10 * CURRENT),
+        ("laliga", "10", 10 * BACKFILL), ("laliga", "11", 10 * BACKFILL), ("champions_league", "21", 10 * BACKFILL + 1),
+    ]
+
+
+def test_past_seasons_are_not_refetched_once_finished(queue, storage):
+    client = FakeClient()
+    enqueue(queue, storage, client)
+    enqueue(queue, storage, client)
+    fetched = [call for call in client.calls if call[0] == "fixtures"]
+    # the current seasons are younger than FIXTURE_MAX_AGE, the past ones are complete
+    assert len(fetched) == 4
+
+
+def test_past_season_with_unfinished_fixtures_is_refreshed(storage):
+    calls = []
+    fixtures = [fixture(1, 300, finished=False)]
+
+    def api():
+        class Api:
+            def get_league_fixtures(self, league_id, season):
+                calls.append(season)
+                return fixtures
+        return Api()
+
+    competition = COMPETITIONS["laliga"]
+    assert plan_competition("laliga", competition, "2023/2024", storage, api, NOW) == []
+    plan_competition("laliga", competition, "2023/2024", storage, api, NOW + timedelta(days=1))
+    assert len(calls) == 2
+    fixtures[0]["status"]["finished"] = True
+    plan_competition("laliga", competition, "2023/2024", storage, api, NOW + timedelta(days=2))
+    assert len(plan_competition("laliga", competition, "2023/2024", storage, api, NOW + timedelta(days=3))) == 1
+    assert len(calls) == 3
+    assert FixtureCache(storage, 87, "2023/2024").fixtures[0]["status"]["finished"]
+
+
+def test_workers_land_everything_once(queue, storage, raw_body):
+    enqueue(queue, storage, FakeClient())
+
+    def upload(body, name, match_id, season):
+        storage.put_bytes(f"raw/json/{name}/{season.replace('/', '_')}/{match_id}.json", body)
+        return True
+
+    client = FakeClient(raw_body, fail={"11"})
+    workers = [threading.Thread(target=run_worker, args=(queue, client, storage, upload, f"w{i}", 2))
+               for i in range(3)]
+    [w.start() for w in workers]
+    [w.join() for w in workers]
+
+    states, tiers = queue.counts()
+    assert states == {("laliga", "done"): 3, ("laliga", "pending"): 1, ("champions_league", "done"): 2}
+    details = sorted(match_id for kind, match_id in client.calls if kind == "details")
+    assert details == ["1", "10", "11", "2", "20", "21"]
+    assert MatchIndex(storage, "laliga", "2024/2025").match_ids() == [1, 2]
+    with sqlite3.connect(queue.path) as conn:
+        state, attempts, available_at = conn.execute(
+            "SELECT state, attempts, available_at FROM tasks WHERE match_id = '11'").fetchone()
+    assert (state, attempts) == ("pending", 1) and available_at > time.time()
+    # landed matches are in the index, nothing new to queue
+    assert enqueue(queue, storage, FakeClient()) == 0
+
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue([{"competition": "laliga", "season": "2024/2025", "match_id": 1, "kickoff": None, "priority": 0}])
+    queue.lease_seconds = -1
+    assert len(queue.claim("dead", 10)) == 1
+    assert [t["match_id"] for t in queue.claim("alive", 10)] == ["1"]
+
+
+def test_shared_rate_limiter_spaces_requests_across_threads(tmp_path):
+    limiter = SharedRateLimiter(str(tmp_path / "queue.sqlite"), interval=0.02)
+    start = time.time()
+    threads = [threading.Thread(target=lambda: [limiter.wait() for _ in range(5)]) for _ in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert time.time() - start >= 19 * 0.02
+
+
+def test_duplicate_landings_are_read_once():
+    keys = ["raw/json/real_madrid/2024_2025/1.json", "raw/json/laliga/2024_2025/1.json",
+            "raw/json/laliga/2024_2025/2.json"]
+    assert list(unique_match_keys(keys)) == [keys[0], keys[2]]